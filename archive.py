@@ -0,0 +1,218 @@
+import sqlite3 as sql
+from datetime import date
+from pathlib import Path
+
+##################
+## Log archives ##
+##################
+# Closed months of activity_logs are moved out of the main database into archive files, one per month.
+# The main database then only holds recent logs, and stays small however long it is used for.
+# The log_archives table in the main database is the catalog of which months have been archived,
+# and log fetches attach (read only) just the archives whose dates and ids could match.
+
+# Every column of activity_logs, in table order
+LOG_COLUMNS = (
+    "id", "instance_id", "stock_id", "stock_name", "location_id", "location_name",
+    "activity_type", "update_details", "quantity_change", "date_occured",
+)
+
+# An archive is a copy of the activity_logs table with the same indexes as the main database
+_archive_schema = [
+    """
+    CREATE TABLE IF NOT EXISTS activity_logs (
+        id INTEGER PRIMARY KEY,
+        instance_id INTEGER NOT NULL,
+        stock_id INTEGER NOT NULL,
+        stock_name TEXT NOT NULL,
+        location_id INTEGER NOT NULL,
+        location_name TEXT NOT NULL,
+        activity_type TEXT,
+        update_details TEXT,
+        quantity_change INTEGER,
+        date_occured TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_activity_logs_stock ON activity_logs(stock_id, activity_type, id)",
+    "CREATE INDEX IF NOT EXISTS idx_activity_logs_location ON activity_logs(location_id, activity_type, id)",
+    "CREATE INDEX IF NOT EXISTS idx_activity_logs_activity ON activity_logs(activity_type, id)",
+    "CREATE INDEX IF NOT EXISTS idx_activity_logs_stock_name ON activity_logs(stock_name, id)",
+    "CREATE INDEX IF NOT EXISTS idx_activity_logs_location_name ON activity_logs(location_name, id)",
+    "CREATE INDEX IF NOT EXISTS idx_activity_logs_date ON activity_logs(date_occured, id)",
+]
+
+def period_bounds(period: str):
+    """
+    Returns the (start, end) dates of a "YYYY-MM" period, where end is the start of the next month
+    """
+    year, month = (int(part) for part in period.split("-"))
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f"{year:04d}-{month:02d}-01 00:00:00", f"{next_year:04d}-{next_month:02d}-01 00:00:00"
+
+def month_start(day: str = None):
+    """
+    Returns the start of the month the given date is in, or of the current month
+    """
+    day = day if day else date.today().isoformat()
+    return f"{day[:7]}-01 00:00:00"
+
+######################
+## class LogArchive ##
+######################
+
+class LogArchive:
+    """
+    Creates and finds the monthly archive files of activity_logs for one database
+
+    Archiving a month copies its logs to the month's file first, and only once that has been committed
+    is the month recorded in the catalog and deleted from the main database, in one write transaction.
+    The copy replaces rows by id, so archiving a month again (after a crash, or because more logs
+    for it turned up) is always safe
+    """
+    # The schema name the main database is attached as when an archive is streamed with it
+    main_alias = "main_database"
+
+    _catalog_query = "SELECT period, file, start_date, end_date, first_id, last_id, row_count, archived_at FROM log_archives ORDER BY first_id"
+
+    def __init__(self, archive_dir: Path):
+        self._archive_dir = Path(archive_dir)
+
+    def path(self, period: str):
+        return self._archive_dir / f"activity_logs_{period}.db"
+
+    @staticmethod
+    def alias(period: str):
+        """
+        Returns the schema name an archive is attached as
+        """
+        return f"archive_{period.replace('-', '_')}"
+
+    def catalog(self, conn: sql.Connection):
+        """
+        Returns every archived period, oldest logs first
+        """
+        cur = conn.execute(self._catalog_query)
+        names = [column[0] for column in cur.description]
+        return [dict(zip(names, row)) for row in cur.fetchall()]
+
+    def overlapping(self, conn: sql.Connection, start: str = None, end: str = None, after_id: int = None, descending: bool = False):
+        """
+        Returns the archived periods that could hold logs dated from start up to end, and past after_id
+        They are in the order their logs would be read: oldest first, or newest first if descending
+        """
+        entries = [
+            entry for entry in self.catalog(conn)
+            if (start is None or entry["end_date"] > start)
+            and (end is None or entry["start_date"] < end)
+            and (after_id is None or (entry["first_id"] < after_id if descending else entry["last_id"] > after_id))
+        ]
+        if descending:
+            entries.sort(key=lambda entry: entry["last_id"], reverse=True)
+        return entries
+
+    def closed_periods(self, conn: sql.Connection, before: str):
+        """
+        Returns the periods with logs still in the main database that end on or before the given month start
+        """
+        rows = conn.execute(
+            "SELECT DISTINCT substr(date_occured, 1, 7) FROM activity_logs WHERE date_occured < ? ORDER BY 1",
+            (before,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def copy_period(self, conn: sql.Connection, period: str, chunk_size: int = 5000):
+        """
+        Copies a period's logs from the main database into its archive file, and commits the archive
+        Returns the catalog entry for the archive, and the highest id that was copied
+        """
+        start, end = period_bounds(period)
+        self._archive_dir.mkdir(parents=True, exist_ok=True)
+        path = self.path(period)
+
+        archive = sql.connect(path)
+        try:
+            for statement in _archive_schema:
+                archive.execute(statement)
+
+            cur = conn.cursor()
+            cur.row_factory = None
+            cur.execute(
+                f"SELECT {', '.join(LOG_COLUMNS)} FROM activity_logs WHERE date_occured >= ? AND date_occured < ? ORDER BY id",
+                (start, end)
+            )
+            copied_to = None
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                archive.executemany(
+                    f"INSERT OR REPLACE INTO activity_logs ({', '.join(LOG_COLUMNS)}) VALUES ({', '.join('?' * len(LOG_COLUMNS))})",
+                    rows
+                )
+                copied_to = rows[-1][0]
+
+            first_id, last_id, row_count = archive.execute("SELECT MIN(id), MAX(id), COUNT(*) FROM activity_logs").fetchone()
+            archive.commit()
+        finally:
+            archive.close()
+
+        entry = {
+            "period": period, "file": path.name, "start_date": start, "end_date": end,
+            "first_id": first_id, "last_id": last_id, "row_count": row_count,
+        }
+        return entry, copied_to
+
+    def record(self, conn: sql.Connection, entry: dict, copied_to: int):
+        """
+        Adds an archive to the catalog and removes the logs it now holds from the main database
+        Must be called inside a write. Returns the number of logs removed
+        """
+        conn.execute("""
+            INSERT OR REPLACE INTO log_archives (period, file, start_date, end_date, first_id, last_id, row_count)
+            VALUES (:period, :file, :start_date, :end_date, :first_id, :last_id, :row_count)
+        """, entry)
+        # Only logs that were copied are removed, in case more were added since
+        cur = conn.execute(
+            "DELETE FROM activity_logs WHERE date_occured >= ? AND date_occured < ? AND id <= ?",
+            (entry["start_date"], entry["end_date"], copied_to)
+        )
+        return cur.rowcount
+
+    def attach(self, conn: sql.Connection, entries: list):
+        """
+        Attaches archives to a connection, read only
+        Attaching is not allowed inside a transaction, so this cannot be used on the writer connection during a write
+        """
+        for entry in entries:
+            uri = (self._archive_dir / entry["file"]).resolve().as_uri() + "?mode=ro"
+            conn.execute(f"ATTACH DATABASE ? AS {self.alias(entry['period'])}", (uri,))
+
+    def detach(self, conn: sql.Connection, entries: list):
+        for entry in entries:
+            conn.execute(f"DETACH DATABASE {self.alias(entry['period'])}")
+
+    def stream(self, entry: dict, query: str, chunk_size: int, main_path: Path = None):
+        """
+        Generator that yields every row of an archive's logs as plain tuples, using its own read only connection
+        If main_path is given the main database is attached too (read only, as main_alias), for queries that join its tables
+        """
+        uri = (self._archive_dir / entry["file"]).resolve().as_uri() + "?mode=ro"
+        archive = sql.connect(uri, uri=True)
+        try:
+            if main_path is not None:
+                archive.execute(f"ATTACH DATABASE ? AS {self.main_alias}", (Path(main_path).resolve().as_uri() + "?mode=ro",))
+            cur = archive.execute(query)
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            archive.close()
+
+    def remove_files(self, conn: sql.Connection):
+        """
+        Deletes every archive file in the catalog
+        WARNING: only for testing purposes
+        """
+        for entry in self.catalog(conn):
+            (self._archive_dir / entry["file"]).unlink(missing_ok=True)
@@ -0,0 +1,261 @@
+import argparse
+import json
+import platform
+import random
+import sqlite3 as sql
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# Allow the benchmarks to be run from any directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import data_structures as ds
+from database import Database
+
+#########################
+## Database benchmarks ##
+#########################
+# Times the public Database methods against synthetic databases of increasing size.
+#
+#   python benchmarks/bench_database.py run --sizes 1000 100000 --output before.json
+#   python benchmarks/bench_database.py run --sizes 1000 100000 --output after.json
+#   python benchmarks/bench_database.py compare before.json after.json
+#
+# Generated databases are kept in benchmarks/data and reused by later runs with the same shape
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+def generate_database(rows: int, stock_types: int, locations: int, logs_per_row: float, seed: int = 1) -> Database:
+    """
+    Builds (or reuses) a database with the given number of inventory rows spread over the stock types and locations
+    Each instance gets a Created log, plus extra Updated logs to make up logs_per_row logs per instance
+    """
+    data_dir = DATA_DIR / f"rows{rows}_stock{stock_types}_loc{locations}_logs{logs_per_row}_seed{seed}"
+    if (data_dir / "stock_database.db").exists():
+        return Database(data_dir=data_dir)
+
+    db = Database(data_dir=data_dir)
+    rng = random.Random(seed)
+    log_rows = int(rows * logs_per_row)
+
+    with db.get_write_connection() as conn:
+        conn.executemany(
+            "INSERT INTO stock_data (id, name, restock_quantity) VALUES (?,?,?)",
+            ((i, f"STOCK {i}", rng.randint(1, 500)) for i in range(1, stock_types + 1))
+        )
+        conn.executemany(
+            "INSERT INTO location_data (id, name) VALUES (?,?)",
+            ((i, f"LOCATION {i}") for i in range(1, locations + 1))
+        )
+
+        # The bulk of the rows are generated inside sqlite, which is far faster than passing them in from python
+        conn.execute(f"""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {rows})
+            INSERT INTO current_inventory (id, stock_id, location_id, current_quantity)
+            SELECT i, (i % {stock_types}) + 1, (i % {locations}) + 1, abs(random() % 100) + 1 FROM n
+        """)
+        conn.execute("""
+            INSERT INTO activity_logs (instance_id, stock_id, stock_name, location_id, location_name, activity_type, quantity_change)
+            SELECT
+                current_inventory.id, stock_data.id, stock_data.name, location_data.id, location_data.name, 'Created', current_inventory.current_quantity
+            FROM current_inventory
+            INNER JOIN stock_data ON stock_data.id = current_inventory.stock_id
+            INNER JOIN location_data ON location_data.id = current_inventory.location_id
+        """)
+        extra_logs = max(0, log_rows - rows)
+        if extra_logs:
+            conn.execute(f"""
+                WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {extra_logs})
+                INSERT INTO activity_logs (instance_id, stock_id, stock_name, location_id, location_name, activity_type, update_details, quantity_change)
+                SELECT
+                    (i % {rows}) + 1,
+                    ((i % {rows}) + 1) % {stock_types} + 1,
+                    'STOCK ' || (((i % {rows}) + 1) % {stock_types} + 1),
+                    ((i % {rows}) + 1) % {locations} + 1,
+                    'LOCATION ' || (((i % {rows}) + 1) % {locations} + 1),
+                    'Updated', 'Quantity', abs(random() % 10) + 1
+                FROM n
+            """)
+        conn.execute("ANALYZE")
+
+    return db
+
+def time_call(fn, repeat: int):
+    """
+    Runs fn repeat times and returns timing statistics in milliseconds
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "min_ms": min(timings),
+        "median_ms": statistics.median(timings),
+        "mean_ms": statistics.fmean(timings),
+        "max_ms": max(timings),
+        "repeat": repeat,
+        "rows": len(result) if isinstance(result, list) else None,
+    }
+
+def benchmark_cases(db: Database, rows: int, stock_types: int, locations: int):
+    """
+    Returns the (name, callable, repeat) cases to time against a generated database
+    Write cases are given fresh names each call so they can be repeated, and against reused databases
+    """
+    counter = iter(range(10**9))
+    run_tag = time.strftime("%Y%m%d%H%M%S")
+    mid_stock = f"STOCK {stock_types // 2 + 1}"
+    mid_location = f"LOCATION {locations // 2 + 1}"
+    last_log_id = rows // 2
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+
+    def add_stock():
+        return db.add_data(ds.StockData(name=f"BENCH STOCK {run_tag} {next(counter)}", restock_quantity="5"))
+
+    def add_location():
+        return db.add_data(ds.LocationData(name=f"BENCH LOCATION {run_tag} {next(counter)}"))
+
+    def add_inventory():
+        return db.add_data(ds.InventoryData(stock_type=ds.StockData(name=mid_stock), location=ds.LocationData(name=mid_location), quantity="10"))
+
+    def update_inventory():
+        instance_id = rows // 2
+        quantity = str(next(counter) % 50 + 1)
+        return db.update_data(ds.InventoryData(id_str=instance_id, stock_type=ds.StockData(name=mid_stock), location=ds.LocationData(name=mid_location), quantity=quantity))
+
+    def delete_inventory():
+        # Delete the rows added by add_inventory, newest first
+        newest = db.fetch_data(ds.InventoryData(stock_type=ds.StockData(name=mid_stock)), page_size=1, descending=True)
+        return db.delete_data(ds.InventoryData(id_str=newest[0]["id"]))
+
+    def bulk_add():
+        start = next(counter) * 1000
+        return db.bulk_add(
+            ds.InventoryData(stock_type=ds.StockData(name=mid_stock), location=ds.LocationData(name=mid_location), quantity=str(i % 20 + 1))
+            for i in range(start, start + 1000)
+        )
+
+    heavy = 3 if rows >= 1_000_000 else 10
+    return [
+        ("fetch_stock_data.all", lambda: db.fetch_data(ds.StockData()), 20),
+        ("fetch_stock_data.by_name", lambda: db.fetch_data(ds.StockData(name=mid_stock)), 200),
+        ("fetch_location_data.by_name", lambda: db.fetch_data(ds.LocationData(name=mid_location)), 200),
+        ("fetch_stock_data.prefix", lambda: db.fetch_data(ds.StockData(name=mid_stock[:-1]), search="prefix"), 200),
+        ("fetch_stock_data.fuzzy", lambda: db.fetch_data(ds.StockData(name=mid_stock[2:]), search="fuzzy"), 200),
+        ("fetch_inventory_data.all", lambda: db.fetch_data(ds.InventoryData()), heavy),
+        ("fetch_inventory_data.all.tuples", lambda: db.fetch_data(ds.InventoryData(), result_format="tuples"), heavy),
+        ("fetch_inventory_data.all.columns", lambda: db.fetch_data(ds.InventoryData(), result_format="columns"), heavy),
+        ("fetch_inventory_data.by_stock", lambda: db.fetch_data(ds.InventoryData(stock_type=ds.StockData(name=mid_stock))), heavy),
+        ("fetch_inventory_data.first_page", lambda: db.fetch_data(ds.InventoryData(), page_size=200), 100),
+        ("fetch_inventory_data.fuzzy_page", lambda: db.fetch_data(ds.InventoryData(location=ds.LocationData(name=mid_location[2:])), page_size=200, search="fuzzy"), 100),
+        ("fetch_quantity_data.all", lambda: db.fetch_data(ds.QuantityData()), heavy),
+        ("fetch_quantity_data.by_stock", lambda: db.fetch_data(ds.QuantityData(stock_name=mid_stock)), 50),
+        ("fetch_quantity_data.by_location", lambda: db.fetch_data(ds.QuantityData(location_name=mid_location)), heavy),
+        ("check_restock", db.check_restock, 50),
+        ("fetch_log_data.all", lambda: db.fetch_data(ds.LogData()), heavy),
+        ("fetch_log_data.all.tuples", lambda: db.fetch_data(ds.LogData(), result_format="tuples"), heavy),
+        ("fetch_log_data.by_stock", lambda: db.fetch_data(ds.LogData(stock_id=stock_types // 2 + 1)), heavy),
+        ("fetch_log_data.page", lambda: db.fetch_data(ds.LogData(), after_id=last_log_id, page_size=200), 100),
+        ("fetch_log_data.fuzzy_page", lambda: db.fetch_data(ds.LogData(stock_name=mid_stock[2:]), page_size=200, search="fuzzy"), 100),
+        ("fetch_log_rollups.by_month", lambda: db.fetch_log_rollups(period="month"), heavy),
+        ("fetch_log_rollups.by_stock", lambda: db.fetch_log_rollups(stock_name=mid_stock, period="all"), 100),
+        ("inventory_as_of.tomorrow", lambda: db.inventory_as_of(tomorrow), heavy),
+        ("add_stock_data", add_stock, 50),
+        ("add_location_data", add_location, 50),
+        ("add_inventory_data", add_inventory, 50),
+        ("update_inventory_data", update_inventory, 50),
+        ("delete_inventory_data", delete_inventory, 50),
+        ("bulk_add.1000_instances", bulk_add, 5),
+    ]
+
+def run(args):
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sql.sqlite_version,
+            "platform": platform.platform(),
+            "stock_types": args.stock_types,
+            "locations": args.locations,
+            "logs_per_row": args.logs_per_row,
+        },
+        "results": {},
+    }
+
+    for rows in args.sizes:
+        print(f"Preparing database with {rows} rows", file=sys.stderr)
+        db = generate_database(rows, args.stock_types, args.locations, args.logs_per_row)
+        size_results = {}
+        for name, fn, repeat in benchmark_cases(db, rows, args.stock_types, args.locations):
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            size_results[name] = time_call(fn, max(1, int(repeat * args.repeat_scale)))
+            print(f"  {name:<36} {size_results[name]['median_ms']:>10.3f} ms", file=sys.stderr)
+        results["results"][str(rows)] = size_results
+        db.close()
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+
+def compare(args):
+    """
+    Compares the median timings of two result files, and fails if any got slower than the threshold allows
+    """
+    old = json.loads(Path(args.old).read_text())["results"]
+    new = json.loads(Path(args.new).read_text())["results"]
+
+    regressions = []
+    print(f"{'size':>10} {'benchmark':<36} {'old ms':>10} {'new ms':>10} {'ratio':>7}")
+    for size in new:
+        for name, timing in new[size].items():
+            if size not in old or name not in old[size]:
+                continue
+            old_ms = old[size][name]["median_ms"]
+            new_ms = timing["median_ms"]
+            ratio = new_ms / old_ms if old_ms > 0 else float("inf")
+            # Very fast calls are too noisy to judge on a ratio alone
+            flagged = ratio > args.threshold and new_ms - old_ms > args.min_delta_ms
+            if flagged:
+                regressions.append((size, name, ratio))
+            print(f"{size:>10} {name:<36} {old_ms:>10.3f} {new_ms:>10.3f} {ratio:>6.2f}x{'  REGRESSION' if flagged else ''}")
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmarks regressed by more than {args.threshold}x", file=sys.stderr)
+        return 1
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Database class at scale")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="time every benchmark and write the results as json")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="numbers of inventory rows to test, e.g. 1000 10000000")
+    run_parser.add_argument("--stock-types", type=int, default=500)
+    run_parser.add_argument("--locations", type=int, default=50)
+    run_parser.add_argument("--logs-per-row", type=float, default=3.0, help="activity_logs rows per inventory row")
+    run_parser.add_argument("--repeat-scale", type=float, default=1.0, help="multiplies the number of repeats of every benchmark")
+    run_parser.add_argument("--only", nargs="*", help="only run benchmarks whose names start with these prefixes")
+    run_parser.add_argument("--output", help="file to write the json results to. Printed if not given")
+
+    compare_parser = sub.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio counted as a regression")
+    compare_parser.add_argument("--min-delta-ms", type=float, default=0.05, help="ignore slowdowns smaller than this")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        run(args)
+        return 0
+    return compare(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
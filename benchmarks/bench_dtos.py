@@ -0,0 +1,98 @@
+import argparse
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+# Allow the benchmarks to be run from any directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import data_structures as ds
+
+#######################
+## Data object bench ##
+#######################
+# Compares the slotted data classes with copies of the dict based classes they replaced
+#
+#   python benchmarks/bench_dtos.py --count 1000000
+
+class LegacyStockData:
+    def __init__(self, restock_quantity: str = None, id_str: str = None, name: str = None):
+        self._id = id_str
+        self._name = name
+        self._restock_quantity = restock_quantity
+
+class LegacyLocationData:
+    def __init__(self, name: str = None, id_str: str = None):
+        self._id = id_str
+        self._name = name
+
+class LegacyInventoryData:
+    def __init__(self, id_str: str = None, location: LegacyLocationData = None, stock_type: LegacyStockData = None, quantity: str = None):
+        self._id = id_str
+        self._location = location if location else LegacyLocationData()
+        self._stock_type = stock_type if stock_type else LegacyStockData()
+        self._quantity = quantity
+
+class LegacyLogData:
+    def __init__(self, id_str: str = None, instance_id: str = None, stock_name: str = None, stock_id:str = None, location_name: str = None, location_id: str = None, activity_type: str = None, update_details: str = None, quantity_change: str = None, date_occured:str = None):
+        self._id = id_str
+        self._instance_id = instance_id
+        self._stock_name = stock_name
+        self._stock_id = stock_id
+        self._location_name = location_name
+        self._location_id = location_id
+        self._activity_type = activity_type
+        self._update_details = update_details
+        self._quantity_change = quantity_change
+        self._date_occured = date_occured if date_occured else datetime.now().strftime("%Y-%m-%d %H:%M%S")
+
+CASES = {
+    # The shape bulk imports build: an instance with its stock type and location given by name
+    "inventory.named": (
+        lambda i: LegacyInventoryData(stock_type=LegacyStockData(name="SCREWS"), location=LegacyLocationData(name="WORKSHOP"), quantity=i),
+        lambda i: ds.InventoryData(stock_type=ds.StockData(name="SCREWS"), location=ds.LocationData(name="WORKSHOP"), quantity=i),
+    ),
+    # The shape used for id lookups, where the nested defaults are never touched
+    "inventory.by_id": (
+        lambda i: LegacyInventoryData(id_str=i),
+        lambda i: ds.InventoryData(id_str=i),
+    ),
+    "log.no_date": (
+        lambda i: LegacyLogData(instance_id=i, stock_name="SCREWS", location_name="WORKSHOP", activity_type="Created", quantity_change=i),
+        lambda i: ds.LogData(instance_id=i, stock_name="SCREWS", location_name="WORKSHOP", activity_type="Created", quantity_change=i),
+    ),
+}
+
+def measure(factory, count: int):
+    """
+    Returns (seconds to build count objects, bytes held by them)
+    """
+    start = time.perf_counter()
+    objects = [factory(i) for i in range(count)]
+    elapsed = time.perf_counter() - start
+    del objects
+
+    tracemalloc.start()
+    objects = [factory(i) for i in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return elapsed, size
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the memory use and construction speed of the data classes")
+    parser.add_argument("--count", type=int, default=200000, help="objects to build for each case")
+    args = parser.parse_args(argv)
+
+    print(f"{'case':<18} {'legacy ms':>10} {'slots ms':>10} {'legacy MB':>10} {'slots MB':>10}")
+    for name, (legacy, slotted) in CASES.items():
+        legacy_time, legacy_size = measure(legacy, args.count)
+        slotted_time, slotted_size = measure(slotted, args.count)
+        print(f"{name:<18} {legacy_time * 1000:>10.1f} {slotted_time * 1000:>10.1f} "
+              f"{legacy_size / 2**20:>10.1f} {slotted_size / 2**20:>10.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
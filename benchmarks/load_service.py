@@ -0,0 +1,137 @@
+import argparse
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Allow the benchmarks to be run from any directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import data_structures as ds
+from bench_database import generate_database
+from service import ServiceClient
+
+#######################
+## Service load test ##
+#######################
+# Measures how many requests a second the database service answers with several clients at once.
+#
+#   python benchmarks/load_service.py --clients 8 --seconds 10 --write-ratio 0.1
+#
+# The service runs in its own process, as it would for real, against a generated database (see bench_database).
+# Each client thread keeps its own connection open and picks an operation at random for every request:
+# stock and location lookups by name, a page of the inventory, a restock check, or (write-ratio of the time)
+# a change to the quantity of one of the instances. Requests a second and latencies per operation are printed
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+def start_service(data_dir: Path, pool_size: int):
+    """
+    Starts the service on a free port, and returns the process and its url
+    """
+    process = subprocess.Popen(
+        [sys.executable, "-m", "service", "--data-dir", str(data_dir), "--port", "0", "--pool-size", str(pool_size)],
+        cwd=PROJECT_DIR, stdout=subprocess.PIPE, text=True
+    )
+    # The service prints its address once it is listening
+    line = process.stdout.readline()
+    if not line:
+        raise Exception("The service did not start")
+    return process, line.split()[-1]
+
+def operations(rows: int, stock_types: int, locations: int, rng: random.Random):
+    return {
+        "stock by name": lambda client: client.fetch_data(ds.StockData(name=f"STOCK {rng.randint(1, stock_types)}")),
+        "location by name": lambda client: client.fetch_data(ds.LocationData(name=f"LOCATION {rng.randint(1, locations)}")),
+        "inventory page": lambda client: client.fetch_data(ds.InventoryData(), after_id=rng.randint(0, max(0, rows - 100)), page_size=100),
+        "restock check": lambda client: client.check_restock(),
+    }
+
+def update_quantity(client: ServiceClient, rows: int, rng: random.Random):
+    instance = client.fetch_data(ds.InventoryData(id_str=rng.randint(1, rows)))[0]
+    update = ds.InventoryData(
+        id_str=instance["id"], stock_type=ds.StockData(name=instance["stock_name"]),
+        location=ds.LocationData(name=instance["location_name"]), quantity=str(rng.randint(1, 100))
+    )
+    return client.update_data(update)
+
+def client_thread(url: str, args, seed: int, stop: threading.Event, timings: dict, errors: list):
+    client = ServiceClient(url)
+    rng = random.Random(seed)
+    reads = operations(args.rows, args.stock_types, args.locations, rng)
+    names = list(reads)
+    while not stop.is_set():
+        if rng.random() < args.write_ratio:
+            name = "update quantity"
+            call = lambda: update_quantity(client, args.rows, rng)
+        else:
+            name = rng.choice(names)
+            call = lambda: reads[name](client)
+        began = time.perf_counter()
+        try:
+            call()
+        except Exception as e:
+            errors.append(f"{name}: {e!r}")
+            continue
+        timings.setdefault(name, []).append(time.perf_counter() - began)
+    client.close()
+
+def percentile(values: list, fraction: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the requests a second the database service can answer")
+    parser.add_argument("--clients", type=int, default=8, help="client threads making requests at once")
+    parser.add_argument("--seconds", type=float, default=10.0, help="how long to make requests for")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="fraction of requests that change a quantity")
+    parser.add_argument("--rows", type=int, default=10000, help="inventory rows in the generated database")
+    parser.add_argument("--stock-types", type=int, default=500)
+    parser.add_argument("--locations", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=5, help="the service's read connections")
+    args = parser.parse_args(argv)
+
+    print(f"Preparing database with {args.rows} rows", file=sys.stderr)
+    db = generate_database(args.rows, args.stock_types, args.locations, 3.0)
+    data_dir = Path(db._db_path).parent
+    db.close()
+
+    process, url = start_service(data_dir, args.pool_size)
+    try:
+        stop = threading.Event()
+        timings = [{} for _ in range(args.clients)]
+        errors = []
+        threads = [
+            threading.Thread(target=client_thread, args=(url, args, index, stop, timings[index], errors))
+            for index in range(args.clients)
+        ]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+    finally:
+        process.terminate()
+        process.wait()
+
+    by_operation = {}
+    for client_timings in timings:
+        for name, values in client_timings.items():
+            by_operation.setdefault(name, []).extend(values)
+    total = sum(len(values) for values in by_operation.values())
+
+    print(f"{args.clients} clients for {elapsed:.1f}s: {total} requests, {total / elapsed:.1f} requests/s, {len(errors)} errors")
+    print(f"{'operation':<20} {'requests':>9} {'median ms':>10} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, values in sorted(by_operation.items()):
+        print(f"{name:<20} {len(values):>9} {statistics.median(values) * 1000:>10.2f} {percentile(values, 0.95) * 1000:>8.2f} {percentile(values, 0.99) * 1000:>8.2f}")
+    for error in errors[:10]:
+        print(error, file=sys.stderr)
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
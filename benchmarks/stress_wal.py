@@ -0,0 +1,99 @@
+import argparse
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Allow the benchmarks to be run from any directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import data_structures as ds
+from bench_database import DATA_DIR, generate_database
+from database import Database
+
+##########################
+## Reader/writer stress ##
+##########################
+# Simulates several terminals sharing one database file: some run large bulk writes while
+# the others keep searching. Each terminal has its own Database object, and so its own connections.
+#
+#   python benchmarks/stress_wal.py --readers 4 --writers 2 --duration 10
+#
+# Exits non-zero if any read failed, or the slowest read took longer than --max-read-ms
+
+def writer_terminal(data_dir: Path, stop: threading.Event, batch_size: int, stats: dict, errors: list):
+    db = Database(data_dir=data_dir)
+    try:
+        while not stop.is_set():
+            results = db.bulk_add(
+                ds.InventoryData(stock_type=ds.StockData(name="STOCK 1"), location=ds.LocationData(name="LOCATION 1"), quantity="1")
+                for _ in range(batch_size)
+            )
+            stats["rows_written"] += sum(1 for result in results if result is True)
+    except Exception as e:
+        errors.append(f"writer: {e!r}")
+    finally:
+        stats["write_retries"] += db.pool_stats()["write_retries"]
+        db.close()
+
+def reader_terminal(data_dir: Path, stop: threading.Event, latencies: list, errors: list):
+    db = Database(data_dir=data_dir)
+    try:
+        while not stop.is_set():
+            start = time.perf_counter()
+            db.fetch_data(ds.QuantityData(stock_name="STOCK 1"))
+            db.fetch_data(ds.InventoryData(), page_size=200, descending=True)
+            latencies.append((time.perf_counter() - start) * 1000)
+    except Exception as e:
+        errors.append(f"reader: {e!r}")
+    finally:
+        db.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that readers keep running while other terminals write")
+    parser.add_argument("--rows", type=int, default=100000, help="inventory rows in the starting database")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=5000, help="instances added by each bulk write")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run for")
+    parser.add_argument("--max-read-ms", type=float, default=500.0, help="slowest acceptable read")
+    args = parser.parse_args(argv)
+
+    # Every run starts from a fresh copy, as the writers grow the database
+    generate_database(args.rows, 50, 10, 1.0).close()
+    source = DATA_DIR / f"rows{args.rows}_stock50_loc10_logs1.0_seed1" / "stock_database.db"
+    data_dir = DATA_DIR / "stress_wal"
+    data_dir.mkdir(parents=True, exist_ok=True)
+    for suffix in ("", "-wal", "-shm"):
+        (data_dir / f"stock_database.db{suffix}").unlink(missing_ok=True)
+    (data_dir / "stock_database.db").write_bytes(source.read_bytes())
+
+    stop = threading.Event()
+    latencies = []
+    errors = []
+    write_stats = {"rows_written": 0, "write_retries": 0}
+
+    threads = [threading.Thread(target=writer_terminal, args=(data_dir, stop, args.batch_size, write_stats, errors)) for _ in range(args.writers)]
+    threads += [threading.Thread(target=reader_terminal, args=(data_dir, stop, latencies, errors)) for _ in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    print(f"reads: {len(latencies)}, rows written: {write_stats['rows_written']}, write retries: {write_stats['write_retries']}")
+    if latencies:
+        latencies.sort()
+        print(f"read latency ms - median: {statistics.median(latencies):.2f}, "
+              f"p99: {latencies[int(len(latencies) * 0.99) - 1]:.2f}, max: {latencies[-1]:.2f}")
+    for error in errors:
+        print(error, file=sys.stderr)
+
+    if errors or not latencies or latencies[-1] > args.max_read_ms:
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import argparse
+import multiprocessing
+import random
+import sys
+import time
+from pathlib import Path
+
+# Allow the benchmarks to be run from any directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import data_structures as ds
+from bench_database import DATA_DIR
+from database import Database
+
+##########################
+## Multi-process writes ##
+##########################
+# Simulates several operator stations and sync scripts writing to one database file at the same time.
+# Each writer is its own process with its own Database, so they contend for sqlite's file lock just as
+# separate terminals would, rather than for the in-process writer lock.
+#
+#   python benchmarks/stress_writes.py --processes 8 --operations 200
+#
+# Every writer adds instances and keeps changing the quantity of one shared instance. Afterwards:
+#   - every add reported as successful must be in current_inventory and activity_logs
+#   - every update reported as successful must be logged
+#   - the logged quantity changes of the shared instance must add up to its final quantity, which only
+#     holds if each update read the quantity it changed inside its own write transaction
+# Anything missing is counted as a lost update, and the run exits non-zero
+
+STOCK_NAME = "STRESS STOCK"
+LOCATION_NAME = "STRESS LOCATION"
+START_QUANTITY = 1000
+
+def writer_process(data_dir: Path, index: int, operations: int, busy_timeout_ms: int, write_retries: int, start, results):
+    db = Database(data_dir=data_dir, busy_timeout_ms=busy_timeout_ms, write_retries=write_retries)
+    shared = ds.InventoryData(id_str=1, stock_type=ds.StockData(name=STOCK_NAME), location=ds.LocationData(name=LOCATION_NAME))
+    counts = {"index": index, "added": 0, "updated": 0, "unchanged": 0, "busy": 0, "errors": []}
+    rng = random.Random(index)
+    start.wait()
+    try:
+        for operation in range(operations):
+            try:
+                if operation % 2:
+                    shared._quantity = str(rng.randint(1, START_QUANTITY))
+                    result = db.update_data(shared)
+                    key = "updated"
+                else:
+                    result = db.add_data(ds.InventoryData(stock_type=ds.StockData(name=STOCK_NAME), location=ds.LocationData(name=LOCATION_NAME), quantity="1"))
+                    key = "added"
+            except Exception as e:
+                counts["errors"].append(repr(e))
+                continue
+            if result is True:
+                counts[key] += 1
+            elif result.title == "Database busy":
+                counts["busy"] += 1
+            elif result.title == "No value change":
+                counts["unchanged"] += 1
+            else:
+                counts["errors"].append(result.message)
+    finally:
+        stats = db.pool_stats()
+        counts["retries"] = stats["write_retries"]
+        counts["retry_time"] = stats["write_retry_time"]
+        counts["transactions"] = stats["write_transactions"]
+        db.close()
+        results.put(counts)
+
+def check_database(data_dir: Path, totals: dict):
+    """
+    Returns a list describing every write that was reported as successful but is missing from the database
+    """
+    db = Database(data_dir=data_dir)
+    lost = []
+    with db.get_database_connection() as conn:
+        instances = conn.execute("SELECT COUNT(*) FROM current_inventory").fetchone()[0]
+        # The shared instance was added before the writers started
+        if instances - 1 != totals["added"]:
+            lost.append(f"{totals['added']} adds succeeded but {instances - 1} instances were added")
+
+        logged = dict(conn.execute("SELECT activity_type, COUNT(*) FROM activity_logs GROUP BY activity_type").fetchall())
+        if logged.get("Created", 0) - 1 != totals["added"]:
+            lost.append(f"{totals['added']} adds succeeded but {logged.get('Created', 0) - 1} were logged")
+        if logged.get("Updated", 0) != totals["updated"]:
+            lost.append(f"{totals['updated']} updates succeeded but {logged.get('Updated', 0)} were logged")
+
+        final = conn.execute("SELECT current_quantity FROM current_inventory WHERE id = 1").fetchone()[0]
+        # Each update logs the old quantity less the new, so these add up to the start less the end
+        changed = conn.execute("SELECT COALESCE(SUM(quantity_change), 0) FROM activity_logs WHERE instance_id = 1 AND activity_type = 'Updated'").fetchone()[0]
+        if START_QUANTITY - changed != final:
+            lost.append(f"the shared instance's logs add up to {START_QUANTITY - changed}, but its quantity is {final}")
+    db.close()
+    return lost
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that writes from several processes at once are neither lost nor refused")
+    parser.add_argument("--processes", type=int, default=4, help="writer processes to run at once")
+    parser.add_argument("--operations", type=int, default=200, help="writes made by each process")
+    parser.add_argument("--busy-timeout-ms", type=int, default=5000)
+    parser.add_argument("--write-retries", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    data_dir = DATA_DIR / "stress_writes"
+    data_dir.mkdir(parents=True, exist_ok=True)
+    for suffix in ("", "-wal", "-shm"):
+        (data_dir / f"stock_database.db{suffix}").unlink(missing_ok=True)
+
+    db = Database(data_dir=data_dir)
+    db.add_data(ds.StockData(name=STOCK_NAME, restock_quantity="1"))
+    db.add_data(ds.LocationData(name=LOCATION_NAME))
+    db.add_data(ds.InventoryData(stock_type=ds.StockData(name=STOCK_NAME), location=ds.LocationData(name=LOCATION_NAME), quantity=str(START_QUANTITY)))
+    db.close()
+
+    start = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=writer_process, args=(data_dir, index, args.operations, args.busy_timeout_ms, args.write_retries, start, results))
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    began = time.perf_counter()
+    start.set()
+    counts = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - began
+    for process in processes:
+        process.join()
+
+    totals = {key: sum(count[key] for count in counts) for key in ("added", "updated", "unchanged", "busy", "retries", "retry_time", "transactions")}
+    errors = [error for count in counts for error in count["errors"]]
+    lost = check_database(data_dir, totals)
+
+    print(f"{args.processes} processes, {args.operations} writes each, in {elapsed:.2f}s")
+    print(f"throughput: {totals['transactions'] / elapsed:.1f} write transactions/s")
+    print(f"added: {totals['added']}, updated: {totals['updated']}, unchanged: {totals['unchanged']}, refused as busy: {totals['busy']}")
+    print(f"retries: {totals['retries']}, backing off for {totals['retry_time']:.2f}s in total")
+    print(f"lost updates: {len(lost)}")
+    for line in lost + errors:
+        print(line, file=sys.stderr)
+
+    if lost or errors:
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
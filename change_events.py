@@ -0,0 +1,156 @@
+import threading
+
+#######################
+## class ChangeEvent ##
+#######################
+# Describes one change made to the database, so views can patch the rows it affects instead of reloading
+
+# What each entity's id refers to
+#   stock, location, inventory, log - the id of the row in stock_data, location_data, current_inventory or activity_logs
+#   quantity - the id of the stock type whose total quantity changed
+CHANGE_ENTITIES = ("stock", "location", "inventory", "quantity", "log")
+CHANGE_ACTIONS = ("added", "updated", "deleted", "changed")
+
+class ChangeEvent:
+    """
+    One change to the database: the kind of row, what happened to it, its id and the names of the fields that changed
+    An id of None means an unknown number of rows changed, e.g. after an import, so the whole view should be reloaded
+    An entity of None means anything may have changed, as when another terminal's change could not be worked out
+    """
+    __slots__ = ("entity", "action", "id", "fields")
+
+    def __init__(self, entity: str, action: str, id: int = None, fields: tuple = ()):
+        if entity is not None and entity not in CHANGE_ENTITIES:
+            raise Exception(f"Unrecognised entity {entity} in ChangeEvent")
+        if action not in CHANGE_ACTIONS:
+            raise Exception(f"Unrecognised action {action} in ChangeEvent")
+        self.entity = entity
+        self.action = action
+        # Ids come from the gui as strings as often as from sqlite as ints
+        self.id = int(id) if id is not None else None
+        self.fields = tuple(fields)
+
+    def __eq__(self, other):
+        if not isinstance(other, ChangeEvent):
+            return NotImplemented
+        return (self.entity, self.action, self.id, self.fields) == (other.entity, other.action, other.id, other.fields)
+
+    def __repr__(self):
+        return f"ChangeEvent({self.entity!r}, {self.action!r}, {self.id!r}, {self.fields!r})"
+
+# The fields of an instance that each kind of update log records as changed
+_UPDATED_FIELDS = {
+    "Location": ("location_name",),
+    "Quantity": ("current_quantity",),
+    "Both": ("location_name", "current_quantity"),
+}
+
+def changes_from_log(log_id: int, instance_id: int, stock_id: int, activity_type: str, update_details: str):
+    """
+    Returns the changes an activity log records: the log itself, the stock instance, and the stock type's total quantity
+    Every change to an instance is logged, so this works the same for changes made here and those found in another terminal's logs
+    """
+    changes = [ChangeEvent("log", "added", log_id)]
+    if activity_type == "Created":
+        changes.append(ChangeEvent("inventory", "added", instance_id, ("stock_name", "location_name", "current_quantity")))
+    elif activity_type == "Removed":
+        changes.append(ChangeEvent("inventory", "deleted", instance_id))
+    else:
+        fields = _UPDATED_FIELDS.get(update_details, ("location_name", "current_quantity"))
+        changes.append(ChangeEvent("inventory", "updated", instance_id, fields))
+    # Totals are also kept per location, so even a move changes them
+    changes.append(ChangeEvent("quantity", "updated", stock_id, ("total_quantity",)))
+    return changes
+
+#####################
+## class ChangeBus ##
+#####################
+# Hands the changes made through a Database to whoever subscribed, once they have been committed
+
+class ChangeBus:
+    """
+    Collects the changes each write transaction makes, and publishes them to every subscriber when it commits
+    Changes are kept per thread, as only the thread holding the writer can be making them, and dropped on rollback
+    Subscribers are called on the thread that made the write (or found the change), with a list of ChangeEvents,
+    so they should only hand the changes over, e.g. onto a queue for the gui's main loop
+    """
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._pending = threading.local()
+        self.published = 0
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def record(self, event: ChangeEvent):
+        """
+        Notes a change made by the current write transaction, to be published when it commits
+        """
+        if not hasattr(self._pending, "events"):
+            self._pending.events = []
+        self._pending.events.append(event)
+
+    def commit(self):
+        """
+        Publishes the changes recorded by the transaction that has just committed on this thread
+        """
+        events = getattr(self._pending, "events", None)
+        if events:
+            self._pending.events = []
+            self.publish(events)
+
+    def rollback(self):
+        self._pending.events = []
+
+    def publish(self, events: list):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        self.published += len(events)
+        for callback in subscribers:
+            try:
+                callback(events)
+            except Exception:
+                # The write has already been committed, so a failing subscriber must not make it look like it failed
+                pass
+
+########################
+## class ChangePoller ##
+########################
+# Notices changes made by other terminals, which the ChangeBus never sees
+
+class ChangePoller:
+    """
+    Calls poll every interval seconds on a background thread until stopped
+    Also used by Database to take inventory checkpoints away from the writes that make them due
+    """
+    def __init__(self, poll, interval: float = 1.0, name: str = "change-poller"):
+        self._poll = poll
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.polls = 0
+        self.errors = 0
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            try:
+                self._poll()
+            except Exception:
+                # e.g. the database was busy. The change is still there to be found next time
+                self.errors += 1
+            self.polls += 1
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
@@ -0,0 +1,159 @@
+import argparse
+import csv
+import json
+import sys
+
+import csv_transfer
+import data_structures as ds
+from utils import is_valid_timestamp
+from database import Database, SEARCH_MODES
+
+##################
+## Command line ##
+##################
+# Headless access to the database, e.g. for cron jobs: python -m cli restock --format csv
+# Nothing here (or in the modules it uses) imports tkinter, so it runs without a display.
+# Rows are written as json lines or csv, and the inventory and logs are fetched and written a page at a time,
+# so output starts straight away and memory use does not grow with the size of the table
+
+OUTPUT_FORMATS = ("jsonl", "csv")
+
+class RowWriter:
+    """
+    Writes dict rows to an open file as json lines, or as csv with a header taken from the first row
+    """
+    def __init__(self, out_file, output_format: str):
+        if output_format not in OUTPUT_FORMATS:
+            raise Exception(f"Unrecognised output format {output_format}")
+        self._out = out_file
+        self._format = output_format
+        self._csv = None
+        self.count = 0
+
+    def write(self, rows):
+        for row in rows:
+            if self._format == "jsonl":
+                self._out.write(json.dumps(row) + "\n")
+            else:
+                if self._csv is None:
+                    self._csv = csv.DictWriter(self._out, fieldnames=list(row))
+                    self._csv.writeheader()
+                self._csv.writerow(row)
+            self.count += 1
+
+def paged(fetch_page, page_size: int):
+    """
+    Generator that yields every row of a paged fetch, asking for the page after the last row each time
+    fetch_page is called with after_id and page_size
+    """
+    after_id = None
+    while True:
+        rows = fetch_page(after_id=after_id, page_size=page_size)
+        yield from rows
+        if len(rows) < page_size:
+            break
+        after_id = rows[-1]["id"]
+
+def name_or_none(name: str):
+    return name.strip().upper() if name and name.strip() else None
+
+def run_stock(db: Database, args):
+    return db.fetch_stock_data(ds.StockData(name=name_or_none(args.name)), search=args.search)
+
+def run_location(db: Database, args):
+    return db.fetch_location_data(ds.LocationData(name=name_or_none(args.name)), search=args.search)
+
+def run_inventory(db: Database, args):
+    query = ds.InventoryData(stock_type=ds.StockData(name=name_or_none(args.stock)), location=ds.LocationData(name=name_or_none(args.location)))
+    if args.as_of:
+        return db.inventory_as_of(args.as_of, query, search=args.search)
+    return paged(lambda **page: db.fetch_inventory_data(query, search=args.search, **page), args.page_size)
+
+def run_log(db: Database, args):
+    query = ds.LogData(stock_name=name_or_none(args.stock), location_name=name_or_none(args.location), activity_type=args.activity)
+    return paged(lambda **page: db.fetch_log_data(query, search=args.search, start=args.start, end=args.end, **page), args.page_size)
+
+def run_restock(db: Database, args):
+    return db.check_restock()
+
+def main(argv=None):
+    """
+    Runs a command line command, returning the exit code
+    """
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Query the component tracking database without the gui")
+    parser.add_argument("--test-data", action="store_true", help="use the test database")
+    parser.add_argument("--data-dir", help="directory holding the database, instead of the user data directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    # Options shared by the commands that print rows
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("--format", choices=OUTPUT_FORMATS, default="jsonl", help="json lines (the default) or csv")
+    output.add_argument("--search", choices=SEARCH_MODES, default="exact", help="how names are matched")
+    output.add_argument("--page-size", type=int, default=1000, help="rows fetched at a time for the inventory and logs")
+
+    stock_parser = commands.add_parser("stock", parents=[output], help="list stock types")
+    stock_parser.add_argument("--name")
+    stock_parser.set_defaults(run=run_stock)
+
+    location_parser = commands.add_parser("location", parents=[output], help="list locations")
+    location_parser.add_argument("--name")
+    location_parser.set_defaults(run=run_location)
+
+    inventory_parser = commands.add_parser("inventory", parents=[output], help="list stock instances")
+    inventory_parser.add_argument("--stock")
+    inventory_parser.add_argument("--location")
+    inventory_parser.add_argument("--as-of", help="show the inventory as it was at this date (YYYY-MM-DD) or time")
+    inventory_parser.set_defaults(run=run_inventory)
+
+    log_parser = commands.add_parser("log", parents=[output], help="list activity logs, including archived ones")
+    log_parser.add_argument("--stock")
+    log_parser.add_argument("--location")
+    log_parser.add_argument("--activity", choices=("Created", "Removed", "Updated"))
+    log_parser.add_argument("--from", dest="start", help="only logs from this date (YYYY-MM-DD) or time")
+    log_parser.add_argument("--to", dest="end", help="only logs before this date (YYYY-MM-DD) or time")
+    log_parser.set_defaults(run=run_log)
+
+    restock_parser = commands.add_parser("restock", parents=[output], help="list stock types that need restocking")
+    restock_parser.add_argument("--check", action="store_true", help="exit with status 1 if anything needs restocking")
+    restock_parser.set_defaults(run=run_restock)
+
+    import_parser = commands.add_parser("import", help="add rows to a table from a csv file")
+    import_parser.add_argument("table", choices=csv_transfer.IMPORT_TABLES)
+    import_parser.add_argument("path", help="csv file to read from. Use - for stdin")
+    import_parser.add_argument("--chunk-size", type=int, default=1000)
+
+    export_parser = commands.add_parser("export", help="write a whole table to a csv file")
+    export_parser.add_argument("table", choices=csv_transfer.EXPORT_TABLES)
+    export_parser.add_argument("path", help="csv file to write to. Use - for stdout")
+    export_parser.add_argument("--chunk-size", type=int, default=1000)
+
+    args = parser.parse_args(argv)
+
+    # Dates are compared with the stored timestamps as text, so anything else would quietly match the wrong rows
+    for option, value in (("--as-of", getattr(args, "as_of", None)), ("--from", getattr(args, "start", None)), ("--to", getattr(args, "end", None))):
+        if value is not None and not is_valid_timestamp(value):
+            parser.error(f"{option} must be a YYYY-MM-DD date or YYYY-MM-DD HH:MM:SS time, not {value}")
+
+    if args.command in ("import", "export"):
+        # The csv transfer has its own entry point, which these commands share
+        transfer_args = [args.command, args.table, args.path, "--chunk-size", str(args.chunk_size)]
+        if args.test_data:
+            transfer_args.append("--test-data")
+        if args.data_dir:
+            transfer_args += ["--data-dir", args.data_dir]
+        return csv_transfer.main(transfer_args)
+
+    db = Database(test_data=args.test_data, data_dir=args.data_dir)
+    try:
+        writer = RowWriter(sys.stdout, args.format)
+        writer.write(args.run(db, args))
+        sys.stdout.flush()
+    finally:
+        db.close()
+
+    if args.command == "restock" and args.check and writer.count:
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
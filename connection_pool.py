@@ -0,0 +1,310 @@
+import random
+import sqlite3 as sql
+import threading
+import time
+from contextlib import contextmanager
+
+#####################
+## class PoolStats ##
+#####################
+# Counters describing how well the pool is serving requests
+
+class PoolStats:
+    """
+    Holds the running hit/miss/wait counts for a ConnectionPool
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.evictions = 0
+        self.reentries = 0
+
+    def as_dict(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "waits": self.waits,
+            "wait_time": self.wait_time,
+            "evictions": self.evictions,
+            "reentries": self.reentries,
+        }
+
+##########################
+## class ConnectionPool ##
+##########################
+# A bounded pool of sqlite connections shared between the Database methods
+
+class ConnectionPool:
+    """
+    Keeps a bounded set of open sqlite connections to a single database file
+
+    Connections are created lazily up to max_size, have their setup pragmas applied once,
+    and are handed back out in most-recently-used order. Connections left idle for longer
+    than idle_timeout seconds are closed the next time the pool is used.
+    A thread that already holds a connection is given the same one again if it asks for
+    another, so nested calls never need two connections (and never deadlock on the write lock).
+    """
+    def __init__(self, db_path, max_size: int = 5, idle_timeout: float = 300.0, wait_timeout: float = 30.0, pragmas: list[str] = None, cached_statements: int = 128, factory=sql.Connection):
+        self._db_path = db_path
+        # The connection class to create, e.g. one that times its statements
+        self._factory = factory
+        self._max_size = max_size
+        self._idle_timeout = idle_timeout
+        self._wait_timeout = wait_timeout
+        self._pragmas = pragmas if pragmas else []
+        self._cached_statements = cached_statements
+
+        # Idle connections, stored as (connection, time returned) with the most recent last
+        self._idle = []
+        self._open_count = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        # Tracks the connection (and nesting depth) currently borrowed by each thread
+        self._local = threading.local()
+
+        self.stats = PoolStats()
+
+    @property
+    def size(self):
+        """
+        Number of connections currently open, both idle and borrowed
+        """
+        return self._open_count
+
+    def _create_connection(self):
+        """
+        Opens a new connection and applies the setup pragmas
+        """
+        # check_same_thread is disabled as connections move between threads through the pool.
+        # The pool guarantees only one thread uses a connection at a time
+        # Pooled connections live a long time, so their prepared statement caches stay useful
+        # uri is set so archives can be attached read only by their file: uri. Plain paths are unaffected
+        conn = sql.connect(self._db_path, check_same_thread=False, cached_statements=self._cached_statements, factory=self._factory, uri=True)
+        # This row ensures that each row of a query is returned as a dictionary
+        conn.row_factory = sql.Row
+        for pragma in self._pragmas:
+            conn.execute(f"PRAGMA {pragma}")
+        return conn
+
+    def _evict_idle(self, now: float):
+        """
+        Closes any connections that have been idle for longer than the idle timeout
+        Must be called while holding the condition lock
+        """
+        # The oldest connections are at the start of the list
+        while self._idle and now - self._idle[0][1] > self._idle_timeout:
+            conn, _ = self._idle.pop(0)
+            conn.close()
+            self._open_count -= 1
+            self.stats.evictions += 1
+
+    def acquire(self):
+        """
+        Borrows a connection from the pool, creating one if none are idle and there is room
+        Blocks until a connection is returned if the pool is at its maximum size
+        """
+        with self._condition:
+            if self._closed:
+                raise sql.ProgrammingError("Cannot use a closed connection pool")
+
+            self._evict_idle(time.monotonic())
+
+            if self._idle:
+                self.stats.hits += 1
+                return self._idle.pop()[0]
+
+            if self._open_count < self._max_size:
+                self.stats.misses += 1
+                self._open_count += 1
+            else:
+                self.stats.waits += 1
+                wait_start = time.monotonic()
+                if not self._condition.wait_for(lambda: self._idle or self._closed, timeout=self._wait_timeout):
+                    raise sql.OperationalError("Timed out waiting for a database connection")
+                self.stats.wait_time += time.monotonic() - wait_start
+                if self._closed:
+                    raise sql.ProgrammingError("Cannot use a closed connection pool")
+                return self._idle.pop()[0]
+
+        # Connect outside of the lock so other threads are not held up
+        try:
+            return self._create_connection()
+        except Exception:
+            with self._condition:
+                self._open_count -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, conn: sql.Connection):
+        """
+        Returns a borrowed connection to the pool
+        """
+        # Never hand out a connection part way through a transaction
+        if conn.in_transaction:
+            conn.rollback()
+
+        with self._condition:
+            if self._closed:
+                conn.close()
+                self._open_count -= 1
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrows a connection for the duration of the with block
+        If this thread already holds a connection, that one is reused
+        """
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self.stats.reentries += 1
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self.acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self.release(conn)
+
+    def is_nested(self):
+        """
+        Returns True if the calling thread is inside a nested connection block
+        """
+        return getattr(self._local, "depth", 0) > 1
+
+    def close(self):
+        """
+        Closes every idle connection. Borrowed connections are closed as they are returned
+        """
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                conn.close()
+                self._open_count -= 1
+            self._condition.notify_all()
+
+def is_busy_error(error: Exception):
+    """
+    Returns True if an error is sqlite reporting that another connection holds the lock it needs
+    """
+    return isinstance(error, sql.OperationalError) and ("locked" in str(error) or "busy" in str(error))
+
+############################
+## class SerializedWriter ##
+############################
+# The one connection every write goes through
+
+class SerializedWriter:
+    """
+    Owns the single connection used for writing to a database file
+
+    Writers take turns behind a lock, and each outermost transaction is opened with BEGIN IMMEDIATE
+    so the sqlite write lock is claimed up front rather than part way through. Any reads a write makes
+    are inside the same transaction, so a read-modify-write can never be interleaved with another process.
+    If another process holds the write lock for longer than the busy timeout, beginning is retried a bounded
+    number of times, after a randomised exponential backoff so that waiting processes do not retry in step.
+    The lock is reentrant, so a write that calls other writes (or reads) on the same thread shares its transaction.
+    """
+    def __init__(self, db_path, pragmas: list[str] = None, retries: int = 5, retry_delay: float = 0.05, cached_statements: int = 128, factory=sql.Connection):
+        self._db_path = db_path
+        self._factory = factory
+        self._pragmas = pragmas if pragmas else []
+        self._cached_statements = cached_statements
+        self._retries = retries
+        self._retry_delay = retry_delay
+
+        self._conn = None
+        self._lock = threading.RLock()
+        self._owner = None
+        self._depth = 0
+
+        self.transactions = 0
+        self.retries = 0
+        # Time spent backing off between retries, and writes that gave up after the last retry
+        self.retry_time = 0.0
+        self.busy_failures = 0
+
+    def _connect(self):
+        # Opened lazily so read only users of a Database never hold a writer connection
+        if self._conn is None:
+            self._conn = sql.connect(self._db_path, check_same_thread=False, cached_statements=self._cached_statements, factory=self._factory)
+            self._conn.row_factory = sql.Row
+            for pragma in self._pragmas:
+                self._conn.execute(f"PRAGMA {pragma}")
+        return self._conn
+
+    def held_by_current_thread(self):
+        """
+        Returns True if the calling thread is inside a write transaction
+        """
+        return self._owner == threading.get_ident()
+
+    def _begin(self, conn: sql.Connection):
+        """
+        Opens a write transaction, retrying if the database stays locked by another process
+        """
+        for attempt in range(self._retries + 1):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sql.OperationalError as e:
+                if not is_busy_error(e):
+                    raise
+                if attempt == self._retries:
+                    self.busy_failures += 1
+                    raise
+                self.retries += 1
+                # Full jitter: anywhere up to the exponential delay
+                delay = random.uniform(0, self._retry_delay * (2 ** attempt))
+                self.retry_time += delay
+                time.sleep(delay)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Holds the writer for the duration of the with block, inside a single transaction
+        The transaction is committed (or rolled back on error) when the outermost block exits
+        """
+        with self._lock:
+            if self._depth > 0:
+                self._depth += 1
+                try:
+                    yield self._conn
+                finally:
+                    self._depth -= 1
+                return
+
+            conn = self._connect()
+            self._begin(conn)
+            self._owner = threading.get_ident()
+            self._depth = 1
+            try:
+                yield conn
+                conn.commit()
+                self.transactions += 1
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                self._owner = None
+                self._depth = 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
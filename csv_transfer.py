@@ -0,0 +1,190 @@
+import argparse
+import csv
+import itertools
+import sys
+
+import data_structures as ds
+import utils as valid
+from database import Database
+
+#######################
+## CSV import/export ##
+#######################
+# Moves whole tables in and out of the database as csv files.
+# Both directions work a chunk of rows at a time, so memory use does not grow with the size of the table
+
+EXPORT_TABLES = ("stock_data", "location_data", "current_inventory", "activity_logs", "stock_quantity")
+
+# Logs are only ever written by the database itself, and stock_quantity is calculated,
+# so only these tables can be imported
+IMPORT_TABLES = ("stock_data", "location_data", "current_inventory")
+
+class ImportResult:
+    """
+    Holds the number of rows imported, and the line number and reason for every rejected row
+    """
+    def __init__(self):
+        self.added = 0
+        self.rejected = []
+
+    def reject(self, line: int, msg: str):
+        self.rejected.append((line, msg))
+
+    def summary(self):
+        text = f"{self.added} rows imported, {len(self.rejected)} rejected"
+        for line, msg in self.rejected[:10]:
+            text += f"\nLine {line}: {msg}"
+        if len(self.rejected) > 10:
+            text += f"\n...and {len(self.rejected) - 10} more"
+        return text
+
+def export_table(db: Database, table: str, out_file, chunk_size: int = 1000) -> int:
+    """
+    Writes every row of a table to an open csv file, header first
+    Returns the number of rows written
+    """
+    if table not in EXPORT_TABLES:
+        raise Exception(f"Table {table} cannot be exported")
+
+    rows = db.stream_table(table, chunk_size)
+    writer = csv.writer(out_file)
+    writer.writerow(next(rows))
+
+    count = 0
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        writer.writerows(chunk)
+        count += len(chunk)
+    return count
+
+def import_table(db: Database, table: str, in_file, chunk_size: int = 1000) -> ImportResult:
+    """
+    Reads rows from an open csv file and adds them to a table in batches of chunk_size
+    Rows are normalised and validated the same way as the entry popups do
+    """
+    if table not in IMPORT_TABLES:
+        raise Exception(f"Table {table} cannot be imported")
+
+    result = ImportResult()
+    reader = csv.DictReader(in_file)
+    # The header is line 1, so data starts on line 2
+    numbered_rows = enumerate(reader, start=2)
+
+    while True:
+        chunk = list(itertools.islice(numbered_rows, chunk_size))
+        if not chunk:
+            break
+
+        lines = []
+        dtos = []
+        for line, row in chunk:
+            dto = row_to_dto(table, row, result, line)
+            if dto is not None:
+                lines.append(line)
+                dtos.append(dto)
+
+        outcomes = db.bulk_add(dtos)
+        # A busy database adds nothing from the chunk, so every row in it is rejected with the same message
+        if isinstance(outcomes, valid.MsgBoxGenerator):
+            outcomes = [outcomes] * len(dtos)
+
+        for line, outcome in zip(lines, outcomes):
+            if outcome is True:
+                result.added += 1
+            else:
+                result.reject(line, outcome.message)
+
+    return result
+
+def row_to_dto(table: str, row: dict, result: ImportResult, line: int):
+    """
+    Normalises a csv row and converts it to the matching data object
+    Returns None, and records the reason on result, if the row is invalid
+    """
+    validity_log = valid.ValidityCheck()
+
+    # Missing columns are read as None, so treat them as blank
+    params = valid.normalise_params({key: (value if value else "") for key, value in row.items() if key})
+
+    match table:
+        case "stock_data":
+            name = params.get("name", "")
+            restock_quantity = params.get("restock_quantity", "")
+            if not valid.is_valid_name(name):
+                validity_log.error(f"Stock name {name} is invalid")
+            elif not valid.is_valid_name_length(name):
+                validity_log.error(f"Stock name {name} is longer than {valid.MAX_NAME_LENGTH} characters")
+            if not valid.is_valid_num(restock_quantity):
+                validity_log.error(f"Restock quantity {restock_quantity} is invalid")
+            dto = ds.StockData(name=name, restock_quantity=restock_quantity)
+        case "location_data":
+            name = params.get("name", "")
+            if not valid.is_valid_name(name):
+                validity_log.error(f"Location name {name} is invalid")
+            elif not valid.is_valid_name_length(name):
+                validity_log.error(f"Location name {name} is longer than {valid.MAX_NAME_LENGTH} characters")
+            dto = ds.LocationData(name=name)
+        case "current_inventory":
+            stock_name = params.get("stock_name", "")
+            location_name = params.get("location_name", "")
+            # Accept the exported column name as well as the shorter one
+            quantity = params.get("quantity", params.get("current_quantity", ""))
+            if not valid.is_valid_name(stock_name):
+                validity_log.error(f"Stock name {stock_name} is invalid")
+            elif not valid.is_valid_name_length(stock_name):
+                validity_log.error(f"Stock name {stock_name} is longer than {valid.MAX_NAME_LENGTH} characters")
+            if not valid.is_valid_name(location_name):
+                validity_log.error(f"Location name {location_name} is invalid")
+            elif not valid.is_valid_name_length(location_name):
+                validity_log.error(f"Location name {location_name} is longer than {valid.MAX_NAME_LENGTH} characters")
+            if not valid.is_valid_num(quantity):
+                validity_log.error(f"Quantity {quantity} is invalid")
+            dto = ds.InventoryData(stock_type=ds.StockData(name=stock_name), location=ds.LocationData(name=location_name), quantity=quantity)
+
+    if not validity_log.success:
+        result.reject(line, validity_log.msg)
+        return None
+    return dto
+
+def main(argv=None):
+    """
+    Headless entry point, e.g. python csv_transfer.py export activity_logs logs.csv
+    """
+    parser = argparse.ArgumentParser(description="Import or export database tables as csv")
+    parser.add_argument("direction", choices=["import", "export"])
+    parser.add_argument("table", choices=EXPORT_TABLES)
+    parser.add_argument("path", help="csv file to read from or write to. Use - for stdin/stdout")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--test-data", action="store_true", help="use the test database")
+    parser.add_argument("--data-dir", help="directory holding the database, instead of the user data directory")
+    args = parser.parse_args(argv)
+
+    if args.direction == "import" and args.table not in IMPORT_TABLES:
+        parser.error(f"{args.table} cannot be imported")
+
+    db = Database(test_data=args.test_data, data_dir=args.data_dir)
+    try:
+        if args.direction == "export":
+            if args.path == "-":
+                count = export_table(db, args.table, sys.stdout, args.chunk_size)
+            else:
+                with open(args.path, "w", newline="") as f:
+                    count = export_table(db, args.table, f, args.chunk_size)
+            print(f"{count} rows exported", file=sys.stderr)
+        else:
+            if args.path == "-":
+                result = import_table(db, args.table, sys.stdin, args.chunk_size)
+            else:
+                with open(args.path, newline="") as f:
+                    result = import_table(db, args.table, f, args.chunk_size)
+            print(result.summary(), file=sys.stderr)
+            return 1 if result.rejected else 0
+    finally:
+        db.close()
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,56 +1,213 @@
 from datetime import datetime
-import tkinter as tk
 
 #######################
 ## class CreateDb ##
 #######################
 # The function to create database entries and the classes to hold the information for them
+# The classes use __slots__ rather than a per-instance __dict__, as bulk imports create a great many of them
 
 class SqlData:
     """
     Blank class that classes whose job it is to pass data between the ui and the database can inherit from
+    Subclasses list their fields in _fields, which are what __eq__ compares and __repr__ shows
+    As they compare by value, only frozen data objects can be hashed, e.g. to be used as dict keys
     """
-    pass
+    __slots__ = ()
+    _fields = ()
+    # The read only version of the class, set by _make_frozen, which also marks it with _is_frozen_type
+    _frozen_type = None
+    _is_frozen_type = False
 
+    def __eq__(self, other):
+        if not isinstance(other, SqlData) or other._base_type() is not self._base_type():
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self._fields)
+
+    def __repr__(self):
+        values = ", ".join(f"{field[1:].removesuffix('_value')}={getattr(self, field)!r}" for field in self._fields)
+        return f"{self._base_type().__name__}({values})"
+
+    # A mutable object's hash would change along with its values, so only frozen ones are given a hash, see _make_frozen
+    __hash__ = None
+
+    @classmethod
+    def _base_type(cls):
+        """
+        Returns the mutable class, for either version of a data class
+        """
+        return cls.__mro__[1] if cls._is_frozen_type else cls
+
+    def freeze(self):
+        """
+        Makes this object read only in place, and returns it
+        Nested data objects are frozen too
+        """
+        for field in self._fields:
+            value = getattr(self, field)
+            if isinstance(value, SqlData):
+                value.freeze()
+        # The frozen type adds no slots, so the object's class can simply be swapped
+        object.__setattr__(self, "__class__", self._base_type()._frozen_type)
+        return self
+
+    def is_frozen(self):
+        return type(self)._is_frozen_type
+
+def _frozen_setattr(self, name, value):
+    raise AttributeError(f"{type(self).__name__} is frozen and cannot be changed")
+
+def _frozen_hash(self):
+    return hash((self._base_type(),) + tuple(getattr(self, field) for field in self._fields))
+
+def _make_frozen(cls):
+    """
+    Class decorator that creates the read only version of a data class
+    It adds no slots, so freeze() can swap an object over to it without copying
+    """
+    cls._frozen_type = type(f"Frozen{cls.__name__}", (cls,), {
+        "__slots__": (),
+        "_is_frozen_type": True,
+        "__setattr__": _frozen_setattr,
+        "__delattr__": _frozen_setattr,
+        "__hash__": _frozen_hash,
+    })
+    return cls
+
+@_make_frozen
 class StockData(SqlData):
     """
     Passes data on stock types between the ui and the database
     """
+    __slots__ = ("_id", "_name", "_restock_quantity")
+    _fields = __slots__
+
     def __init__(self, restock_quantity: str = None, id_str: str = None, name: str = None):
         self._id = id_str
         self._name = name
         self._restock_quantity = restock_quantity
 
+    @classmethod
+    def from_row(cls, row):
+        """
+        Builds the data object from a stock_data row
+        """
+        return cls(id_str=row["id"], name=row["name"], restock_quantity=row["restock_quantity"])
+
+    def to_params(self):
+        """
+        Returns the values to insert as (id, name, restock_quantity)
+        """
+        return (self._id, self._name, self._restock_quantity)
+
+@_make_frozen
 class LocationData(SqlData):
     """
     Passes data on locations between the ui and the database
     """
+    __slots__ = ("_id", "_name")
+    _fields = __slots__
+
     def __init__(self, name: str = None, id_str: str = None):
         self._id = id_str
         self._name = name
 
+    @classmethod
+    def from_row(cls, row):
+        """
+        Builds the data object from a location_data row
+        """
+        return cls(id_str=row["id"], name=row["name"])
+
+    def to_params(self):
+        """
+        Returns the values to insert as (id, name)
+        """
+        return (self._id, self._name)
+
+@_make_frozen
 class InventoryData(SqlData):
     """
     Passes data on current inventory between the ui and the database
+    The nested location and stock type are only created when first used
     """
+    __slots__ = ("_id", "_location_value", "_stock_type_value", "_quantity")
+    _fields = ("_id", "_location", "_stock_type", "_quantity")
+
     def __init__(self, id_str: str = None, location: LocationData = None, stock_type: StockData = None, quantity: str = None):
         self._id = id_str
-        self._location = location if location else LocationData()
-        self._stock_type = stock_type if stock_type else StockData()
+        self._location_value = location
+        self._stock_type_value = stock_type
         self._quantity = quantity
 
+    @property
+    def _location(self):
+        if self._location_value is None:
+            # A frozen object still gets its (frozen) default, so set it past __setattr__
+            default = LocationData()
+            object.__setattr__(self, "_location_value", default.freeze() if self.is_frozen() else default)
+        return self._location_value
+
+    @_location.setter
+    def _location(self, value: LocationData):
+        self._location_value = value
+
+    @property
+    def _stock_type(self):
+        if self._stock_type_value is None:
+            default = StockData()
+            object.__setattr__(self, "_stock_type_value", default.freeze() if self.is_frozen() else default)
+        return self._stock_type_value
+
+    @_stock_type.setter
+    def _stock_type(self, value: StockData):
+        self._stock_type_value = value
+
+    def freeze(self):
+        # Fill in the nested defaults first, so they are frozen with the rest of the object
+        self._location
+        self._stock_type
+        return super().freeze()
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Builds the data object from a fetched current_inventory row, which has the stock and location names
+        """
+        return cls(
+            id_str=row["id"],
+            location=LocationData(name=row["location_name"]),
+            stock_type=StockData(name=row["stock_name"]),
+            quantity=row["current_quantity"]
+        )
+
+    def to_params(self):
+        """
+        Returns the values to insert as (id, stock_name, location_name, quantity)
+        """
+        return (self._id, self._stock_type._name, self._location._name, self._quantity)
+
+@_make_frozen
 class QuantityData(SqlData):
     """
     Passes data on current stock quantity query between the ui and the database
     """
+    __slots__ = ("_stock_name", "_location_name")
+    _fields = __slots__
+
     def __init__(self, stock_name: str = None, location_name: str = None):
         self._stock_name = stock_name
         self._location_name = location_name
 
+@_make_frozen
 class LogData(SqlData):
     """
     Passes data on log query between the ui and the database
+    If no date is given, the time is taken when the date is first read rather than on creation
     """
+    __slots__ = ("_id", "_instance_id", "_stock_name", "_stock_id", "_location_name", "_location_id", "_activity_type", "_update_details", "_quantity_change", "_date_occured_value")
+    # Compare the stored date, so comparing two logs never makes up a date for either
+    _fields = __slots__
+
     def __init__(self, id_str: str = None, instance_id: str = None, stock_name: str = None, stock_id:str = None, location_name: str = None, location_id: str = None, activity_type: str = None, update_details: str = None, quantity_change: str = None, date_occured:str = None):
         self._id = id_str
         self._instance_id = instance_id
@@ -61,4 +218,40 @@ class LogData(SqlData):
         self._activity_type = activity_type
         self._update_details = update_details
         self._quantity_change = quantity_change
-        self._date_occured = date_occured if date_occured else datetime.now().strftime("%Y-%m-%d %H:%M%S")
+        self._date_occured_value = date_occured if date_occured else None
+
+    @property
+    def _date_occured(self):
+        if self._date_occured_value is None:
+            object.__setattr__(self, "_date_occured_value", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        return self._date_occured_value
+
+    @_date_occured.setter
+    def _date_occured(self, value: str):
+        self._date_occured_value = value
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Builds the data object from an activity_logs row
+        """
+        return cls(
+            id_str=row["id"], instance_id=row["instance_id"],
+            stock_name=row["stock_name"], stock_id=row["stock_id"],
+            location_name=row["location_name"], location_id=row["location_id"],
+            activity_type=row["activity_type"], update_details=row["update_details"],
+            quantity_change=row["quantity_change"], date_occured=row["date_occured"]
+        )
+
+    def to_params(self):
+        """
+        Returns the values to insert as
+        (instance_id, stock_id, stock_name, location_id, location_name, activity_type, update_details, quantity_change)
+        """
+        return (
+            self._instance_id, self._stock_id, self._stock_name, self._location_id, self._location_name,
+            self._activity_type,
+            # Match the column defaults for anything not given
+            self._update_details if self._update_details else "N/A",
+            self._quantity_change if self._quantity_change else None
+        )
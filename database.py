@@ -1,18 +1,194 @@
+import functools
 import sqlite3 as sql
+import threading
 from contextlib import contextmanager
+from operator import itemgetter
 import data_structures as ds
-from tkinter import messagebox
 
 from platformdirs import user_data_dir
 import sqlite3 as sql
 from pathlib import Path
-from utils import MsgBoxGenerator
+from utils import MsgBoxGenerator, MAX_NAME_LENGTH, is_valid_name_length, is_valid_num
+from connection_pool import ConnectionPool, SerializedWriter, is_busy_error
+from name_cache import NameCache
+from archive import LogArchive, LOG_COLUMNS, month_start
+from profiler import Profiler, profiled
+from change_events import ChangeBus, ChangeEvent, ChangePoller, changes_from_log
+import migrations
 
 _G_CREATE_STR = "add"
 _G_READ_STR = "read"
 _G_UPDATE_STR = "update"
 _G_DELETE_STR = "delete"
 
+########################
+## class QueryBuilder ##
+########################
+# Compiled fetch queries, so each combination of filters is only ever turned into sql once
+
+class QueryBuilder:
+    """
+    Builds a select query from a base query and a fixed list of optional filter clauses
+
+    The filters in use (and the paging options) form a bitmask, and the sql for each mask is compiled
+    once and memoised. Every call with the same filters therefore produces exactly the same sql string,
+    which lets sqlite's per-connection statement cache reuse the prepared statement.
+    """
+    def __init__(self, base: str, filters: list[str], suffix: str = "", page_column: str = None):
+        self._base = base
+        self._filters = filters
+        self._suffix = suffix
+        self._page_column = page_column
+        self._compiled = {}
+        self.hits = 0
+        self.misses = 0
+
+    def build(self, values: list, after_id: int = None, page_size: int = None, descending: bool = False):
+        """
+        Returns the sql and parameters for the given filter values, one per filter clause
+        A filter is only applied if its value is not None. Clauses with several parameters take a tuple of values
+        """
+        mask = 0
+        params = []
+        for bit, value in enumerate(values):
+            if value is not None:
+                mask |= 1 << bit
+                if isinstance(value, tuple):
+                    params.extend(value)
+                else:
+                    params.append(value)
+
+        if self._page_column is not None:
+            # Paging takes the bits after the filters
+            shift = len(self._filters)
+            mask |= (after_id is not None) << shift | (page_size is not None) << (shift + 1) | bool(descending) << (shift + 2)
+            if after_id is not None:
+                params.append(after_id)
+            if page_size is not None:
+                params.append(page_size)
+
+        query = self._compiled.get(mask)
+        if query is None:
+            self.misses += 1
+            query = self._compile(mask)
+            self._compiled[mask] = query
+        else:
+            self.hits += 1
+        return query, tuple(params)
+
+    def _compile(self, mask: int):
+        query = self._base
+        for bit, clause in enumerate(self._filters):
+            if mask & (1 << bit):
+                query += f" AND {clause}"
+        query += self._suffix
+
+        if self._page_column is not None:
+            # Paging on the id (rather than with OFFSET) means every page costs the same, however far in it is
+            shift = len(self._filters)
+            descending = mask & (1 << (shift + 2))
+            if mask & (1 << shift):
+                query += f" AND {self._page_column} {'<' if descending else '>'} ?"
+            query += f" ORDER BY {self._page_column} {'DESC' if descending else 'ASC'}"
+            if mask & (1 << (shift + 1)):
+                query += " LIMIT ?"
+        return query
+
+    def copy(self):
+        """
+        Returns a builder for the same query, with its own compiled queries and counts
+        """
+        return QueryBuilder(self._base, self._filters, self._suffix, self._page_column)
+
+    def stats(self):
+        return {"compiled": len(self._compiled), "hits": self.hits, "misses": self.misses}
+
+#######################
+## class TupleResult ##
+#######################
+# Fetch results as plain tuples, for callers that only need a few of the columns
+
+class TupleResult(list):
+    """
+    A list of result rows as plain tuples, with a map from each column name to its index in the tuples
+    """
+    def __init__(self, rows: list, columns: dict):
+        super().__init__(rows)
+        self.columns = columns
+
+    def project(self, *names: str):
+        """
+        Returns the rows as tuples of only the named columns, in the order given
+        """
+        if len(names) == 1:
+            index = self.columns[names[0]]
+            return [(row[index],) for row in self]
+        return list(map(itemgetter(*(self.columns[name] for name in names)), self))
+
+# The formats every fetch method can return its results in
+RESULT_FORMATS = ("dicts", "tuples", "iter", "columns")
+
+# How names given to the fetch methods are matched
+#   exact - the whole name must match
+#   prefix - names starting with the given text match, found with a range scan on the name index
+#   fuzzy - names containing the given text anywhere match, ignoring case, found with the trigram name search indexes
+SEARCH_MODES = ("exact", "prefix", "fuzzy")
+
+# Sorts after any character a name can contain, so name < prefix + _PREFIX_END holds for every name starting with prefix
+_PREFIX_END = "\U0010FFFF"
+
+# The trigram indexes can only look up text of at least this many characters
+_FUZZY_MIN_LENGTH = 3
+
+def name_filter(name: str, search: str):
+    """
+    Returns the (exact, prefix, fuzzy) filter values to pass to a QueryBuilder for a name search
+    Fuzzy searches for text too short for the trigram indexes are run as prefix searches instead, as
+    matching them anywhere in a name would mean scanning every name
+    """
+    if search not in SEARCH_MODES:
+        raise Exception(f"Unrecognised search mode {search}")
+    if not name:
+        return None, None, None
+    if search == "fuzzy" and len(name) >= _FUZZY_MIN_LENGTH:
+        # Quoted as a phrase, so the text is matched as it is rather than read as a query
+        return None, None, '"' + name.replace('"', '""') + '"'
+    if search != "exact":
+        return None, (name, name + _PREFIX_END), None
+    return name, None, None
+
+def name_matcher(name: str, search: str):
+    """
+    Returns a function that checks a name against a search the same way the name filters do, for results
+    that are filtered in python rather than sql. Fuzzy searches match anywhere in the name, ignoring case
+    """
+    if search not in SEARCH_MODES:
+        raise Exception(f"Unrecognised search mode {search}")
+    if not name:
+        return lambda candidate: True
+    if search == "fuzzy" and len(name) >= _FUZZY_MIN_LENGTH:
+        folded = name.casefold()
+        return lambda candidate: folded in candidate.casefold()
+    if search != "exact":
+        return lambda candidate: candidate.startswith(name)
+    return lambda candidate: candidate == name
+
+def reports_busy(method):
+    """
+    Decorator for the Database write methods, that returns a message for the gui rather than raising if the
+    database stayed locked by another terminal for the whole busy timeout and every retry
+    """
+    @functools.wraps(method)
+    def guarded(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except sql.OperationalError as e:
+            if not is_busy_error(e):
+                raise
+            return self.busy_popup()
+
+    return guarded
+
 class Database:
     _add_log_string = 'Created'
     _delete_log_string = 'Removed'
@@ -31,8 +207,80 @@ class Database:
             WHERE 1=1
         """
 
-    def __init__(self, test_data = False):
-        if test_data:
+    # Name filters come in threes: an exact match, a prefix match written as a range so it can use the name index,
+    # and a fuzzy match against the name's trigram search index
+    # A prefix range comes back in name order, so results are put back in id order to match the other searches
+    _stock_query = QueryBuilder(
+        "SELECT * FROM stock_data WHERE 1=1",
+        ["id = ?", "name = ?", "name >= ? AND name < ?", "id IN (SELECT rowid FROM stock_name_search WHERE name MATCH ?)"],
+        " ORDER BY id"
+    )
+
+    _location_query = QueryBuilder(
+        "SELECT * FROM location_data WHERE 1=1",
+        ["id = ?", "name = ?", "name >= ? AND name < ?", "id IN (SELECT rowid FROM location_name_search WHERE name MATCH ?)"],
+        " ORDER BY id"
+    )
+
+    _inventory_query = QueryBuilder(
+        _fetch_inventory_query,
+        [
+            "current_inventory.id = ?",
+            "location_data.name = ?", "location_data.name >= ? AND location_data.name < ?",
+            "current_inventory.location_id IN (SELECT rowid FROM location_name_search WHERE name MATCH ?)",
+            "stock_data.name = ?", "stock_data.name >= ? AND stock_data.name < ?",
+            "current_inventory.stock_id IN (SELECT rowid FROM stock_name_search WHERE name MATCH ?)",
+        ],
+        page_column="current_inventory.id"
+    )
+
+    # For each stock type, sum the current quantities of every stock instance of that type
+    _quantity_query = QueryBuilder(
+        """
+            SELECT
+                stock_data.id AS id,
+                stock_data.name AS name,
+                stock_data.restock_quantity as restock_quantity,
+                COALESCE(SUM(current_inventory.current_quantity),0) AS total_quantity
+            FROM
+                stock_data
+            LEFT JOIN current_inventory ON current_inventory.stock_id = stock_data.id
+            WHERE 1=1
+        """,
+        ["stock_data.name = ?", "current_inventory.location_id = (SELECT id FROM location_data WHERE name = ?)"],
+        suffix=" GROUP BY stock_data.id, stock_data.name, stock_data.restock_quantity"
+    )
+
+    # Shared by the main log query and the queries on each attached archive
+    _log_filters = [
+        "stock_id = ?", "location_id = ?", "activity_type = ?", "update_details = ?", "quantity_change = ?",
+        "stock_name = ?", "stock_name >= ? AND stock_name < ?",
+        "stock_name IN (SELECT name FROM log_names WHERE id IN (SELECT rowid FROM log_name_search WHERE name MATCH ?))",
+        "location_name = ?", "location_name >= ? AND location_name < ?",
+        "location_name IN (SELECT name FROM log_names WHERE id IN (SELECT rowid FROM log_name_search WHERE name MATCH ?))",
+        "date_occured >= ?", "date_occured < ?",
+    ]
+
+    _log_query = QueryBuilder("SELECT * FROM activity_logs WHERE 1=1", _log_filters, page_column="id")
+
+    # Size of each connection's prepared statement cache. The compiled queries keep the number of distinct statements small
+    _cached_statements = 256
+
+    # Applied once to every connection when it is first opened
+    # WAL lets readers carry on from the last commit while a write is in progress, and with WAL
+    # synchronous = NORMAL only syncs at checkpoints, which is still safe against application crashes
+    _connection_pragmas = [
+        "temp_store = MEMORY",
+        "cache_size = -8000",
+        "synchronous = NORMAL",
+        "wal_autocheckpoint = 1000",
+    ]
+
+    def __init__(self, test_data = False, pool_size: int = 5, pool_idle_timeout: float = 300.0, data_dir: Path = None, profile: bool = False, slow_query_ms: float = 100.0, slow_log_bytes: int = 1_000_000, busy_timeout_ms: int = 5000, write_retries: int = 5):
+        # data_dir may be given directly, e.g. so benchmarks can keep their own databases
+        if data_dir is not None:
+            data_dir = Path(data_dir)
+        elif test_data:
             data_dir = Path("./features/test_data")
         else:
         # Gets the user data directory, creates a directory to hold the database and gets a path to where the databse should be created 
@@ -40,56 +288,181 @@ class Database:
         data_dir.mkdir(parents=True, exist_ok=True)
         db_path = data_dir / "stock_database.db"
         self._db_path = db_path
+
+        # When profiling, every method call and statement is timed, and slow statements are logged next to the database
+        self._profiler = Profiler(slow_threshold_ms=slow_query_ms, slow_log_path=data_dir / "slow_queries.log", slow_log_bytes=slow_log_bytes) if profile else None
+        factory = self._profiler.connection_factory() if profile else sql.Connection
+
+        # How long sqlite waits for a lock held by another process before reporting the database busy
+        # A write that is still busy after that is retried write_retries times, backing off in between
+        pragmas = self._connection_pragmas + [f"busy_timeout = {int(busy_timeout_ms)}"]
+
+        self._pool = ConnectionPool(db_path, max_size=pool_size, idle_timeout=pool_idle_timeout, pragmas=pragmas, cached_statements=self._cached_statements, factory=factory)
+        self._writer = SerializedWriter(db_path, pragmas=pragmas, retries=write_retries, cached_statements=self._cached_statements, factory=factory)
+        self._names = NameCache()
+        self._archive = LogArchive(data_dir / "archives")
+        # The fetch queries above are only templates. Each Database compiles and counts its own,
+        # so query_cache_stats describes this object rather than every one in the process
+        self._stock_query = self._stock_query.copy()
+        self._location_query = self._location_query.copy()
+        self._inventory_query = self._inventory_query.copy()
+        self._quantity_query = self._quantity_query.copy()
+        self._log_query = self._log_query.copy()
+        # Rollup queries for each period, and log queries for each attached archive, keyed by its schema name
+        self._rollup_queries = {}
+        self._archive_queries = {}
+        # Every committed change made through this object is published here, see poll_changes for other terminals' changes
+        self.changes = ChangeBus()
+        self._poller = None
+        # The data_version and the newest log id when other terminals' changes were last looked for
+        # The version is read on a connection of its own, so looking for changes never waits on the writer
+        self._version_conn = None
+        self._version_lock = threading.Lock()
+        self._seen_version = None
+        self._seen_log_id = None
+        # Logs added through this object since a checkpoint was last looked for, see checkpoint_if_due
+        self._logs_since_checkpoint = 0
+        self._checkpointer = None
         self.initialise_db()
 
     def initialise_db(self):
         """
-        Runs the sql script found at ./dbs/db_sqlite_code.sql
-        Creates databases if they are not present in the user data directory
+        Brings the database schema up to date by applying any pending migrations from ./dbs/migrations
+        Creates the tables if they are not present in the user data directory
         """
-        # Find the path to the sql code for the database
-        path = Path(__file__).parent / "dbs/db_sqlite_code.sql"
-
-        conn = sql.connect(self._db_path)
-        sqlScript = ""
-        with open(path) as f:
-            sqlScript = f.read()
-        cursor = conn.cursor()
-        cursor.executescript(sqlScript)
-        conn.commit()
-        conn.close()
+        with self._pool.connection() as conn:
+            # The journal mode is stored in the database file, so this only has an effect the first time
+            conn.execute("PRAGMA journal_mode = WAL")
+            migrated = migrations.apply_migrations(conn)
+            # Warm the name cache so the first write does not have to
+            self._names.load(conn)
+            # The rollup migrations can only count the logs still in the main database
+            recount = migrated and self._archive.catalog(conn)
+        if recount:
+            self.rebuild_log_rollups()
 
     @contextmanager
     def get_database_connection(self):
-        conn = sql.connect(self._db_path)
-        # This row ensures that each row of a query is returned as a dictionary
-        conn.row_factory = sql.Row
+        """
+        Borrows a read connection from the pool for the duration of the with block
+        The transaction is committed (or rolled back on error) when the outermost block exits
+        """
+        # Reads made during a write use the writer, so they see the write's own changes
+        if self._writer.held_by_current_thread():
+            with self._writer.transaction() as conn:
+                yield conn
+            return
+
+        with self._pool.connection() as conn:
+            # Nested blocks share the outer block's connection, so leave the transaction to it
+            if self._pool.is_nested():
+                yield conn
+                return
+            try:
+                yield conn
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                raise e
+
+    @contextmanager
+    def get_write_connection(self):
+        """
+        Holds the single writer connection for the duration of the with block
+        Writes from every thread are serialized through it, each block in one BEGIN IMMEDIATE transaction
+        """
+        nested = self._writer.held_by_current_thread()
         try:
-            yield conn
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+            with self._writer.transaction() as conn:
+                if not nested:
+                    # Pick up any names changed by other terminals since this process last wrote
+                    self._names.check(conn)
+                    version_before = self._version_before_write()
+                yield conn
+        except BaseException:
+            # The cache may have been given changes that have just been rolled back
+            self._names.invalidate()
+            if not nested:
+                self.changes.rollback()
+            raise
+        # The changes are only published once the outermost block has committed them
+        if not nested:
+            self._skip_own_commit(version_before)
+            self.changes.commit()
+
+    def pool_stats(self):
+        """
+        Returns the hit/miss/wait statistics of the connection pool
+        """
+        stats = self._pool.stats.as_dict()
+        stats["open_connections"] = self._pool.size
+        stats["write_transactions"] = self._writer.transactions
+        stats["write_retries"] = self._writer.retries
+        stats["write_retry_time"] = self._writer.retry_time
+        stats["write_busy_failures"] = self._writer.busy_failures
+        stats["name_cache_loads"] = self._names.loads
+        return stats
+
+    def diagnostics(self):
+        """
+        Returns the profiler's timings along with the connection pool and query cache statistics
+        The timings are empty unless the database was opened with profile=True
+        """
+        report = self._profiler.snapshot() if self._profiler is not None else {"methods": {}, "statements": {}, "slow_queries": []}
+        report["profiling"] = self._profiler is not None
+        report["pool"] = self.pool_stats()
+        report["query_cache"] = self.query_cache_stats()
+        return report
 
+    def reset_diagnostics(self):
+        if self._profiler is not None:
+            self._profiler.reset()
+
+    def close(self):
+        """
+        Closes all pooled connections and the writer connection
+        """
+        if self._poller is not None:
+            self._poller.stop()
+            self._poller = None
+        if self._checkpointer is not None:
+            self._checkpointer.stop()
+            self._checkpointer = None
+        with self._version_lock:
+            if self._version_conn is not None:
+                self._version_conn.close()
+                self._version_conn = None
+        self._pool.close()
+        self._writer.close()
+
+    @profiled
     def check_restock(self):
         """
         Check if any items of stock need a restock
         Returns a list of items that need restocking
         """
-        # Use a blank datastructure to get the quantity of all stock
-        total_quantities = self.fetch_quantity_data(ds.QuantityData())
-        restock_list = []
-        for row in total_quantities:
-            if row["restock_quantity"] >= row["total_quantity"]:
-                restock_list.append(row)
-
-        return restock_list
+        # stock_totals is kept up to date by triggers, so this is an index lookup rather than a sum over every instance
+        query = """
+            SELECT
+                stock_data.id AS id,
+                stock_data.name AS name,
+                stock_data.restock_quantity AS restock_quantity,
+                stock_totals.total_quantity AS total_quantity
+            FROM
+                stock_totals
+            INNER JOIN stock_data ON stock_data.id = stock_totals.stock_id
+            WHERE stock_totals.needs_restock = 1
+            ORDER BY stock_totals.stock_id
+        """
+        with self.get_database_connection() as conn:
+            cur = conn.execute(query)
+            return [dict(row) for row in cur.fetchall()]
 
     ######################
     ## Add Data Methods ##
     ######################
+    @reports_busy
+    @profiled
     def add_data(self, data: ds.SqlData):
         """
         Helper to direct add queries to the correct subfunction
@@ -109,24 +482,26 @@ class Database:
         """
         if not data._name or not data._restock_quantity:
             return self.missing_data_popup()
-        
-        # Check to see if a name already exists. If it does, do not allow this operation
-        already_exists = self.fetch_data(ds.StockData(name=data._name))
-        if len(already_exists) > 0:
-            return MsgBoxGenerator(title="Name already exists", message="Another stock type already has that name.")
 
         # id may be inserted manually for testing purposes
         if data._id:
             fields = "(id, name, restock_quantity)"
             values = "(?,?,?)"
-            params = (data._id, data._name, data._restock_quantity)
+            params = data.to_params()
         else:
             fields = "(name, restock_quantity)"
             values = "(?,?)"
-            params = (data._name, data._restock_quantity)
+            params = data.to_params()[1:]
 
-        with self.get_database_connection() as conn:
+        with self.get_write_connection() as conn:
+            # Check to see if a name already exists. If it does, do not allow this operation
+            # This is checked inside the write so another writer cannot add the name in between
+            if self._names.stock_id(data._name) is not None:
+                return MsgBoxGenerator(title="Name already exists", message="Another stock type already has that name.")
             cur = conn.execute(f"INSERT INTO stock_data {fields} VALUES {values}", params)
+            self._names.add_stock(cur.lastrowid, data._name)
+            self._names.note_changes(1)
+            self.changes.record(ChangeEvent("stock", "added", cur.lastrowid, ("name", "restock_quantity")))
         return True
 
     def add_location_data(self, data: ds.LocationData):
@@ -136,23 +511,24 @@ class Database:
         if not data._name:
             return self.missing_data_popup()
         
-        # Check to see if a name already exists. If it does, do not allow this operation
-        already_exists = self.fetch_data(ds.LocationData(name=data._name))
-        if len(already_exists) > 0:
-            return MsgBoxGenerator(title="Name already exists", message="Another location already has that name.")
-        
         # id may be inserted manually for testing purposes
         if data._id:
             fields = "(id, name)"
             values = "(?,?)"
-            params = (data._id, data._name)
+            params = data.to_params()
         else:
             fields = "(name)"
             values = "(?)"
-            params = (data._name,)
+            params = data.to_params()[1:]
 
-        with self.get_database_connection() as conn:
+        with self.get_write_connection() as conn:
+            # Check to see if a name already exists. If it does, do not allow this operation
+            if self._names.location_id(data._name) is not None:
+                return MsgBoxGenerator(title="Name already exists", message="Another location already has that name.")
             cur = conn.execute(f"INSERT INTO location_data {fields} VALUES {values}", params)
+            self._names.add_location(cur.lastrowid, data._name)
+            self._names.note_changes(1)
+            self.changes.record(ChangeEvent("location", "added", cur.lastrowid, ("name",)))
         return True
 
     def add_inventory_data(self, data: ds.InventoryData):
@@ -160,206 +536,454 @@ class Database:
         Adds new stock instances to current_inventory
         """
 
-        stock_name = data._stock_type._name
-        location_name = data._location._name
-        initial_quantity = data._quantity
+        id, stock_name, location_name, initial_quantity = data.to_params()
 
         # ensure that all parameters are present
         # If any are missing, then show a warning and return
         if not stock_name or not location_name or not initial_quantity:
             return self.missing_data_popup()
-        
-        # Check that the name of the stock type and location is in the database
-        name_exists = self.fetch_data(ds.StockData(name=stock_name))
-        location_exists = self.fetch_data(ds.LocationData(name=location_name))
-
-        if len(name_exists) == 0 and len(location_exists) == 0:
-            return MsgBoxGenerator(title="Parameters not found", message="Name and location not present in database")
-        elif len(location_exists) == 0:
-            return MsgBoxGenerator(title="Parameters not found", message="Location not present in database")
-        elif len(name_exists) == 0:
-            return MsgBoxGenerator(title="Parameters not found", message="Stock type not present in database")
-        
-        # id may be inserted manually for testing purposes
-        if data._id:
-            fields = "(id, stock_id, location_id, current_quantity)"
-            values = "(?,(SELECT id FROM stock_data WHERE name = ?),(SELECT id FROM location_data WHERE name = ?), ?)"
-            params = (data._id, stock_name, location_name, initial_quantity)
-        else:
-            fields = "(stock_id, location_id, current_quantity)"
-            values = "((SELECT id FROM stock_data WHERE name = ?),(SELECT id FROM location_data WHERE name = ?), ?)"
-            params = (stock_name, location_name, initial_quantity)
 
-        query = f"""
-            INSERT INTO
-                current_inventory {fields}
-            VALUES {values}
-        """
-        with self.get_database_connection() as conn:
-            cur = conn.execute(query, params)
+        with self.get_write_connection() as conn:
+            # Check that the name of the stock type and location is in the database
+            stock_id = self._names.stock_id(stock_name)
+            location_id = self._names.location_id(location_name)
+
+            if stock_id is None and location_id is None:
+                return MsgBoxGenerator(title="Parameters not found", message="Name and location not present in database")
+            elif location_id is None:
+                return MsgBoxGenerator(title="Parameters not found", message="Location not present in database")
+            elif stock_id is None:
+                return MsgBoxGenerator(title="Parameters not found", message="Stock type not present in database")
+
+            # id may be inserted manually for testing purposes
+            if id:
+                fields = "(id, stock_id, location_id, current_quantity)"
+                values = "(?,?,?,?)"
+                params = (id, stock_id, location_id, initial_quantity)
+            else:
+                fields = "(stock_id, location_id, current_quantity)"
+                values = "(?,?,?)"
+                params = (stock_id, location_id, initial_quantity)
+
+            cur = conn.execute(f"INSERT INTO current_inventory {fields} VALUES {values}", params)
             # Log the new instance
-            # This gets the id of the newly generated instance by searching for
-            # the instance of stock_name with the highest id. This works
-            # because sqlite autoincrements the id each time.
-            id_str_list = conn.execute("SELECT id FROM current_inventory WHERE stock_id = (SELECT id FROM stock_data WHERE name = ?) ORDER BY id DESC", (stock_name,))
-            log_data = ds.LogData(instance_id=id_str_list.fetchall()[0][0],stock_name=stock_name, location_name=location_name, activity_type=self._add_log_string,update_details=None, quantity_change=initial_quantity)
+            log_data = ds.LogData(instance_id=cur.lastrowid, stock_id=stock_id, stock_name=stock_name, location_id=location_id, location_name=location_name, activity_type=self._add_log_string, update_details=None, quantity_change=initial_quantity)
             self.add_log_data(log_data, conn)
 
         return True
 
-    def add_log_data(self, data: ds.LogData, conn: sql.Connection):
+    _insert_log_query = """
+        INSERT INTO activity_logs
+            (instance_id, stock_id, stock_name, location_id, location_name, activity_type, update_details, quantity_change)
+        VALUES (?,?,?,?,?,?,?,?)
+    """
+
+    def add_log_data(self, data: ds.LogData, conn: sql.Connection, moved_from: tuple = None):
         """
-        Dynamically adds the relevant data to the activity_logs
-        Note that this must only be called when a database is active
+        Adds the relevant data to the activity_logs
+        Any of the stock and location ids or names that are missing are filled in from the name cache
+        moved_from is the (location_id, location_name, quantity) an instance held before it was moved, if it was
+        Note that this must only be called inside a write, on the writer connection
         """
-        # Gets the relevant keywords
-        fields_to_insert = "instance_id, stock_id, stock_name, location_id, location_name, activity_type"
-        instance_id_param = data._instance_id
-        # If there is no id, retrieve it
-        if not data._stock_id:
-            stock_id_param = data._stock_name
-            stock_id_query = "(SELECT id FROM stock_data WHERE name = ?)"
-        else:
-            stock_id_param = data._stock_id
-            stock_id_query = "?"
-
-        if not data._stock_name:
-            stock_name_param = data._stock_id
-            stock_name_query = "(SELECT name FROM stock_data WHERE id = ?)"
-        else:
-            stock_name_param = data._stock_name
-            stock_name_query = "?"
-        
-        if not data._location_id:
-            location_id_param = data._location_name
-            location_id_query = "(SELECT id FROM location_data WHERE name = ?)"
-        else:
-            location_id_param = data._location_id
-            location_id_query = "?"
-
-        if not data._location_name:
-            location_name_param = data._location_id
-            location_name_query = "(SELECT name FROM location_data WHERE id = ?)"
-        else:
-            location_name_param = data._location_name
-            location_name_query = "?"
-
-        values_to_insert = f"?,{stock_id_query},{stock_name_query},{location_id_query},{location_name_query},?"
-
-        params = [instance_id_param, stock_id_param, stock_name_param, location_id_param, location_name_param, data._activity_type]
-
-        if data._update_details:
-            fields_to_insert += ", update_details"
-            values_to_insert += ", ?"
-            params.append(data._update_details)
-
-        if data._quantity_change:
-            fields_to_insert += ", quantity_change"
-            values_to_insert += ", ?"
-            params.append(data._quantity_change)
-
-        query = f"INSERT INTO activity_logs ({fields_to_insert}) VALUES ({values_to_insert})"
+        instance_id, stock_id, stock_name, location_id, location_name, activity_type, update_details, quantity_change = data.to_params()
+        if not stock_id:
+            stock_id = self._names.stock_id(stock_name)
+        if not stock_name:
+            stock_name = self._names.stock_name(stock_id)
+        if not location_id:
+            location_id = self._names.location_id(location_name)
+        if not location_name:
+            location_name = self._names.location_name(location_id)
+
+        cur = conn.execute(self._insert_log_query, (
+            instance_id, stock_id, stock_name, location_id, location_name, activity_type, update_details, quantity_change
+        ))
+        if moved_from is not None:
+            conn.execute("INSERT INTO log_moves (log_id, from_location_id, from_location_name, from_quantity) VALUES (?,?,?,?)", (cur.lastrowid, *moved_from))
+        # Every change to an instance is logged, so its changes are all worked out from the log
+        for event in changes_from_log(cur.lastrowid, instance_id, stock_id, activity_type, update_details):
+            self.changes.record(event)
+        self._logs_since_checkpoint += 1
+
+    @reports_busy
+    @profiled
+    def bulk_add(self, items):
+        """
+        Adds many stock types, locations and stock instances in a single transaction
+        Items may be any mix of StockData, LocationData and InventoryData
+        Returns one result per item in the same order: True if it was added, otherwise a MsgBoxGenerator explaining why not
+        If the database stayed busy nothing is added, and a single busy MsgBoxGenerator is returned instead
+        """
+        items = list(items)
+        results = [None] * len(items)
+
+        stock_rows = []
+        location_rows = []
+        inventory_rows = []
+        log_rows = []
+
+        # The writer holds the write lock from the start, so the ids handed out below cannot be claimed by another writer
+        with self.get_write_connection() as conn:
+            # Names are checked against the name cache, rather than each row with its own query
+            next_stock_id = self._next_free_id(conn, "stock_data")
+            next_location_id = self._next_free_id(conn, "location_data")
+            next_inventory_id = self._next_free_id(conn, "current_inventory")
+            # The ids given out in this batch, so an explicit id cannot clash with a row added before it
+            used_ids = {"stock_data": set(), "location_data": set(), "current_inventory": set()}
+
+            # Stock types and locations are handled first, so instances can use names added in the same batch
+            for index, item in enumerate(items):
+                match item:
+                    case ds.StockData():
+                        if not item._name or not item._restock_quantity:
+                            results[index] = self.missing_data_popup()
+                        elif self._names.stock_id(item._name) is not None:
+                            results[index] = MsgBoxGenerator(title="Name already exists", message="Another stock type already has that name.")
+                        elif not is_valid_name_length(item._name):
+                            results[index] = self.name_too_long_popup()
+                        elif item._id and not is_valid_num(str(item._id)):
+                            results[index] = self.invalid_id_popup()
+                        elif item._id and self._id_taken(conn, "stock_data", int(item._id), used_ids):
+                            results[index] = MsgBoxGenerator(title="Id already exists", message="Another stock type already has that id.")
+                        else:
+                            new_id = int(item._id) if item._id else next_stock_id
+                            next_stock_id = max(next_stock_id, new_id + 1)
+                            used_ids["stock_data"].add(new_id)
+                            self._names.add_stock(new_id, item._name)
+                            stock_rows.append((new_id,) + item.to_params()[1:])
+                            results[index] = True
+                    case ds.LocationData():
+                        if not item._name:
+                            results[index] = self.missing_data_popup()
+                        elif self._names.location_id(item._name) is not None:
+                            results[index] = MsgBoxGenerator(title="Name already exists", message="Another location already has that name.")
+                        elif not is_valid_name_length(item._name):
+                            results[index] = self.name_too_long_popup()
+                        elif item._id and not is_valid_num(str(item._id)):
+                            results[index] = self.invalid_id_popup()
+                        elif item._id and self._id_taken(conn, "location_data", int(item._id), used_ids):
+                            results[index] = MsgBoxGenerator(title="Id already exists", message="Another location already has that id.")
+                        else:
+                            new_id = int(item._id) if item._id else next_location_id
+                            next_location_id = max(next_location_id, new_id + 1)
+                            used_ids["location_data"].add(new_id)
+                            self._names.add_location(new_id, item._name)
+                            location_rows.append((new_id,) + item.to_params()[1:])
+                            results[index] = True
+                    case ds.InventoryData():
+                        pass
+                    case _:
+                        raise Exception("Unrecognised type in bulk_add")
+
+            for index, item in enumerate(items):
+                if not isinstance(item, ds.InventoryData):
+                    continue
+
+                id, stock_name, location_name, initial_quantity = item.to_params()
+
+                if not stock_name or not location_name or not initial_quantity:
+                    results[index] = self.missing_data_popup()
+                    continue
+
+                stock_id = self._names.stock_id(stock_name)
+                location_id = self._names.location_id(location_name)
+                if stock_id is None and location_id is None:
+                    results[index] = MsgBoxGenerator(title="Parameters not found", message="Name and location not present in database")
+                    continue
+                elif location_id is None:
+                    results[index] = MsgBoxGenerator(title="Parameters not found", message="Location not present in database")
+                    continue
+                elif stock_id is None:
+                    results[index] = MsgBoxGenerator(title="Parameters not found", message="Stock type not present in database")
+                    continue
+
+                if id and not is_valid_num(str(id)):
+                    results[index] = self.invalid_id_popup()
+                    continue
+
+                if id and self._id_taken(conn, "current_inventory", int(id), used_ids):
+                    results[index] = MsgBoxGenerator(title="Id already exists", message="Another stock instance already has that id.")
+                    continue
+
+                new_id = int(id) if id else next_inventory_id
+                next_inventory_id = max(next_inventory_id, new_id + 1)
+                used_ids["current_inventory"].add(new_id)
+                inventory_rows.append((new_id, stock_id, location_id, initial_quantity))
+                log_rows.append(ds.LogData(
+                    instance_id=new_id, stock_id=stock_id, stock_name=stock_name, location_id=location_id,
+                    location_name=location_name, activity_type=self._add_log_string, quantity_change=initial_quantity
+                ).to_params())
+                results[index] = True
+
+            conn.executemany("INSERT INTO stock_data (id, name, restock_quantity) VALUES (?,?,?)", stock_rows)
+            conn.executemany("INSERT INTO location_data (id, name) VALUES (?,?)", location_rows)
+            self._names.note_changes(len(stock_rows) + len(location_rows))
+            conn.executemany("INSERT INTO current_inventory (id, stock_id, location_id, current_quantity) VALUES (?,?,?,?)", inventory_rows)
+            conn.executemany(self._insert_log_query, log_rows)
+            self._logs_since_checkpoint += len(log_rows)
+
+            # Too many rows may have been added to describe one at a time, so views reload the tables instead
+            for entity, action, rows in (
+                ("stock", "added", stock_rows), ("location", "added", location_rows), ("inventory", "added", inventory_rows),
+                ("quantity", "updated", inventory_rows), ("log", "added", log_rows)
+            ):
+                if rows:
+                    self.changes.record(ChangeEvent(entity, action))
+
+        return results
+
+    def _id_taken(self, conn: sql.Connection, table: str, id: int, used_ids: dict):
+        """
+        Checks whether an explicit id given to bulk_add is already in the table, or given to an earlier item in the batch
+        """
+        if id in used_ids[table]:
+            return True
+        return conn.execute(f"SELECT 1 FROM {table} WHERE id = ?", (id,)).fetchone() is not None
 
-        conn.execute(query, tuple(params))
+    def _next_free_id(self, conn: sql.Connection, table: str):
+        """
+        Finds the id sqlite would give the next row inserted into an autoincrement table
+        """
+        # Autoincrement never reuses an id, so the sequence has to be checked as well as the current rows
+        seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+        max_id = conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0]
+        return max(seq[0] if seq else 0, max_id if max_id else 0) + 1
             
     ########################
     ## Fetch Data Methods ##
     ########################
-    def fetch_data(self, data: ds.SqlData):
+    @profiled
+    def fetch_data(self, data: ds.SqlData, result_format: str = "dicts", search: str = "exact", **page_args):
         """
         Helper to divert fetch queries to the correct subfunction
+        result_format is one of RESULT_FORMATS, see run_fetch
+        search is one of SEARCH_MODES, and sets how names are matched
+        page_args (after_id, page_size, descending) are passed on to the inventory and log fetches, which support paging
         """
         match data:
             case ds.StockData():
-                return self.fetch_stock_data(data)
+                return self.fetch_stock_data(data, result_format, search)
             case ds.LocationData():
-                return self.fetch_location_data(data)
+                return self.fetch_location_data(data, result_format, search)
             case ds.InventoryData():
-                return self.fetch_inventory_data(data)
+                return self.fetch_inventory_data(data, result_format=result_format, search=search, **page_args)
             case ds.QuantityData():
-                return self.fetch_quantity_data(data)
+                return self.fetch_quantity_data(data, result_format)
             case ds.LogData():
-                return self.fetch_log_data(data)
+                return self.fetch_log_data(data, result_format=result_format, search=search, **page_args)
             case _:
                 raise Exception("Unrecognised type in fetch_data")
             
-    def fetch_stock_data(self, data: ds.StockData):
+    def fetch_stock_data(self, data: ds.StockData, result_format: str = "dicts", search: str = "exact"):
         """
-        Dynamically constructs a query to find the necessary data on known stock types
+        Finds the necessary data on known stock types, using the compiled query for the filters given
         """
-        query = """
-            SELECT
-                *
-            FROM
-                stock_data
-            WHERE 1=1
+        query, params = self._stock_query.build([data._id or None, *name_filter(data._name, search)])
+
+        return self.run_fetch(query, params, result_format)
+
+    def fetch_location_data(self, data: ds.LocationData, result_format: str = "dicts", search: str = "exact"):
         """
-        params = []
-        if data._id:
-            query += " AND id = ?"
-            params.append(data._id)
-        
-        if data._name:
-            query += " AND name = ?"
-            params.append(data._name)
+        Finds the necessary data on known locations, using the compiled query for the filters given
+        """
+        query, params = self._location_query.build([data._id or None, *name_filter(data._name, search)])
 
-        with self.get_database_connection() as conn:
-            cur = conn.execute(query, tuple(params))
-            return [dict(row) for row in cur.fetchall()]
+        return self.run_fetch(query, params, result_format)
 
-    def fetch_location_data(self, data: ds.LocationData):
+    def fetch_inventory_data(self, data: ds.InventoryData, after_id: int = None, page_size: int = None, descending: bool = False, result_format: str = "dicts", search: str = "exact"):
         """
-        Dynamically constructs a query to find the necessary data on known locations
+        Finds the necessary data on current inventory contents, using the compiled query for the filters given
+        If page_size is given, only that many rows are returned, starting after the row with id after_id
         """
-        query = """
-            SELECT
-                *
-            FROM
-                location_data
-            WHERE 1=1
+        # An empty string has always meant "any" for names here, but None is kept distinct for the id
+        query, params = self._inventory_query.build(
+            [data._id, *name_filter(data._location._name, search), *name_filter(data._stock_type._name, search)],
+            after_id=after_id, page_size=page_size, descending=descending
+        )
+
+        return self.run_fetch(query, params, result_format)
+        
+    def fetch_quantity_data(self, data: ds.QuantityData, result_format: str = "dicts"):
         """
-        params = []
-        if data._id:
-            query += " AND id = ?"
-            params.append(data._id)
+        Fetches data on current stock quantity filtered by type and location
+        """
+        query, params = self._quantity_query.build([data._stock_name or None, data._location_name or None])
 
-        if data._name:
-            query += " AND name = ?"
-            params.append(data._name)
+        return self.run_fetch(query, params, result_format)
+      
+    def fetch_log_data(self,data: ds.LogData, after_id: int = None, page_size: int = None, descending: bool = False, result_format: str = "dicts", search: str = "exact", start: str = None, end: str = None):
+        """
+        Fetches relevant logs from the activity logs database, and from any archives that could hold matching logs
+        If page_size is given, only that many rows are returned, starting after the row with id after_id
+        If start or end are given, only logs dated from start up to (but not including) end are returned
+        """
+        values = [
+            data._stock_id, data._location_id, data._activity_type, data._update_details, data._quantity_change,
+            *name_filter(data._stock_name, search), *name_filter(data._location_name, search),
+            start, end
+        ]
 
         with self.get_database_connection() as conn:
-            cur = conn.execute(query, tuple(params))
-            return [dict(row) for row in cur.fetchall()]
+            archives = self._archive.overlapping(conn, start, end, after_id, descending)
+        if archives:
+            return self._fetch_archived_logs(values, archives, after_id, page_size, descending, result_format)
+
+        query, params = self._log_query.build(values, after_id=after_id, page_size=page_size, descending=descending)
+        return self.run_fetch(query, params, result_format)
 
-    def fetch_inventory_data(self, data: ds.InventoryData):
+    def _fetch_archived_logs(self, values: list, archives: list, after_id: int, page_size: int, descending: bool, result_format: str):
         """
-        Dynamically constructs a query to find the necessary data on current inventory contents
+        Runs the log query over the main database and the given archives, attaching as many at a time as sqlite allows
+        The archives must be in the order their logs are read, so reading can stop once a full page has been found
+        Results are collected before they are returned, so the iter format does not stream here
         """
-        query = self._fetch_inventory_query
-        params = []
+        if result_format not in RESULT_FORMATS:
+            raise Exception(f"Unrecognised result format {result_format}")
+        direction = "DESC" if descending else "ASC"
+        rows = []
+        names = LOG_COLUMNS
 
-        if data._id is not None:
-            query += " AND current_inventory.stock_id = ?"
-            params.append(data._id)
+        with self.get_database_connection() as conn:
+            group_size = conn.getlimit(sql.SQLITE_LIMIT_ATTACHED)
+            for first in range(0, len(archives), group_size):
+                group = archives[first:first + group_size]
+                builders = [self._log_query] if first == 0 else []
+                builders += [self._archive_query(entry["period"]) for entry in group]
+
+                parts = []
+                params = []
+                for builder in builders:
+                    query, part_params = builder.build(values, after_id=after_id, page_size=page_size, descending=descending)
+                    parts.append(f"SELECT * FROM ({query})")
+                    params.extend(part_params)
+                query = " UNION ALL ".join(parts) + f" ORDER BY id {direction}"
+                if page_size is not None:
+                    query += " LIMIT ?"
+                    params.append(page_size)
+
+                self._archive.attach(conn, group)
+                try:
+                    cur = conn.cursor()
+                    cur.row_factory = None
+                    cur.execute(query, params)
+                    rows.extend(cur.fetchall())
+                    cur.close()
+                finally:
+                    self._archive.detach(conn, group)
+
+                # Stop once the page is full, and the remaining archives' logs all come after it
+                following = archives[first + group_size:]
+                if page_size is not None and len(rows) >= page_size and following:
+                    rows.sort(key=itemgetter(0), reverse=descending)
+                    last = rows[page_size - 1][0]
+                    if (following[0]["last_id"] < last) if descending else (following[0]["first_id"] > last):
+                        break
+
+        rows.sort(key=itemgetter(0), reverse=descending)
+        if page_size is not None:
+            rows = rows[:page_size]
+        return self._format_rows(rows, names, result_format)
+
+    def _archive_query(self, period: str):
+        alias = LogArchive.alias(period)
+        builder = self._archive_queries.get(alias)
+        if builder is None:
+            builder = self._archive_queries[alias] = QueryBuilder(f"SELECT * FROM {alias}.activity_logs WHERE 1=1", self._log_filters, page_column="id")
+        return builder
+
+    def run_fetch(self, query: str, params: tuple, result_format: str = "dicts"):
+        """
+        Runs a select query and returns its results in the given format:
+            dicts - a list with a dict per row
+            tuples - a TupleResult, a list of plain tuples with a column name to index map
+            iter - a generator of dicts, fetched from the database a chunk at a time as it is read
+            columns - a dict of column name to a list of that column's values
+        """
+        if result_format not in RESULT_FORMATS:
+            raise Exception(f"Unrecognised result format {result_format}")
+        if result_format == "iter":
+            return self._iter_fetch(query, params)
 
-        if data._location._name is not None :
-            query += " AND location_data.name = ?"
-            params.append(data._location._name)
+        with self.get_database_connection() as conn:
+            if result_format == "dicts":
+                cur = conn.execute(query, params)
+                return [dict(row) for row in cur.fetchall()]
+
+            # The other formats are built from plain tuples, which skips creating a Row object for every row
+            cur = conn.cursor()
+            cur.row_factory = None
+            cur.execute(query, params)
+            rows = cur.fetchall()
+            names = [column[0] for column in cur.description]
 
-        if data._stock_type._name is not None:
-            query += " AND stock_data.name = ?"
-            params.append(data._stock_type._name)
+        return self._format_rows(rows, names, result_format)
 
+    def _format_rows(self, rows: list, names: list, result_format: str):
+        """
+        Returns plain tuple rows in the given result format, see run_fetch
+        """
+        if result_format == "tuples":
+            return TupleResult(rows, {name: index for index, name in enumerate(names)})
+        if result_format in ("dicts", "iter"):
+            dicts = [dict(zip(names, row)) for row in rows]
+            return dicts if result_format == "dicts" else iter(dicts)
+        if rows:
+            return {name: list(values) for name, values in zip(names, zip(*rows))}
+        return {name: [] for name in names}
+
+    def _iter_fetch(self, query: str, params: tuple, chunk_size: int = 500):
+        """
+        Generator version of run_fetch. The connection is held until the generator is exhausted or closed
+        """
         with self.get_database_connection() as conn:
-            cur = conn.execute(query, tuple(params))
-            return [dict(row) for row in cur.fetchall()]
-        
-    def fetch_quantity_data(self, data: ds.QuantityData):
+            cur = conn.execute(query, params)
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield dict(row)
+
+    def query_cache_stats(self):
         """
-        Fetches data on current stock quantity filtered by type and location
+        Returns how often each of this object's fetch queries was served from its compiled query cache
         """
-        # For each stock type, sum the current quantities of every stock instance of that type
-        query = """
+        builders = {
+            "stock_data": self._stock_query,
+            "location_data": self._location_query,
+            "current_inventory": self._inventory_query,
+            "stock_quantity": self._quantity_query,
+            "activity_logs": self._log_query,
+        }
+        return {name: builder.stats() for name, builder in builders.items()}
+
+    ############################
+    ## Streaming Data Methods ##
+    ############################
+    # Queries used to export whole tables. Inventory is exported with names rather than ids so it can be imported elsewhere
+    _stream_queries = {
+        "stock_data": "SELECT id, name, restock_quantity FROM stock_data ORDER BY id",
+        "location_data": "SELECT id, name FROM location_data ORDER BY id",
+        "current_inventory": """
+            SELECT
+                current_inventory.id AS id,
+                stock_data.name AS stock_name,
+                location_data.name AS location_name,
+                current_inventory.current_quantity AS current_quantity
+            FROM
+                current_inventory
+            INNER JOIN location_data ON current_inventory.location_id = location_data.id
+            INNER JOIN stock_data ON current_inventory.stock_id = stock_data.id
+            ORDER BY current_inventory.id
+        """,
+        "activity_logs": """
+            SELECT
+                id, instance_id, stock_id, stock_name, location_id, location_name,
+                activity_type, update_details, quantity_change, date_occured
+            FROM activity_logs
+            ORDER BY id
+        """,
+        "stock_quantity": """
             SELECT
                 stock_data.id AS id,
                 stock_data.name AS name,
@@ -368,71 +992,438 @@ class Database:
             FROM
                 stock_data
             LEFT JOIN current_inventory ON current_inventory.stock_id = stock_data.id
-            WHERE 1=1
-        """
-        params = []
-        if data._stock_name:
-            query += " AND stock_data.name = ?"
-            params.append(data._stock_name)
-
-        if data._location_name:
-            query += " AND current_inventory.location_id = (SELECT id FROM location_data WHERE name = ?)"
-            params.append(data._location_name)
-
-        query += """
             GROUP BY stock_data.id, stock_data.name, stock_data.restock_quantity
+            ORDER BY stock_data.id
+        """,
+    }
+
+    def stream_table(self, table: str, chunk_size: int = 1000):
+        """
+        Generator that yields every row of a table as a plain tuple, fetching chunk_size rows at a time
+        The first item yielded is a tuple of the column names
+        The connection is held until the generator is exhausted or closed
         """
+        if table not in self._stream_queries:
+            raise Exception(f"Unrecognised table {table} in stream_table")
 
         with self.get_database_connection() as conn:
-            cur = conn.execute(query, tuple(params))
-            vals = cur.fetchall()
-            return [dict(row) for row in vals]
-      
-    def fetch_log_data(self,data: ds.LogData):
+            cur = conn.cursor()
+            # Plain tuples avoid building a Row object for every row
+            cur.row_factory = None
+            cur.execute(self._stream_queries[table])
+            yield tuple(column[0] for column in cur.description)
+            # Archived logs are older than any left in the main database, so come first
+            if table == "activity_logs":
+                for entry in self._archive.catalog(conn):
+                    yield from self._archive.stream(entry, self._stream_queries[table], chunk_size)
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+
+    ##########################
+    ## Log Archive Methods ##
+    ##########################
+    def archive_logs(self, before: str = None):
         """
-        Fetches relevant logs from the activity logs database
+        Moves every month of logs before the month of the date given (by default, the current month) to archive files
+        Archived logs are still returned by fetch_log_data, which reads the archives it needs
+        Returns a list of (period, number of logs archived) for each month archived
         """
-        query = """
+        cutoff = month_start(before)
+        with self.get_database_connection() as conn:
+            periods = self._archive.closed_periods(conn, cutoff)
+
+        archived = []
+        for period in periods:
+            # Copy first, from a read connection so writes carry on meanwhile, then record and delete in one write
+            with self.get_database_connection() as conn:
+                entry, copied_to = self._archive.copy_period(conn, period)
+            with self.get_write_connection() as conn:
+                archived.append((period, self._archive.record(conn, entry, copied_to)))
+        return archived
+
+    def log_archives(self):
+        """
+        Returns the catalog of archived months
+        """
+        with self.get_database_connection() as conn:
+            return self._archive.catalog(conn)
+
+    #########################
+    ## Log Rollup Methods ##
+    #########################
+    # log_daily_rollups holds the day by day totals of the logs, kept up to date by a trigger on activity_logs
+    # Rollups can be grouped into longer periods, named here along with the sql that groups their days
+    ROLLUP_PERIODS = {
+        "day": "day",
+        "month": "substr(day, 1, 7)",
+        "year": "substr(day, 1, 4)",
+        "all": "'all'",
+    }
+
+    # Names are matched the same way as for the logs, see _log_filters
+    _rollup_filters = [
+        "stock_id = ?", "location_id = ?",
+        "stock_name = ?", "stock_name >= ? AND stock_name < ?",
+        "stock_name IN (SELECT name FROM log_names WHERE id IN (SELECT rowid FROM log_name_search WHERE name MATCH ?))",
+        "location_name = ?", "location_name >= ? AND location_name < ?",
+        "location_name IN (SELECT name FROM log_names WHERE id IN (SELECT rowid FROM log_name_search WHERE name MATCH ?))",
+        "day >= date(?)", "day < date(?)",
+    ]
+
+    # Compiled rollup queries for each period are made when first used, and kept in self._rollup_queries
+
+    # The totals of a table of logs, and the statement that adds totals to the rollups
+    # An Updated log's change is the old quantity less the new, so it goes in when negative and out when positive.
+    # A move (see log_moves, given as {moves}) counts its whole quantity out of the old location, and what the
+    # instance then held in to the new one
+    _rollup_totals_query = """
+        SELECT day, stock_id, location_id, MAX(stock_name), MAX(location_name),
+            SUM(quantity_in), SUM(quantity_out), SUM(created_count), SUM(removed_count), SUM(updated_count)
+        FROM (
             SELECT
-                *
-            FROM 
-                activity_logs
-            WHERE 1=1
+                date(logs.date_occured) AS day, logs.stock_id, logs.location_id, logs.stock_name, logs.location_name,
+                CASE
+                    WHEN moves.log_id IS NOT NULL THEN moves.from_quantity - COALESCE(logs.quantity_change, 0)
+                    WHEN logs.activity_type = 'Created' THEN COALESCE(logs.quantity_change, 0)
+                    WHEN logs.activity_type = 'Updated' THEN MAX(-COALESCE(logs.quantity_change, 0), 0)
+                    ELSE 0
+                END AS quantity_in,
+                CASE
+                    WHEN moves.log_id IS NOT NULL THEN 0
+                    WHEN logs.activity_type = 'Removed' THEN COALESCE(logs.quantity_change, 0)
+                    WHEN logs.activity_type = 'Updated' THEN MAX(COALESCE(logs.quantity_change, 0), 0)
+                    ELSE 0
+                END AS quantity_out,
+                logs.activity_type = 'Created' AS created_count,
+                logs.activity_type = 'Removed' AS removed_count,
+                logs.activity_type = 'Updated' AS updated_count
+            FROM activity_logs AS logs
+            LEFT JOIN {moves} AS moves ON moves.log_id = logs.id
+            UNION ALL
+            SELECT
+                date(logs.date_occured), logs.stock_id, moves.from_location_id, logs.stock_name, moves.from_location_name,
+                0, moves.from_quantity, 0, 0, 0
+            FROM activity_logs AS logs
+            INNER JOIN {moves} AS moves ON moves.log_id = logs.id
+        )
+        GROUP BY day, stock_id, location_id
+    """
+
+    _rollup_add_query = """
+        INSERT INTO log_daily_rollups
+            (day, stock_id, location_id, stock_name, location_name, quantity_in, quantity_out, created_count, removed_count, updated_count)
+        VALUES (?,?,?,?,?,?,?,?,?,?)
+        ON CONFLICT (day, stock_id, location_id) DO UPDATE SET
+            quantity_in = quantity_in + excluded.quantity_in,
+            quantity_out = quantity_out + excluded.quantity_out,
+            created_count = created_count + excluded.created_count,
+            removed_count = removed_count + excluded.removed_count,
+            updated_count = updated_count + excluded.updated_count
+    """
+
+    @profiled
+    def fetch_log_rollups(self, stock_name: str = None, location_name: str = None, start: str = None, end: str = None, period: str = "day", result_format: str = "dicts", search: str = "exact"):
         """
-        params = []
+        Returns the total stock movements for each stock type at each location in each period, from the daily rollups
+        period is one of ROLLUP_PERIODS. Only days from start up to (but not including) end are counted
+        Each row has quantity_in, quantity_out and net_quantity, the number of logs of each activity type,
+        and last_day, the last day in the period that had any logs
+        """
+        query, params = self._rollup_query(period).build([
+            None, None, *name_filter(stock_name, search), *name_filter(location_name, search), start, end
+        ])
+
+        return self.run_fetch(query, params, result_format)
+
+    def _rollup_query(self, period: str):
+        builder = self._rollup_queries.get(period)
+        if builder is None:
+            if period not in self.ROLLUP_PERIODS:
+                raise Exception(f"Unrecognised rollup period {period}")
+            builder = self._rollup_queries[period] = QueryBuilder(
+                f"""
+                    SELECT
+                        {self.ROLLUP_PERIODS[period]} AS period,
+                        stock_id, stock_name, location_id, location_name,
+                        SUM(quantity_in) AS quantity_in,
+                        SUM(quantity_out) AS quantity_out,
+                        SUM(net_quantity) AS net_quantity,
+                        SUM(created_count) AS created_count,
+                        SUM(removed_count) AS removed_count,
+                        SUM(updated_count) AS updated_count,
+                        MAX(day) AS last_day
+                    FROM log_daily_rollups
+                    WHERE 1=1
+                """,
+                self._rollup_filters,
+                # With MAX(day) the only min or max, sqlite takes the names from the period's last day
+                " GROUP BY period, stock_id, location_id ORDER BY period, stock_name, location_name"
+            )
+        return builder
+
+    @profiled
+    def rebuild_log_rollups(self):
+        """
+        Recalculates the daily rollups from every log, archived or not
+        Only needed to count logs archived before the rollups existed, as new logs are counted as they are added
+        Returns the number of rollup rows
+        """
+        with self.get_write_connection() as conn:
+            conn.execute("DELETE FROM log_daily_rollups")
+            cur = conn.cursor()
+            cur.row_factory = None
+            conn.executemany(self._rollup_add_query, cur.execute(self._rollup_totals_query.format(moves="log_moves")).fetchall())
+            # Moves are never archived, so each archive is read with the main database attached for them
+            archive_query = self._rollup_totals_query.format(moves=f"{LogArchive.main_alias}.log_moves")
+            for entry in self._archive.catalog(conn):
+                conn.executemany(self._rollup_add_query, self._archive.stream(entry, archive_query, chunk_size=1000, main_path=self._db_path))
+            return conn.execute("SELECT COUNT(*) FROM log_daily_rollups").fetchone()[0]
+
+    ###############################
+    ## Inventory History Methods ##
+    ###############################
+    # The inventory at an earlier time is rebuilt from the nearest checkpoint before it, replaying the logs after it
+    # A checkpoint is due once checkpoint_logs logs have been added since the last one, or a log is added on a new day.
+    # They are taken in the background by start_checkpointer, not by the writes that make them due, as copying the
+    # inventory would hold up the write. Only the newest checkpoint_limit are kept
+    checkpoint_logs = 10000
+    checkpoint_limit = 60
+
+    _checkpoint_copy_query = """
+        INSERT INTO inventory_checkpoint_rows (checkpoint_id, instance_id, stock_name, location_name, current_quantity)
+        SELECT ?, current_inventory.id, stock_data.name, location_data.name, current_inventory.current_quantity
+        FROM
+            current_inventory
+        INNER JOIN location_data ON current_inventory.location_id = location_data.id
+        INNER JOIN stock_data ON current_inventory.stock_id = stock_data.id
+    """
+
+    def _checkpoint_due(self, conn: sql.Connection):
+        """
+        Returns the id and date of the newest log if a checkpoint should be taken up to it, otherwise None
+        """
+        latest = conn.execute("SELECT id, date_occured FROM activity_logs ORDER BY id DESC LIMIT 1").fetchone()
+        if latest is None:
+            return None
+        last = conn.execute("SELECT log_id, log_date FROM inventory_checkpoints ORDER BY log_id DESC LIMIT 1").fetchone()
+        if last is None or latest[0] - last[0] >= self.checkpoint_logs or latest[1][:10] != last[1][:10]:
+            return latest
+        return None
+
+    def checkpoint_if_due(self):
+        """
+        Takes a checkpoint if enough logs have been added since the last one, or the day has changed
+        Nothing is read unless logs have been added through this object since it was last called
+        Returns the id of the checkpoint, or None if none was due
+        """
+        if self._logs_since_checkpoint == 0:
+            return None
+        # Checked on a read connection first, so the writer is only held up when a checkpoint is due
+        with self.get_database_connection() as conn:
+            due = self._checkpoint_due(conn)
+        if due is None:
+            return None
+        with self.get_write_connection() as conn:
+            self._logs_since_checkpoint = 0
+            due = self._checkpoint_due(conn)
+            return self._take_checkpoint(conn, due[0], due[1]) if due is not None else None
+
+    def start_checkpointer(self, interval: float = 60.0):
+        """
+        Calls checkpoint_if_due every interval seconds on a background thread, until the database is closed
+        """
+        if self._checkpointer is None:
+            self._checkpointer = ChangePoller(self.checkpoint_if_due, interval, name="inventory-checkpointer")
+            self._checkpointer.start()
+
+    def _take_checkpoint(self, conn: sql.Connection, log_id: int, log_date: str):
+        cur = conn.execute("INSERT INTO inventory_checkpoints (log_id, log_date) VALUES (?,?)", (log_id, log_date))
+        checkpoint_id = cur.lastrowid
+        copied = conn.execute(self._checkpoint_copy_query, (checkpoint_id,)).rowcount
+        conn.execute("UPDATE inventory_checkpoints SET row_count = ? WHERE id = ?", (copied, checkpoint_id))
+
+        # Drop the oldest checkpoints. Times before the oldest kept are still rebuilt, from the first log
+        expired = [row[0] for row in conn.execute(
+            "SELECT id FROM inventory_checkpoints ORDER BY log_id DESC LIMIT -1 OFFSET ?", (self.checkpoint_limit,)
+        ).fetchall()]
+        for expired_id in expired:
+            conn.execute("DELETE FROM inventory_checkpoint_rows WHERE checkpoint_id = ?", (expired_id,))
+            conn.execute("DELETE FROM inventory_checkpoints WHERE id = ?", (expired_id,))
+        return checkpoint_id
+
+    def checkpoint_inventory(self):
+        """
+        Takes a checkpoint of the current inventory now, if any logs have been added since the last one
+        Returns the id of the checkpoint, or None if none was needed
+        """
+        with self.get_write_connection() as conn:
+            latest = conn.execute("SELECT id, date_occured FROM activity_logs ORDER BY id DESC LIMIT 1").fetchone()
+            if latest is None or conn.execute("SELECT 1 FROM inventory_checkpoints WHERE log_id = ?", (latest[0],)).fetchone():
+                return None
+            return self._take_checkpoint(conn, latest[0], latest[1])
 
-        if data._stock_id is not None :
-            query += " AND stock_id = ?"
-            params.append(data._stock_id)
+    def inventory_checkpoints(self):
+        """
+        Returns every checkpoint kept, oldest first
+        """
+        return self.run_fetch("SELECT id, log_id, log_date, row_count, taken_at FROM inventory_checkpoints ORDER BY log_id", ())
+
+    @profiled
+    def inventory_as_of(self, timestamp: str, data: ds.InventoryData = None, result_format: str = "dicts", search: str = "exact"):
+        """
+        Rebuilds the inventory as it was at the given time, after every log dated before it
+        A date on its own means the start of that day. Rows are as from fetch_inventory_data, with
+        names as they were at the time, and the stock and location names in data filter them as usual
+        """
+        data = data if data is not None else ds.InventoryData()
+        stock_name = data._stock_type._name or None
+        location_name = data._location._name or None
 
-        if data._location_id is not None :
-            query += " AND location_id = ?"
-            params.append(data._location_id)
+        with self.get_database_connection() as conn:
+            checkpoint = conn.execute(
+                "SELECT id, log_id FROM inventory_checkpoints WHERE log_date < ? ORDER BY log_id DESC LIMIT 1",
+                (timestamp,)
+            ).fetchone()
+            instances = {}
+            if checkpoint is not None:
+                query = "SELECT instance_id, stock_name, location_name, current_quantity FROM inventory_checkpoint_rows WHERE checkpoint_id = ?"
+                params = (checkpoint[0],)
+                # An instance never changes stock type, so the stock name can be filtered on before replaying
+                if stock_name and search == "exact":
+                    query += " AND stock_name = ?"
+                    params += (stock_name,)
+                cur = conn.cursor()
+                cur.row_factory = None
+                instances = {row[0]: list(row[1:]) for row in cur.execute(query, params)}
+
+        # Replay the logs since the checkpoint, reading any archives they are in
+        tail = self.fetch_log_data(
+            ds.LogData(stock_name=stock_name if search == "exact" else None),
+            after_id=checkpoint[1] if checkpoint is not None else 0,
+            end=timestamp,
+            result_format="tuples"
+        )
+        columns = tail.columns
+        instance_at, stock_at, location_at, activity_at, change_at = (
+            columns[name] for name in ("instance_id", "stock_name", "location_name", "activity_type", "quantity_change")
+        )
+        for log in tail:
+            match log[activity_at]:
+                case self._add_log_string:
+                    instances[log[instance_at]] = [log[stock_at], log[location_at], log[change_at] or 0]
+                case self._delete_log_string:
+                    instances.pop(log[instance_at], None)
+                case self._update_log_string:
+                    instance = instances.get(log[instance_at])
+                    if instance is not None:
+                        # An update logs the location moved to, and the old quantity less the new
+                        instance[1] = log[location_at]
+                        if log[change_at] is not None:
+                            instance[2] -= log[change_at]
+
+        stock_match = name_matcher(stock_name, search)
+        location_match = name_matcher(location_name, search)
+        rows = [
+            (id, quantity, location, stock)
+            for id, (stock, location, quantity) in sorted(instances.items())
+            if stock_match(stock) and location_match(location)
+        ]
+        return self._format_rows(rows, ("id", "current_quantity", "location_name", "stock_name"), result_format)
+
+    #################################
+    ## Change Notification Methods ##
+    #################################
+    # Changes made through this object are published on self.changes as they commit. Changes made by other
+    # terminals are found by poll_changes: a connection's data_version only moves when another connection
+    # commits, so checking it is a single cheap pragma, and the logs after the newest one seen then say which
+    # instances changed. The pragma is read on a connection kept for it alone, so a poll never waits on the writer.
+    # That connection sees this object's own commits too, so each write moves the seen version past its own commit,
+    # as long as nothing else was waiting to be found. Any own logs still found are published again, which does
+    # no harm as views fetch the rows they name afresh rather than applying the change twice
+    def _data_version(self):
+        """
+        Returns PRAGMA data_version on the version connection. Must be called holding _version_lock
+        """
+        if self._version_conn is None:
+            self._version_conn = sql.connect(self._db_path, check_same_thread=False)
+        return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
 
-        if data._activity_type is not None :
-            query += " AND activity_type = ?"
-            params.append(data._activity_type)
+    def _version_before_write(self):
+        """
+        Returns the data_version at the start of a write, or None if changes are not being looked for
+        No other connection can commit while the write holds sqlite's write lock, so this is the version just before it
+        """
+        with self._version_lock:
+            if self._seen_version is None:
+                return None
+            return self._data_version()
 
-        if data._update_details is not None :
-            query += " AND update_details = ?"
-            params.append(data._update_details)
-        
-        if data._quantity_change is not None :
-            query += " AND quantity_change = ?"
-            params.append(data._quantity_change)
+    def _skip_own_commit(self, version_before):
+        """
+        Moves the seen version past a write that has just committed, if nothing else was waiting to be found before it
+        A change another terminal commits in the moment between the two is skipped too, until its next change
+        """
+        if version_before is None:
+            return
+        with self._version_lock:
+            if version_before == self._seen_version:
+                self._seen_version = self._data_version()
 
+    def poll_changes(self):
+        """
+        Publishes the changes other terminals have committed since the last poll, and returns them
+        Changes that leave no logs (to stock types and locations) cannot be told apart, so they are
+        published as a single event with no entity, meaning anything may have changed
+        """
+        # The newest log is read before the version, so a change committed in between is found again next time
         with self.get_database_connection() as conn:
-            if len(params) == 0:
-                cur = conn.execute(query)
-            else:
-                cur = conn.execute(query, tuple(params))
-            vals = cur.fetchall()
-            return [dict(row) for row in vals]
-     
+            newest_log_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM activity_logs").fetchone()[0]
+        with self._version_lock:
+            version = self._data_version()
+            if self._seen_version is None:
+                self._seen_version = version
+                self._seen_log_id = newest_log_id
+                return []
+            if version == self._seen_version:
+                return []
+            self._seen_version = version
+            seen_log_id = self._seen_log_id
+
+        with self.get_database_connection() as conn:
+            logs = conn.execute(
+                "SELECT id, instance_id, stock_id, activity_type, update_details FROM activity_logs WHERE id > ? ORDER BY id",
+                (seen_log_id,)
+            ).fetchall()
+
+        events = []
+        for log in logs:
+            events.extend(changes_from_log(*log))
+        if logs:
+            with self._version_lock:
+                self._seen_log_id = max(self._seen_log_id, logs[-1]["id"])
+        else:
+            events.append(ChangeEvent(None, "changed"))
+        self.changes.publish(events)
+        return events
+
+    def start_change_poller(self, interval: float = 1.0):
+        """
+        Calls poll_changes every interval seconds on a background thread, until the database is closed
+        """
+        if self._poller is None:
+            self.poll_changes()
+            self._poller = ChangePoller(self.poll_changes, interval)
+            self._poller.start()
+
     #########################
     ## Update Data Methods ##
     #########################
     # There is no update method for logs, as these should never be edited after creation
+    @reports_busy
+    @profiled
     def update_data(self, data: ds.SqlData):
         """
         Helper to direct update queries to the correct subfunction        
@@ -460,8 +1451,10 @@ class Database:
         """
         params = (data._restock_quantity, data._id)
 
-        with self.get_database_connection() as conn:
+        with self.get_write_connection() as conn:
             cur = conn.execute(query, params)
+            if cur.rowcount:
+                self.changes.record(ChangeEvent("stock", "updated", data._id, ("restock_quantity",)))
 
         return True
 
@@ -479,14 +1472,18 @@ class Database:
             WHERE id = ?
         """
         params = [data._name, data._id]
-        # Check to see if a name already exists. If it does, do not allow this operation
-        already_exists = self.fetch_data(ds.LocationData(name=data._name))
-        # Allow the name to be "changed" to the current name
-        if len(already_exists) > 0 and already_exists[0]["name"] != data._name:
-            return MsgBoxGenerator(title="Name already exists", message="Another location already has that name.")
-        
-        with self.get_database_connection() as conn:
+
+        with self.get_write_connection() as conn:
+            # Check to see if a name already exists. If it does, do not allow this operation
+            existing_id = self._names.location_id(data._name)
+            # Allow the name to be "changed" to the current name
+            if existing_id is not None and str(existing_id) != str(data._id):
+                return MsgBoxGenerator(title="Name already exists", message="Another location already has that name.")
             cur = conn.execute(query, tuple(params))
+            if cur.rowcount:
+                self._names.rename_location(data._id, data._name)
+                self._names.note_changes(cur.rowcount)
+                self.changes.record(ChangeEvent("location", "updated", data._id, ("name",)))
 
         return True
 
@@ -498,38 +1495,41 @@ class Database:
         # also get location_id from the database for ease of operations
         # Updates need to have all necessary data to ensure comprehensive logging
 
-        query = """
-            UPDATE current_inventory
-            SET id = ?
-        """
-        params = [data._id]
-        if data._location._name:
-            query += ", location_id = (SELECT id FROM location_data WHERE name = ?)"
-            params.append(data._location._name)
+        # Set up the logdata object to be altered
+        log_data = ds.LogData(instance_id=data._id, stock_name=data._stock_type._name, location_name=data._location._name, activity_type='Updated')
 
-        if data._quantity:
-            query += ", current_quantity = ?"
-            params.append(data._quantity)
+        with self.get_write_connection() as conn:
+            query = """
+                UPDATE current_inventory
+                SET id = ?
+            """
+            params = [data._id]
+            if data._location._name:
+                location_id = self._names.location_id(data._location._name)
+                if location_id is None:
+                    return MsgBoxGenerator(title="Parameters not found", message="Location not present in database")
+                query += ", location_id = ?"
+                params.append(location_id)
 
-        query += " WHERE id = ?"
-        params.append(data._id)
+            if data._quantity:
+                query += ", current_quantity = ?"
+                params.append(data._quantity)
 
-        # Set up the logdata object to be altered
-        log_data = ds.LogData(instance_id=data._id, stock_name=data._stock_type._name, location_name=data._location._name, activity_type='Updated')
+            query += " WHERE id = ?"
+            params.append(data._id)
 
-        with self.get_database_connection() as conn:
             # Get the original values before the query is sent off
             # This is to allow for comprehensive logging
-            original_values = self.get_original_values(data, conn)
+            original = self.get_original_values(data, conn)
 
             # Work out what was changed and use to construct an update code
             # Also checks to make sure a change has been made
             # This helps to detect if a query was submitted where no values had been changed
-            if data._location._name and data._location._name != original_values["location_name"] and data._quantity and data._quantity != original_values["current_quantity"]:
+            if data._location._name and data._location._name != original._location._name and data._quantity and data._quantity != original._quantity:
                 log_data._update_details = "Both"
-            elif data._location._name and data._location._name != original_values["location_name"]:
+            elif data._location._name and data._location._name != original._location._name:
                 log_data._update_details = "Location"
-            elif data._quantity and data._quantity != original_values["current_quantity"]:
+            elif data._quantity and data._quantity != original._quantity:
                 log_data._update_details = "Quantity"
             else:
                 return MsgBoxGenerator(title="No value change", message="Please update either location or quantity")
@@ -539,19 +1539,26 @@ class Database:
 
             # If there was a quantity change, get the quantity change
             if data._quantity:
-                log_data._quantity_change = int(original_values["current_quantity"]) - int(data._quantity)
+                log_data._quantity_change = int(original._quantity) - int(data._quantity)
 
             log_data._stock_name = data._stock_type._name
 
+            # A move is also recorded against the location the instance left, for the rollups
+            moved_from = None
+            if log_data._update_details in ("Location", "Both"):
+                moved_from = (self._names.location_id(original._location._name), original._location._name, int(original._quantity))
+
             # create the log
-            self.add_log_data(log_data, conn)
+            self.add_log_data(log_data, conn, moved_from)
 
         return True
 
     #########################
     ## Delete Data Methods ##
     #########################
-    # There is no delete method for logs, as these should never be deleted
+    # There is no delete method for logs, as these should never be deleted (archive_logs only moves them out of the main database)
+    @reports_busy
+    @profiled
     def delete_data(self, data: ds.SqlData):
         """
         Helper to direct add queries to the correct subfunction        
@@ -569,12 +1576,16 @@ class Database:
         Deletes stock data.
         This action is prevented if any existing instances reference the stock data
         """
-        currently_used = self.fetch_data(ds.InventoryData(stock_type=ds.StockData(name=data._name)))
-        if len(currently_used) > 0:
-            return MsgBoxGenerator(title="Stock type in use", message="This data entry cannot be deleted, as there are stock instances that currently use it")
-        
-        with self.get_database_connection() as conn:
-            cur = conn.execute("DELETE FROM stock_data WHERE id = ?", (data._id,))
+        with self.get_write_connection() as conn:
+            stock_id = data._id if data._id else self._names.stock_id(data._name)
+            currently_used = conn.execute("SELECT 1 FROM current_inventory WHERE stock_id = ? LIMIT 1", (stock_id,)).fetchone()
+            if currently_used is not None:
+                return MsgBoxGenerator(title="Stock type in use", message="This data entry cannot be deleted, as there are stock instances that currently use it")
+            cur = conn.execute("DELETE FROM stock_data WHERE id = ?", (stock_id,))
+            if cur.rowcount:
+                self._names.remove_stock(stock_id)
+                self._names.note_changes(cur.rowcount)
+                self.changes.record(ChangeEvent("stock", "deleted", stock_id))
 
         return True
 
@@ -583,22 +1594,26 @@ class Database:
         Deletes location data.
         This action is prevented if any existing instances reference the location data
         """
-        currently_used = self.fetch_data(ds.InventoryData(location=ds.LocationData(name=data._name)))
-        if len(currently_used) > 0:
-            return MsgBoxGenerator(title="Location in use", message="This data entry cannot be deleted, as there are stock instances that currently use it")
-        
-        with self.get_database_connection() as conn:
-            cur = conn.execute("DELETE FROM location_data WHERE id = ?", (data._id,))
+        with self.get_write_connection() as conn:
+            location_id = data._id if data._id else self._names.location_id(data._name)
+            currently_used = conn.execute("SELECT 1 FROM current_inventory WHERE location_id = ? LIMIT 1", (location_id,)).fetchone()
+            if currently_used is not None:
+                return MsgBoxGenerator(title="Location in use", message="This data entry cannot be deleted, as there are stock instances that currently use it")
+            cur = conn.execute("DELETE FROM location_data WHERE id = ?", (location_id,))
+            if cur.rowcount:
+                self._names.remove_location(location_id)
+                self._names.note_changes(cur.rowcount)
+                self.changes.record(ChangeEvent("location", "deleted", location_id))
         
         return True
 
     def delete_inventory_data(self, data: ds.InventoryData):
-        with self.get_database_connection() as conn:
-            ov = self.get_original_values(data, conn)
+        with self.get_write_connection() as conn:
+            original = self.get_original_values(data, conn)
 
             cur = conn.execute("DELETE FROM current_inventory WHERE id = ?", (data._id,))
 
-            log_data = ds.LogData(instance_id=ov["id"],stock_name=ov["stock_name"], location_name=ov["location_name"], activity_type=self._delete_log_string, quantity_change=ov["current_quantity"])
+            log_data = ds.LogData(instance_id=original._id, stock_name=original._stock_type._name, location_name=original._location._name, activity_type=self._delete_log_string, quantity_change=original._quantity)
 
             self.add_log_data(log_data, conn)
         
@@ -607,15 +1622,13 @@ class Database:
     #############
     ## utils ##
     #############
-    def get_original_values(self, data: ds.SqlData, conn: sql.Connection):
+    def get_original_values(self, data: ds.InventoryData, conn: sql.Connection) -> ds.InventoryData:
         """
-        Fetches the original data from the database
+        Fetches the original data from the database, as a frozen data object so it cannot be mixed up with the new values
         """
-        query = self._fetch_inventory_query
-        query += " AND current_inventory.id=?"
-        cur = conn.execute(query, (data._id,))
-        result = cur.fetchone()
-        return dict(result)
+        query, params = self._inventory_query.build([data._id, None, None])
+        cur = conn.execute(query, params)
+        return ds.InventoryData.from_row(cur.fetchone()).freeze()
 
     def missing_data_popup(self):
         """
@@ -623,13 +1636,50 @@ class Database:
         """
         return MsgBoxGenerator(title="All fields required", message="All fields must be filled in to perform this operation")
 
+    def name_too_long_popup(self):
+        """
+        Shows an error message if a name will not fit in the database
+        """
+        return MsgBoxGenerator(title="Name too long", message=f"Names must be at most {MAX_NAME_LENGTH} characters")
+
+    def invalid_id_popup(self):
+        """
+        Shows an error message if an id is not a whole number
+        """
+        return MsgBoxGenerator(title="Invalid id", message="Ids must be whole numbers")
+
+    def busy_popup(self):
+        """
+        Shows an error message if another terminal kept the database locked for too long
+        """
+        return MsgBoxGenerator(title="Database busy", message="Another terminal is writing to the database. Please try again in a moment")
+
     def reset_tables(self):
         """
         WARNING: only for testing purposes
         """
-        with self.get_database_connection() as conn:
+        with self.get_write_connection() as conn:
+            try:
+                self._archive.remove_files(conn)
+            except sql.OperationalError:
+                # The catalog has not been created yet
+                pass
             # Drop old tables
+            conn.execute("DROP TABLE IF EXISTS log_archives")
+            conn.execute("DROP TABLE IF EXISTS log_daily_rollups")
+            conn.execute("DROP TABLE IF EXISTS log_moves")
+            conn.execute("DROP TABLE IF EXISTS inventory_checkpoints")
+            conn.execute("DROP TABLE IF EXISTS inventory_checkpoint_rows")
             conn.execute("DROP TABLE IF EXISTS activity_logs")
             conn.execute("DROP TABLE IF EXISTS current_inventory")
             conn.execute("DROP TABLE IF EXISTS location_data")
             conn.execute("DROP TABLE IF EXISTS stock_data")
+            conn.execute("DROP TABLE IF EXISTS stock_totals")
+            conn.execute("DROP TABLE IF EXISTS name_generation")
+            conn.execute("DROP TABLE IF EXISTS stock_name_search")
+            conn.execute("DROP TABLE IF EXISTS location_name_search")
+            conn.execute("DROP TABLE IF EXISTS log_name_search")
+            conn.execute("DROP TABLE IF EXISTS log_names")
+            # Mark the schema as unbuilt so the next Database object recreates it
+            conn.execute("PRAGMA user_version = 0")
+        self._names.invalidate()
@@ -30,4 +30,4 @@ CREATE TABLE IF NOT EXISTS activity_logs (
     quantity_change INTEGER,
     date_occured TEXT NOT NULL CHECK (date_occured LIKE "%-%-% %:%:%") DEFAULT (datetime('now')),
     FOREIGN KEY (stock_id) REFERENCES stock_data(id)
-);
\ No newline at end of file
+);
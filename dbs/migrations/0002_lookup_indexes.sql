@@ -0,0 +1,22 @@
+-- Lookup indexes
+-- Names are resolved to ids on every insert, so they must be unique and indexed
+
+-- Older databases allowed stock types and locations to share a name, which would stop the unique indexes being made
+-- The first of each name keeps it, and the rest have " DUPLICATE <id>" added (cut short to fit the 50 character limit)
+-- Their instances keep pointing at them by id, and their logs keep the names they were written with
+UPDATE stock_data SET name = SUBSTR(name, 1, 50 - LENGTH(' DUPLICATE ' || id)) || ' DUPLICATE ' || id
+WHERE id NOT IN (SELECT MIN(id) FROM stock_data GROUP BY name);
+UPDATE location_data SET name = SUBSTR(name, 1, 50 - LENGTH(' DUPLICATE ' || id)) || ' DUPLICATE ' || id
+WHERE id NOT IN (SELECT MIN(id) FROM location_data GROUP BY name);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_stock_data_name ON stock_data(name);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_location_data_name ON location_data(name);
+
+-- Covers the quantity totals so they can be summed without visiting the table
+CREATE INDEX IF NOT EXISTS idx_current_inventory_stock ON current_inventory(stock_id, location_id, current_quantity);
+CREATE INDEX IF NOT EXISTS idx_current_inventory_location ON current_inventory(location_id, stock_id);
+
+-- Log filters, ordered by id so results come back in insertion order
+CREATE INDEX IF NOT EXISTS idx_activity_logs_stock ON activity_logs(stock_id, activity_type, id);
+CREATE INDEX IF NOT EXISTS idx_activity_logs_location ON activity_logs(location_id, activity_type, id);
+CREATE INDEX IF NOT EXISTS idx_activity_logs_activity ON activity_logs(activity_type, id);
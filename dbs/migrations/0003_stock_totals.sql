@@ -0,0 +1,54 @@
+-- Running total quantity of every stock type
+-- Kept up to date by the triggers below, so restock checks never have to sum current_inventory
+CREATE TABLE IF NOT EXISTS stock_totals (
+    stock_id INTEGER PRIMARY KEY,
+    restock_quantity INTEGER NOT NULL,
+    total_quantity INTEGER NOT NULL DEFAULT 0,
+    needs_restock INTEGER GENERATED ALWAYS AS (restock_quantity >= total_quantity) VIRTUAL
+);
+
+CREATE INDEX IF NOT EXISTS idx_stock_totals_needs_restock ON stock_totals(needs_restock, stock_id);
+
+-- Fill in the totals for any stock that already exists
+INSERT OR REPLACE INTO stock_totals (stock_id, restock_quantity, total_quantity)
+SELECT
+    stock_data.id,
+    stock_data.restock_quantity,
+    COALESCE(SUM(current_inventory.current_quantity), 0)
+FROM
+    stock_data
+LEFT JOIN current_inventory ON current_inventory.stock_id = stock_data.id
+GROUP BY stock_data.id, stock_data.restock_quantity;
+
+-- Stock types
+CREATE TRIGGER IF NOT EXISTS trg_stock_totals_stock_insert AFTER INSERT ON stock_data
+BEGIN
+    INSERT INTO stock_totals (stock_id, restock_quantity) VALUES (NEW.id, NEW.restock_quantity);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stock_totals_stock_update AFTER UPDATE OF restock_quantity ON stock_data
+BEGIN
+    UPDATE stock_totals SET restock_quantity = NEW.restock_quantity WHERE stock_id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stock_totals_stock_delete AFTER DELETE ON stock_data
+BEGIN
+    DELETE FROM stock_totals WHERE stock_id = OLD.id;
+END;
+
+-- Stock instances
+CREATE TRIGGER IF NOT EXISTS trg_stock_totals_inventory_insert AFTER INSERT ON current_inventory
+BEGIN
+    UPDATE stock_totals SET total_quantity = total_quantity + NEW.current_quantity WHERE stock_id = NEW.stock_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stock_totals_inventory_update AFTER UPDATE OF stock_id, current_quantity ON current_inventory
+BEGIN
+    UPDATE stock_totals SET total_quantity = total_quantity - OLD.current_quantity WHERE stock_id = OLD.stock_id;
+    UPDATE stock_totals SET total_quantity = total_quantity + NEW.current_quantity WHERE stock_id = NEW.stock_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stock_totals_inventory_delete AFTER DELETE ON current_inventory
+BEGIN
+    UPDATE stock_totals SET total_quantity = total_quantity - OLD.current_quantity WHERE stock_id = OLD.stock_id;
+END;
@@ -0,0 +1,38 @@
+-- Counts changes to the names of stock types and locations
+-- Each process caches the names and ids in memory, and compares this counter to know when another process has changed them
+CREATE TABLE IF NOT EXISTS name_generation (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    generation INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO name_generation (id, generation) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_name_generation_stock_insert AFTER INSERT ON stock_data
+BEGIN
+    UPDATE name_generation SET generation = generation + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_name_generation_stock_update AFTER UPDATE OF id, name ON stock_data
+BEGIN
+    UPDATE name_generation SET generation = generation + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_name_generation_stock_delete AFTER DELETE ON stock_data
+BEGIN
+    UPDATE name_generation SET generation = generation + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_name_generation_location_insert AFTER INSERT ON location_data
+BEGIN
+    UPDATE name_generation SET generation = generation + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_name_generation_location_update AFTER UPDATE OF id, name ON location_data
+BEGIN
+    UPDATE name_generation SET generation = generation + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_name_generation_location_delete AFTER DELETE ON location_data
+BEGIN
+    UPDATE name_generation SET generation = generation + 1 WHERE id = 1;
+END;
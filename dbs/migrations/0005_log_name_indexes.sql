@@ -0,0 +1,4 @@
+-- Log name indexes
+-- The log search bars filter on the names stored with each log, ordered by id for paging
+CREATE INDEX IF NOT EXISTS idx_activity_logs_stock_name ON activity_logs(stock_name, id);
+CREATE INDEX IF NOT EXISTS idx_activity_logs_location_name ON activity_logs(location_name, id);
@@ -0,0 +1,65 @@
+-- Name search
+-- Trigram full text indexes over the names, so a name can be found from any part of it without scanning the table.
+-- They are external content tables: only the index is stored, the names themselves are read from the tables they shadow.
+-- The triggers below keep each index in step with its table
+CREATE VIRTUAL TABLE IF NOT EXISTS stock_name_search USING fts5(name, content='stock_data', content_rowid='id', tokenize='trigram');
+CREATE VIRTUAL TABLE IF NOT EXISTS location_name_search USING fts5(name, content='location_data', content_rowid='id', tokenize='trigram');
+
+-- Every stock and location name that appears in the logs, including names that have since changed.
+-- The logs repeat the same few names many times over, so these are indexed rather than every log row,
+-- and logs are then found through their name indexes
+CREATE TABLE IF NOT EXISTS log_names (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS log_name_search USING fts5(name, content='log_names', content_rowid='id', tokenize='trigram');
+
+INSERT OR IGNORE INTO log_names(name) SELECT stock_name FROM activity_logs UNION SELECT location_name FROM activity_logs;
+
+-- Index the names that already exist
+INSERT INTO stock_name_search(stock_name_search) VALUES ('rebuild');
+INSERT INTO location_name_search(location_name_search) VALUES ('rebuild');
+INSERT INTO log_name_search(log_name_search) VALUES ('rebuild');
+
+CREATE TRIGGER IF NOT EXISTS trg_stock_name_search_insert AFTER INSERT ON stock_data
+BEGIN
+    INSERT INTO stock_name_search(rowid, name) VALUES (new.id, new.name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stock_name_search_update AFTER UPDATE OF id, name ON stock_data
+BEGIN
+    INSERT INTO stock_name_search(stock_name_search, rowid, name) VALUES ('delete', old.id, old.name);
+    INSERT INTO stock_name_search(rowid, name) VALUES (new.id, new.name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stock_name_search_delete AFTER DELETE ON stock_data
+BEGIN
+    INSERT INTO stock_name_search(stock_name_search, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_location_name_search_insert AFTER INSERT ON location_data
+BEGIN
+    INSERT INTO location_name_search(rowid, name) VALUES (new.id, new.name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_location_name_search_update AFTER UPDATE OF id, name ON location_data
+BEGIN
+    INSERT INTO location_name_search(location_name_search, rowid, name) VALUES ('delete', old.id, old.name);
+    INSERT INTO location_name_search(rowid, name) VALUES (new.id, new.name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_location_name_search_delete AFTER DELETE ON location_data
+BEGIN
+    INSERT INTO location_name_search(location_name_search, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+
+-- Names are only added to log_names the first time they are logged, which is when they are indexed
+CREATE TRIGGER IF NOT EXISTS trg_log_names_insert AFTER INSERT ON activity_logs
+BEGIN
+    INSERT OR IGNORE INTO log_names(name) VALUES (new.stock_name), (new.location_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_log_name_search_insert AFTER INSERT ON log_names
+BEGIN
+    INSERT INTO log_name_search(rowid, name) VALUES (new.id, new.name);
+END;
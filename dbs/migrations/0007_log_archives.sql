@@ -0,0 +1,18 @@
+-- Log archives
+-- Closed months of activity_logs are moved out into their own read only database files (see archive.py).
+-- This catalog records which months have been archived, where to, and the range of log ids each holds,
+-- so a log fetch only has to open the archives that could hold the logs it is looking for
+CREATE TABLE IF NOT EXISTS log_archives (
+    period TEXT PRIMARY KEY CHECK (period LIKE "____-__"),
+    file TEXT NOT NULL,
+    -- Dates covered, from start_date up to but not including end_date
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    first_id INTEGER NOT NULL,
+    last_id INTEGER NOT NULL,
+    row_count INTEGER NOT NULL,
+    archived_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+
+-- Finds the logs of a period to archive, and serves date range fetches
+CREATE INDEX IF NOT EXISTS idx_activity_logs_date ON activity_logs(date_occured, id);
@@ -0,0 +1,58 @@
+-- Daily totals of the logged stock movements for every stock type at every location
+-- Kept up to date by the trigger below, so reports over long periods read one row per day rather than every log
+-- Each log moves its quantity_change in (Created) or out (Removed, and Updated, whose change is the old quantity less the new)
+-- Moving an instance between locations is not counted, as the log only records the location it was moved to
+CREATE TABLE IF NOT EXISTS log_daily_rollups (
+    day TEXT NOT NULL,
+    stock_id INTEGER NOT NULL,
+    location_id INTEGER NOT NULL,
+    stock_name TEXT NOT NULL,
+    location_name TEXT NOT NULL,
+    quantity_in INTEGER NOT NULL DEFAULT 0,
+    quantity_out INTEGER NOT NULL DEFAULT 0,
+    net_quantity INTEGER GENERATED ALWAYS AS (quantity_in - quantity_out) VIRTUAL,
+    created_count INTEGER NOT NULL DEFAULT 0,
+    removed_count INTEGER NOT NULL DEFAULT 0,
+    updated_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, stock_id, location_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_log_daily_rollups_stock ON log_daily_rollups(stock_name, day);
+CREATE INDEX IF NOT EXISTS idx_log_daily_rollups_location ON log_daily_rollups(location_name, day);
+
+-- Fill in the totals for the logs already in the main database
+-- Logs that have already been archived are added by Database.rebuild_log_rollups
+INSERT OR REPLACE INTO log_daily_rollups
+    (day, stock_id, location_id, stock_name, location_name, quantity_in, quantity_out, created_count, removed_count, updated_count)
+SELECT
+    date(date_occured), stock_id, location_id, MAX(stock_name), MAX(location_name),
+    SUM(CASE WHEN activity_type = 'Created' THEN COALESCE(quantity_change, 0) ELSE 0 END),
+    SUM(CASE WHEN activity_type IN ('Removed', 'Updated') THEN COALESCE(quantity_change, 0) ELSE 0 END),
+    SUM(activity_type = 'Created'),
+    SUM(activity_type = 'Removed'),
+    SUM(activity_type = 'Updated')
+FROM activity_logs
+GROUP BY date(date_occured), stock_id, location_id;
+
+-- Only inserts are counted, as logs are never changed, and archiving them must not change the totals
+CREATE TRIGGER IF NOT EXISTS trg_log_daily_rollups_insert AFTER INSERT ON activity_logs
+BEGIN
+    INSERT INTO log_daily_rollups
+        (day, stock_id, location_id, stock_name, location_name, quantity_in, quantity_out, created_count, removed_count, updated_count)
+    VALUES (
+        date(NEW.date_occured), NEW.stock_id, NEW.location_id, NEW.stock_name, NEW.location_name,
+        CASE WHEN NEW.activity_type = 'Created' THEN COALESCE(NEW.quantity_change, 0) ELSE 0 END,
+        CASE WHEN NEW.activity_type IN ('Removed', 'Updated') THEN COALESCE(NEW.quantity_change, 0) ELSE 0 END,
+        NEW.activity_type = 'Created',
+        NEW.activity_type = 'Removed',
+        NEW.activity_type = 'Updated'
+    )
+    ON CONFLICT (day, stock_id, location_id) DO UPDATE SET
+        stock_name = excluded.stock_name,
+        location_name = excluded.location_name,
+        quantity_in = quantity_in + excluded.quantity_in,
+        quantity_out = quantity_out + excluded.quantity_out,
+        created_count = created_count + excluded.created_count,
+        removed_count = removed_count + excluded.removed_count,
+        updated_count = updated_count + excluded.updated_count;
+END;
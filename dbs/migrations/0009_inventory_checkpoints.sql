@@ -0,0 +1,22 @@
+-- Copies of current_inventory taken every so often, so the inventory at an earlier time can be rebuilt
+-- by replaying only the logs after the nearest copy, rather than every log since the start
+-- log_id is the last log the copy includes, and log_date the date of that log
+CREATE TABLE IF NOT EXISTS inventory_checkpoints (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    log_id INTEGER NOT NULL UNIQUE,
+    log_date TEXT NOT NULL,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    taken_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+
+-- Names are kept as they were when the copy was taken, the same as in the logs
+CREATE TABLE IF NOT EXISTS inventory_checkpoint_rows (
+    checkpoint_id INTEGER NOT NULL,
+    instance_id INTEGER NOT NULL,
+    stock_name TEXT NOT NULL,
+    location_name TEXT NOT NULL,
+    current_quantity INTEGER NOT NULL,
+    PRIMARY KEY (checkpoint_id, instance_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_inventory_checkpoint_rows_stock ON inventory_checkpoint_rows(checkpoint_id, stock_name);
@@ -0,0 +1,87 @@
+-- Where an instance was moved from, so the rollups can count a move as out of one location and in to another
+-- The log itself only records the location the instance was moved to. from_quantity is what it held before the move
+CREATE TABLE IF NOT EXISTS log_moves (
+    log_id INTEGER PRIMARY KEY,
+    from_location_id INTEGER NOT NULL,
+    from_location_name TEXT NOT NULL CHECK (LENGTH(from_location_name) <= 50),
+    from_quantity INTEGER NOT NULL
+);
+
+-- An Updated log's quantity_change is the old quantity less the new, so it is negative when stock goes up
+-- The rollups made by 0008 counted it as out either way, so the trigger is replaced and the totals counted again
+DROP TRIGGER IF EXISTS trg_log_daily_rollups_insert;
+
+CREATE TRIGGER IF NOT EXISTS trg_log_daily_rollups_insert AFTER INSERT ON activity_logs
+BEGIN
+    INSERT INTO log_daily_rollups
+        (day, stock_id, location_id, stock_name, location_name, quantity_in, quantity_out, created_count, removed_count, updated_count)
+    VALUES (
+        date(NEW.date_occured), NEW.stock_id, NEW.location_id, NEW.stock_name, NEW.location_name,
+        CASE
+            WHEN NEW.activity_type = 'Created' THEN COALESCE(NEW.quantity_change, 0)
+            WHEN NEW.activity_type = 'Updated' THEN MAX(-COALESCE(NEW.quantity_change, 0), 0)
+            ELSE 0
+        END,
+        CASE
+            WHEN NEW.activity_type = 'Removed' THEN COALESCE(NEW.quantity_change, 0)
+            WHEN NEW.activity_type = 'Updated' THEN MAX(COALESCE(NEW.quantity_change, 0), 0)
+            ELSE 0
+        END,
+        NEW.activity_type = 'Created',
+        NEW.activity_type = 'Removed',
+        NEW.activity_type = 'Updated'
+    )
+    ON CONFLICT (day, stock_id, location_id) DO UPDATE SET
+        stock_name = excluded.stock_name,
+        location_name = excluded.location_name,
+        quantity_in = quantity_in + excluded.quantity_in,
+        quantity_out = quantity_out + excluded.quantity_out,
+        created_count = created_count + excluded.created_count,
+        removed_count = removed_count + excluded.removed_count,
+        updated_count = updated_count + excluded.updated_count;
+END;
+
+-- A move is written just after its log, which has already been counted as a change at the new location
+-- That is swapped for the whole quantity going out of the old location and the new quantity coming in to the new one
+CREATE TRIGGER IF NOT EXISTS trg_log_moves_rollups AFTER INSERT ON log_moves
+BEGIN
+    UPDATE log_daily_rollups SET
+        quantity_in = quantity_in + NEW.from_quantity
+            - COALESCE((SELECT quantity_change FROM activity_logs WHERE id = NEW.log_id), 0)
+            - MAX(-COALESCE((SELECT quantity_change FROM activity_logs WHERE id = NEW.log_id), 0), 0),
+        quantity_out = quantity_out
+            - MAX(COALESCE((SELECT quantity_change FROM activity_logs WHERE id = NEW.log_id), 0), 0)
+    WHERE (day, stock_id, location_id) = (
+        SELECT date(date_occured), stock_id, location_id FROM activity_logs WHERE id = NEW.log_id
+    );
+
+    INSERT INTO log_daily_rollups (day, stock_id, location_id, stock_name, location_name, quantity_out)
+    SELECT date(date_occured), stock_id, NEW.from_location_id, stock_name, NEW.from_location_name, NEW.from_quantity
+    FROM activity_logs WHERE id = NEW.log_id
+    ON CONFLICT (day, stock_id, location_id) DO UPDATE SET
+        quantity_out = quantity_out + excluded.quantity_out;
+END;
+
+-- Count the logs still in the main database again. No moves have been recorded yet
+-- Logs that have already been archived are counted again by Database.rebuild_log_rollups
+DELETE FROM log_daily_rollups;
+
+INSERT INTO log_daily_rollups
+    (day, stock_id, location_id, stock_name, location_name, quantity_in, quantity_out, created_count, removed_count, updated_count)
+SELECT
+    date(date_occured), stock_id, location_id, MAX(stock_name), MAX(location_name),
+    SUM(CASE
+        WHEN activity_type = 'Created' THEN COALESCE(quantity_change, 0)
+        WHEN activity_type = 'Updated' THEN MAX(-COALESCE(quantity_change, 0), 0)
+        ELSE 0
+    END),
+    SUM(CASE
+        WHEN activity_type = 'Removed' THEN COALESCE(quantity_change, 0)
+        WHEN activity_type = 'Updated' THEN MAX(COALESCE(quantity_change, 0), 0)
+        ELSE 0
+    END),
+    SUM(activity_type = 'Created'),
+    SUM(activity_type = 'Removed'),
+    SUM(activity_type = 'Updated')
+FROM activity_logs
+GROUP BY date(date_occured), stock_id, location_id;
@@ -0,0 +1,89 @@
+Feature: change notifications
+    As a user, I want open pages to update the rows that change
+    so that I see changes made here and by other terminals without reloading whole tables
+
+    Background:
+        Given the test database is clear
+        And a new database object has been initialised
+        And the target database is current_inventory
+        And the following entries exist in stock_data:
+            | # | name    | restock_quantity |
+            | 1 | SCREWS  | 5                |
+        And the following entries exist in location_data:
+            | # | name     |
+            | 1 | WORKSHOP |
+            | 2 | HANGER   |
+        And the following entries exist in current_inventory:
+            | # | stock_name | location_name | quantity |
+            | 1 | SCREWS     | WORKSHOP      | 3        |
+        And I am listening for changes
+
+        Scenario: N1a - Adding a stock instance publishes the instance, its log and its stock type's total
+            Given I want to add the following entry to current_inventory:
+                | stock_name | location_name | quantity |
+                | SCREWS     | HANGER        | 10       |
+            When I run add_data
+            Then the following changes are published:
+                | entity    | action  | id | fields                                    |
+                | log       | added   | 2  |                                           |
+                | inventory | added   | 2  | stock_name,location_name,current_quantity |
+                | quantity  | updated | 1  | total_quantity                            |
+
+        Scenario: N1b - Moving a stock instance publishes the field that changed
+            Given I want to add the following entry to current_inventory:
+                | # | stock_name | location_name |
+                | 1 | SCREWS     | HANGER        |
+            When I run update_data
+            Then the following changes are published:
+                | entity    | action  | id | fields         |
+                | log       | added   | 2  |                |
+                | inventory | updated | 1  | location_name  |
+                | quantity  | updated | 1  | total_quantity |
+
+        Scenario: N1c - Changes that are refused publish nothing
+            Given the target database is location_data
+            And I want to add the following entry to location_data:
+                | name     |
+                | WORKSHOP |
+            When I run add_data
+            Then no changes are published
+
+        Scenario: N1d - Renaming a location publishes the new name
+            Given the target database is location_data
+            And I want to add the following entry to location_data:
+                | # | name    |
+                | 2 | HANGAR  |
+            When I run update_data
+            Then the following changes are published:
+                | entity   | action  | id | fields |
+                | location | updated | 2  | name   |
+
+        Scenario: N2a - Changes made by another terminal are found from its logs
+            When another terminal sets the quantity of instance #1 to 7
+            And I look for changes made by other terminals
+            Then the following changes are published:
+                | entity    | action  | id | fields           |
+                | log       | added   | 2  |                  |
+                | inventory | updated | 1  | current_quantity |
+                | quantity  | updated | 1  | total_quantity   |
+
+        Scenario: N2b - Changes made here are not found again when looking for other terminals' changes
+            Given I want to add the following entry to current_inventory:
+                | stock_name | location_name | quantity |
+                | SCREWS     | HANGER        | 10       |
+            When I run add_data
+            And I stop listening to the changes so far
+            And I look for changes made by other terminals
+            Then no changes are published
+
+        Scenario: N2c - Other terminals' changes that leave no logs mean anything may have changed
+            When another terminal sets the restock quantity of stock type #1 to 9
+            And I look for changes made by other terminals
+            Then the following changes are published:
+                | entity | action  | id | fields |
+                |        | changed |    |        |
+
+        Scenario: N2d - Looking for other terminals' changes does not wait for a write in progress here
+            When this terminal is part way through a write
+            Then looking for changes made by other terminals finishes before the write does
+            When this terminal finishes its write
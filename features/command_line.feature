@@ -0,0 +1,51 @@
+Feature: command line
+    As a user, I want to query the database from the command line
+    so that scheduled jobs can run on machines without a display
+
+    Background:
+        Given the test database is clear
+        And a new database object has been initialised
+        And the target database is current_inventory
+        And the following entries exist in stock_data:
+            | # | name    | restock_quantity |
+            | 1 | SCREWS  | 5                |
+            | 2 | CHAIRS  | 10               |
+        And the following entries exist in location_data:
+            | # | name     |
+            | 1 | WORKSHOP |
+        And the following entries exist in current_inventory:
+            | # | stock_name | location_name | quantity |
+            | 1 | SCREWS     | WORKSHOP      | 3        |
+            | 2 | CHAIRS     | WORKSHOP      | 30       |
+            | 3 | SCREWS     | WORKSHOP      | 1        |
+
+        Scenario: C1a - The command line does not load tkinter
+            Then the command line modules can be loaded without tkinter
+
+        Scenario: C1b - The restock report is written as csv
+            When I call the command line with restock --format csv --check
+            Then the command line exits with status 1
+            And the command line output is:
+                """
+                id,name,restock_quantity,total_quantity
+                1,SCREWS,5,4
+                """
+
+        Scenario: C1c - The inventory is written as json lines a page at a time
+            When I call the command line with inventory --stock screws --page-size 1
+            Then the command line exits with status 0
+            And the command line output is:
+                """
+                {"id": 1, "current_quantity": 3, "location_name": "WORKSHOP", "stock_name": "SCREWS"}
+                {"id": 3, "current_quantity": 1, "location_name": "WORKSHOP", "stock_name": "SCREWS"}
+                """
+
+        Scenario: C1d - Dates that are not dates are refused
+            When I call the command line with log --from 2024-13-01
+            Then the command line exits with status 2
+            And the command line error mentions --from
+            When I call the command line with inventory --as-of yesterday
+            Then the command line exits with status 2
+            And the command line error mentions --as-of
+            When I call the command line with log --from 2024-01-01 --to 2099-01-01
+            Then the command line exits with status 0
@@ -0,0 +1,54 @@
+Feature: csv import and export
+    As a user, I want to be able to move whole tables in and out of the
+    database as csv files, rather than entering rows one at a time
+
+    Background:
+        Given the test database is clear
+        And a new database object has been initialised
+        And the target database is stock_data
+
+        Scenario: F1a - Stock types are normalised and imported from csv
+            When I import the following csv into stock_data:
+                """
+                name,restock_quantity
+                 screws ,5
+                widgets,10
+                """
+            Then 2 rows are imported
+            And the following entry can be found in stock_data:
+                | name   | restock_quantity |
+                | SCREWS | 5                |
+
+        Scenario: F1b - Invalid csv rows are rejected with their line number
+            When I import the following csv into stock_data:
+                """
+                name,restock_quantity
+                screws,5
+                bolts,lots
+                """
+            Then 1 rows are imported
+            And line 3 is rejected
+
+        Scenario: F1c - Names too long for the database are rejected without losing the rest
+            When I import the following csv into stock_data:
+                """
+                name,restock_quantity
+                screws,5
+                aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa,5
+                widgets,10
+                """
+            Then 2 rows are imported
+            And line 3 is rejected
+
+        Scenario: F2a - Tables are exported to csv
+            Given the following entries exist in stock_data:
+                | # | name    | restock_quantity |
+                | 1 | SCREWS  | 5                |
+                | 2 | WIDGETS | 20               |
+            When I export stock_data to csv
+            Then the csv output is:
+                """
+                id,name,restock_quantity
+                1,SCREWS,5
+                2,WIDGETS,20
+                """
@@ -0,0 +1,52 @@
+Feature: data_structures
+    As a developer, I want the objects that carry data between the ui and the
+    database to compare by value, and to be safe to share once frozen
+
+        Scenario: D1a - Data objects with the same values are equal, but cannot be hashed
+            Given a stock type data object named SCREWS with restock quantity 5
+            And another stock type data object named SCREWS with restock quantity 5
+            Then the data objects are equal
+            And the data object cannot be hashed
+
+        Scenario: D1b - A frozen data object cannot be changed, and is still equal to a mutable one
+            Given a stock type data object named SCREWS with restock quantity 5
+            And another stock type data object named SCREWS with restock quantity 5
+            When I freeze the data object
+            Then the data object is frozen
+            And the data object cannot be changed
+            And the data object is still a StockData
+            And the data objects are equal
+
+        Scenario: D1c - Frozen data objects with the same values have the same hash
+            Given a stock type data object named SCREWS with restock quantity 5
+            And another stock type data object named SCREWS with restock quantity 5
+            When I freeze both data objects
+            Then the data objects have the same hash
+
+        Scenario: D1d - Data objects of different types are never equal
+            Given a stock type data object named SCREWS with restock quantity 5
+            And another location data object named SCREWS
+            Then the data objects are not equal
+
+        Scenario: D1e - Only the classes made by freeze() are treated as frozen
+            Given a data object of a StockData subclass named FrozenScrews
+            Then the data object is not frozen
+
+        Scenario: D2a - An inventory data object makes its stock type and location when first used
+            Given an empty inventory data object
+            Then the inventory data object has no stock type or location stored
+            When I freeze the data object
+            Then the data object is frozen
+            And the stock type and location of the inventory data object are frozen too
+
+        Scenario: D2b - A log's date is only filled in when it is first read
+            Given a log data object with no date
+            And another log data object with no date
+            Then the data objects are equal
+            And the log data object has no date stored
+            When I read the date of the log data object
+            Then the log data object has today's date stored
+
+        Scenario: D3a - A log's insert values match the column defaults for anything not given
+            Given a log data object with no date
+            Then the log data object's insert values end with N/A and no quantity change
@@ -0,0 +1,64 @@
+Feature: database connections
+    As a user, I want the database to reuse its connections between
+    operations, so that busy pages do not reopen the database file for every query
+
+    Background:
+        Given the test database is clear
+        And a new database object has been initialised
+
+        Scenario: P1a - Connections are reused between operations
+            When I fetch from stock_data 20 times
+            Then the connection pool has at most 1 open connection
+            And the connection pool has served at least 19 hits
+
+        Scenario: P2a - Reads are not blocked by an open write
+            Given the target database is stock_data
+            And the following entries exist in stock_data:
+                | # | name    | restock_quantity |
+                | 1 | WIDGETS | 20               |
+            When another terminal holds a write open that adds SCREWS to stock_data
+            And I read stock_data while the write is open
+            Then the read finished without waiting for the write
+            And the read returned WIDGETS but not SCREWS
+            When the held write is committed
+            And I read stock_data
+            Then the read returned WIDGETS and SCREWS
+
+        Scenario: P2b - The database is opened in WAL mode
+            Then the database journal mode is wal
+
+        Scenario: P3a - Repeated fetches reuse their compiled query
+            Given I have noted the query cache statistics
+            When I fetch from stock_data 5 times
+            Then the stock_data query cache has served at least 4 more hits
+
+        Scenario: P3b - Each database object counts its own query cache hits
+            Given another database object has been opened
+            When I fetch from stock_data 5 times
+            Then the other database object's query cache has served no fetches
+
+        Scenario: P4a - Profiling times every method call and statement
+            Given the database is profiled with a slow query threshold of 0 ms
+            When I fetch from stock_data 3 times
+            Then the profile shows 3 calls to fetch_data
+            And the profile shows 3 runs of the stock_data fetch statement
+            And the slow query log has the query plan of the stock_data fetch statement
+
+        Scenario: P4b - The slow query log file is moved aside instead of growing without limit
+            Given the database is profiled with a slow query threshold of 0 ms, logging at most 2000 bytes
+            When I fetch from stock_data 50 times
+            Then the slow query log file has been moved aside, keeping each file near 2000 bytes
+
+        Scenario: P5a - A write kept waiting by another terminal reports that the database is busy
+            Given the database waits at most 50 ms for a lock, and retries writes 2 times
+            When another terminal holds the database write lock
+            And I add WIDGETS to stock_data while the write lock is held
+            Then the following error message is returned:
+                | title         | message                                                                  |
+                | Database busy | Another terminal is writing to the database. Please try again in a moment |
+            And the write was retried 2 times before giving up
+            When the other terminal releases the write lock
+            And I add WIDGETS to stock_data
+            Then the following entry can be found in stock_data:
+                | name    | restock_quantity |
+                | WIDGETS | 1                |
@@ -0,0 +1,59 @@
+Feature: database service
+    As a user, I want several terminals to share the database through one service
+    so that they use one set of connections and their changes are made one at a time
+
+    Background:
+        Given the test database is clear
+        And a new database object has been initialised
+        And the database is served over http
+        And the target database is current_inventory
+        And the following entries exist in stock_data:
+            | # | name    | restock_quantity |
+            | 1 | SCREWS  | 5                |
+            | 2 | WIDGETS | 20               |
+        And the following entries exist in location_data:
+            | # | name     |
+            | 1 | WORKSHOP |
+        And the following entries exist in current_inventory:
+            | # | stock_name | location_name | quantity |
+            | 1 | SCREWS     | WORKSHOP      | 3        |
+            | 2 | WIDGETS    | WORKSHOP      | 30       |
+
+        Scenario: S1a - Entries added through the service can be found
+            Then the following entry can be found in current_inventory:
+                | stock_name | location_name | quantity |
+                | WIDGETS    | WORKSHOP      | 30       |
+
+        Scenario: S1b - Errors are returned as messages through the service
+            Given the target database is stock_data
+            And I want to add the following entry to stock_data:
+                | name   | restock_quantity |
+                | SCREWS | 10               |
+            When I run add_data
+            Then the following error message is returned:
+                | title               | message                                   |
+                | Name already exists | Another stock type already has that name. |
+
+        Scenario: S1c - Every result format is returned through the service
+            Then every result format returns the same current_inventory data
+
+        Scenario: S1d - Whole tables are streamed through the service
+            When I export stock_data to csv
+            Then the csv output is:
+                """
+                id,name,restock_quantity
+                1,SCREWS,5
+                2,WIDGETS,20
+                """
+
+        Scenario: S1e - Malformed requests are answered before the connection is closed
+            When I send the service the raw request "GARBAGE\r\n\r\n"
+            Then the service answers with status 400 and closes the connection
+            When I send the service the raw request "POST /fetch_data HTTP/1.1\r\nContent-Length: lots\r\n\r\n"
+            Then the service answers with status 400 and closes the connection
+            When I send the service the raw request "POST /fetch_data HTTP/1.1\r\nno colon here\r\n\r\n"
+            Then the service answers with status 400 and closes the connection
+
+        Scenario: S2a - Writes from several clients at once are all made
+            When 4 clients each add 25 stock types through the service at once
+            Then stock_data holds 102 entries
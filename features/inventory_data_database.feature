@@ -89,4 +89,129 @@ Feature: current_inventory
             Then current_inventory no longer contains entry #1
             And the following entry can be found in activity_log:
                 | # | instance_id | stock_id | stock_name | location_id | location_name | activity_type | update_details | quantity_change |
-                | 1 | 1           | 1        | SCREWS     | 2           | WORKSHOP      | Removed       | N/A            | 20              |
\ No newline at end of file
+                | 1 | 1           | 1        | SCREWS     | 2           | WORKSHOP      | Removed       | N/A            | 20              |
+        Scenario: M11a, M6a - Add many instances to current_inventory at once
+            When I bulk add the following entries to current_inventory:
+                | stock_name | location_name | quantity |
+                | SCREWS     | WORKSHOP      | 20       |
+                | GADGETS    | WORKSHOP      | 5        |
+                | CHAIRS     | HANGER        | 3        |
+            Then the bulk add results are:
+                | result               |
+                | True                 |
+                | Parameters not found |
+                | True                 |
+            And the following entry can be found in current_inventory:
+                | stock_name | location_name | quantity |
+                | CHAIRS     | HANGER        | 3        |
+            And the following entry can be found in activity_log:
+                | # | instance_id | stock_id | stock_name | location_id | location_name | activity_type | update_details | quantity_change |
+                | 2 | 2           | 2        | CHAIRS     | 3           | HANGER        | Created       | N/A            | 3               |
+
+        Scenario: M11b - Instances given ids that are already used are refused without losing the rest
+            Given the following entries exist in current_inventory:
+                | # | stock_name | location_name | quantity |
+                | 1 | SCREWS     | WORKSHOP      | 20       |
+            When I bulk add the following entries to current_inventory:
+                | # | stock_name | location_name | quantity |
+                | 1 | CHAIRS     | HANGER        | 3        |
+                | 5 | WIDGETS    | HANGER        | 4        |
+                | 5 | SCREWS     | HANGER        | 6        |
+                | 2 | CHAIRS     | WORKSHOP      | 7        |
+            Then the bulk add results are:
+                | result            |
+                | Id already exists |
+                | True              |
+                | Id already exists |
+                | True              |
+            And the following entry can be found in current_inventory:
+                | # | stock_name | location_name | quantity |
+                | 5 | WIDGETS    | HANGER        | 4        |
+            And the following entry can be found in current_inventory:
+                | # | stock_name | location_name | quantity |
+                | 2 | CHAIRS     | WORKSHOP      | 7        |
+
+        Scenario: M12a - Fetch current_inventory one page at a time
+            Given the following entries exist in current_inventory:
+                | # | stock_name | location_name | quantity |
+                | 1 | SCREWS     | WORKSHOP      | 20       |
+                | 2 | CHAIRS     | WORKSHOP      | 5        |
+                | 3 | WIDGETS    | HANGER        | 3        |
+                | 4 | SCREWS     | HANGER        | 8        |
+            When I fetch a page of 2 current_inventory entries after entry #1
+            Then the page contains entries 2, 3
+
+        Scenario: M12b - Fetch current_inventory pages newest first
+            Given the following entries exist in current_inventory:
+                | # | stock_name | location_name | quantity |
+                | 1 | SCREWS     | WORKSHOP      | 20       |
+                | 2 | CHAIRS     | WORKSHOP      | 5        |
+                | 3 | WIDGETS    | HANGER        | 3        |
+            When I fetch a page of 5 current_inventory entries before entry #3
+            Then the page contains entries 2, 1
+
+        Scenario: M13a - Fetch a single instance by its id
+            Given the following entries exist in current_inventory:
+                | # | stock_name | location_name | quantity |
+                | 1 | SCREWS     | WORKSHOP      | 20       |
+                | 2 | CHAIRS     | WORKSHOP      | 5        |
+                | 3 | SCREWS     | HANGER        | 8        |
+            When I fetch entry #3 from current_inventory
+            Then the page contains entries 3
+
+        Scenario: M14a - Fetch current_inventory in every result format
+            Given the following entries exist in current_inventory:
+                | # | stock_name | location_name | quantity |
+                | 1 | SCREWS     | WORKSHOP      | 20       |
+                | 2 | CHAIRS     | WORKSHOP      | 5        |
+            Then every result format returns the same current_inventory data
+
+        Scenario: M15a - Names changed by another terminal are picked up
+            Given another terminal has renamed location #3 to HANGAR
+            And I want to add the following entry to current_inventory:
+                | stock_name | location_name | quantity |
+                | SCREWS     | HANGAR        | 4        |
+            When I run add_data
+            Then the following entry can be found in current_inventory:
+                | stock_name | location_name | quantity |
+                | SCREWS     | HANGAR        | 4        |
+            And the following entry can be found in activity_log:
+                | # | instance_id | stock_id | stock_name | location_id | location_name | activity_type | update_details | quantity_change |
+                | 1 | 1           | 1        | SCREWS     | 3           | HANGAR        | Created       | N/A            | 4               |
+
+        Scenario: M16a - Search current_inventory by the start of a stock name
+            Given the following entries exist in current_inventory:
+                | # | stock_name | location_name | quantity |
+                | 1 | SCREWS     | WORKSHOP      | 20       |
+                | 2 | CHAIRS     | WORKSHOP      | 5        |
+                | 3 | SCREWS     | HANGER        | 8        |
+                | 4 | WIDGETS    | HANGER        | 3        |
+            When I search current_inventory for stock names starting with SC
+            Then the page contains entries 1, 3
+
+        Scenario: M16b - Search activity_log by stock name
+            Given the following entries exist in current_inventory:
+                | # | stock_name | location_name | quantity |
+                | 1 | SCREWS     | WORKSHOP      | 20       |
+                | 2 | CHAIRS     | WORKSHOP      | 5        |
+                | 3 | SCREWS     | HANGER        | 8        |
+            When I search activity_log for the stock name CHAIRS
+            Then the page contains entries 2
+
+        Scenario: M16c - Search current_inventory for part of a location name
+            Given the following entries exist in current_inventory:
+                | # | stock_name | location_name | quantity |
+                | 1 | SCREWS     | WORKSHOP      | 20       |
+                | 2 | CHAIRS     | WAREHOUSE     | 5        |
+                | 3 | WIDGETS    | HANGER        | 3        |
+            When I search current_inventory for location names containing WARE
+            Then the page contains entries 2
+
+        Scenario: M16d - Search activity_log for part of a stock name
+            Given the following entries exist in current_inventory:
+                | # | stock_name | location_name | quantity |
+                | 1 | SCREWS     | WORKSHOP      | 20       |
+                | 2 | CHAIRS     | WORKSHOP      | 5        |
+                | 3 | WIDGETS    | HANGER        | 8        |
+            When I search activity_log for stock names containing AIR
+            Then the page contains entries 2
@@ -0,0 +1,67 @@
+Feature: inventory history
+    As a user, I want to see what the inventory was on an earlier date
+    so that I can check what was held somewhere in the past
+
+    Background:
+        Given the test database is clear
+        And a new database object has been initialised
+        And the target database is current_inventory
+
+        Scenario: H1a - The inventory is rebuilt from the logs
+            Given the following logs were recorded:
+                | # | instance_id | stock_name | location_name | activity_type | quantity_change | date_occured        |
+                | 1 | 1           | SCREWS     | WORKSHOP      | Created       | 20              | 2024-01-15 10:00:00 |
+                | 2 | 2           | CHAIRS     | HANGER        | Created       | 5               | 2024-01-20 09:00:00 |
+                | 3 | 1           | SCREWS     | HANGER        | Updated       | 5               | 2024-02-03 12:00:00 |
+                | 4 | 2           | CHAIRS     | HANGER        | Removed       | 5               | 2024-02-10 08:00:00 |
+                | 5 | 3           | WIDGETS    | WORKSHOP      | Created       | 3               | 2024-03-01 08:00:00 |
+            When I view the inventory as of 2024-02-01
+            Then the inventory is:
+                | # | stock_name | location_name | current_quantity |
+                | 1 | SCREWS     | WORKSHOP      | 20               |
+                | 2 | CHAIRS     | HANGER        | 5                |
+            When I view the inventory as of 2024-03-01 08:00:00
+            Then the inventory is:
+                | # | stock_name | location_name | current_quantity |
+                | 1 | SCREWS     | HANGER        | 15               |
+
+        Scenario: H1b - The inventory at one location is rebuilt from archived logs
+            Given the following logs were recorded:
+                | # | instance_id | stock_name | location_name | activity_type | quantity_change | date_occured        |
+                | 1 | 1           | SCREWS     | WORKSHOP      | Created       | 20              | 2024-01-15 10:00:00 |
+                | 2 | 2           | CHAIRS     | HANGER        | Created       | 5               | 2024-01-20 09:00:00 |
+                | 3 | 1           | SCREWS     | HANGER        | Updated       | 5               | 2024-02-03 12:00:00 |
+                | 4 | 3           | WIDGETS    | WORKSHOP      | Created       | 3               | 2024-03-01 08:00:00 |
+            When I archive the logs from before 2024-03-01
+            And I view the inventory at HANGER as of 2024-03-02
+            Then the inventory is:
+                | # | stock_name | location_name | current_quantity |
+                | 1 | SCREWS     | HANGER        | 15               |
+                | 2 | CHAIRS     | HANGER        | 5                |
+
+        Scenario: H2a - Inventory changes take a checkpoint to rebuild from
+            Given the following entries exist in stock_data:
+                | # | name    | restock_quantity |
+                | 1 | SCREWS  | 5                |
+                | 2 | CHAIRS  | 10               |
+            And the following entries exist in location_data:
+                | # | name      |
+                | 1 | WAREHOUSE |
+                | 2 | WORKSHOP  |
+            And the following entries exist in current_inventory:
+                | # | stock_name | location_name | quantity |
+                | 1 | SCREWS     | WORKSHOP      | 20       |
+                | 2 | CHAIRS     | WAREHOUSE     | 4        |
+            And I want to set the quantity of entry #1 to 5
+            When I run update_data
+            Then 0 inventory checkpoints have been taken
+            When the due inventory checkpoints are taken
+            Then 1 inventory checkpoint has been taken
+            And the inventory as of now matches current_inventory
+            Given I want to set the quantity of entry #1 to 7
+            When I run update_data
+            And the due inventory checkpoints are taken
+            Then 1 inventory checkpoint has been taken
+            When I take a checkpoint of the inventory
+            Then 2 inventory checkpoints have been taken
+            And the inventory as of now matches current_inventory
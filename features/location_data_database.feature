@@ -51,6 +51,19 @@ Feature: location_data
                 | # | name     |
                 | 1 | WORKSHOP |
 
+        Scenario: S2d - Location not renamed to the name of another location
+            Given the following entries exist in location_data:
+                | # | name      |
+                | 1 | WAREHOUSE |
+                | 2 | WORKSHOP  |
+            And I want to set the name of entry #1 to WORKSHOP
+            But an entry with that name already exists
+            When I run update_data
+            Then location_data is not altered
+            And the following error message is returned:
+                | title               | message                                 |
+                | Name already exists | Another location already has that name. |
+
         Scenario: C1a - Delete location from location_data database
             Given the following entries exist in location_data:
                 | # | name      |
@@ -76,3 +89,15 @@ Feature: location_data
             And the following error message is returned:
                 | title           | message                                                                               |
                 | Location in use | This data entry cannot be deleted, as there are stock instances that currently use it |
+
+        Scenario: S7d - Renamed locations are found by their new name only
+            Given the following entries exist in location_data:
+                | # | name      |
+                | 1 | WAREHOUSE |
+                | 2 | WORKSHOP  |
+            And I want to set the name of entry #1 to STOREROOM
+            When I run update_data
+            And I search location_data for location names containing HOUSE
+            Then the page contains no entries
+            When I search location_data for location names containing ROOM
+            Then the page contains entries 1
@@ -0,0 +1,57 @@
+Feature: log archives
+    As a user, I want old activity logs moved out of the main database
+    so that it stays small, while the whole history can still be searched
+
+    Background:
+        Given the test database is clear
+        And a new database object has been initialised
+        And the target database is activity_log
+        And the following logs were recorded:
+            | # | stock_name | location_name | activity_type | quantity_change | date_occured        |
+            | 1 | SCREWS     | WORKSHOP      | Created       | 20              | 2024-01-15 10:00:00 |
+            | 2 | CHAIRS     | WORKSHOP      | Created       | 5               | 2024-02-03 09:00:00 |
+            | 3 | SCREWS     | HANGER        | Created       | 8               | 2024-02-20 12:00:00 |
+            | 4 | WIDGETS    | HANGER        | Created       | 3               | 2024-03-01 08:00:00 |
+
+        Scenario: A1a - Closed months are moved to archives
+            When I archive the logs from before 2024-03-01
+            Then the archived months are 2024-01, 2024-02
+            And the main database only holds logs 4
+            When I fetch from activity_log
+            Then the page contains entries 1, 2, 3, 4
+
+        Scenario: A1b - Logs can be fetched by date from the archives
+            When I archive the logs from before 2024-03-01
+            And I fetch the activity_log entries dated from 2024-02-01 to 2024-03-01
+            Then the page contains entries 2, 3
+
+        Scenario: A1c - Log pages run across the archives
+            When I archive the logs from before 2024-03-01
+            And I fetch a page of 2 activity_log entries after entry #1
+            Then the page contains entries 2, 3
+            When I fetch a page of 2 activity_log entries before entry #4
+            Then the page contains entries 3, 2
+
+        Scenario: A1d - Archived logs are searched by name
+            When I archive the logs from before 2024-03-01
+            And I search activity_log for the stock name SCREWS
+            Then the page contains entries 1, 3
+
+        Scenario: A1e - Archiving again changes nothing
+            When I archive the logs from before 2024-03-01
+            And I archive the logs from before 2024-03-01
+            Then the archived months are 2024-01, 2024-02
+            When I fetch from activity_log
+            Then the page contains entries 1, 2, 3, 4
+
+        Scenario: A1f - Exported logs include the archives
+            When I archive the logs from before 2024-03-01
+            And I export activity_logs to csv
+            Then the csv output is:
+                """
+                id,instance_id,stock_id,stock_name,location_id,location_name,activity_type,update_details,quantity_change,date_occured
+                1,1,1,SCREWS,1,WORKSHOP,Created,N/A,20,2024-01-15 10:00:00
+                2,2,2,CHAIRS,1,WORKSHOP,Created,N/A,5,2024-02-03 09:00:00
+                3,3,1,SCREWS,2,HANGER,Created,N/A,8,2024-02-20 12:00:00
+                4,4,3,WIDGETS,2,HANGER,Created,N/A,3,2024-03-01 08:00:00
+                """
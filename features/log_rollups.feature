@@ -0,0 +1,76 @@
+Feature: log rollups
+    As a user, I want totals of how much stock moved through each location
+    so that reports over long periods do not have to read every log
+
+    Background:
+        Given the test database is clear
+        And a new database object has been initialised
+        And the target database is activity_log
+        And the following logs were recorded:
+            | # | stock_name | location_name | activity_type | quantity_change | date_occured        |
+            | 1 | SCREWS     | WORKSHOP      | Created       | 20              | 2024-01-15 10:00:00 |
+            | 2 | SCREWS     | WORKSHOP      | Updated       | 5               | 2024-01-15 16:00:00 |
+            | 3 | SCREWS     | WORKSHOP      | Removed       | 15              | 2024-02-03 09:00:00 |
+            | 4 | SCREWS     | HANGER        | Created       | 8               | 2024-02-20 12:00:00 |
+            | 5 | CHAIRS     | HANGER        | Created       | 3               | 2024-03-01 08:00:00 |
+
+        Scenario: R1a - Logs are totalled by day as they are added
+            When I fetch the log rollups by day
+            Then the log rollups are:
+                | period     | stock_name | location_name | quantity_in | quantity_out | net_quantity | created_count | removed_count | updated_count |
+                | 2024-01-15 | SCREWS     | WORKSHOP      | 20          | 5            | 15           | 1             | 0             | 1             |
+                | 2024-02-03 | SCREWS     | WORKSHOP      | 0           | 15           | -15          | 0             | 1             | 0             |
+                | 2024-02-20 | SCREWS     | HANGER        | 8           | 0            | 8            | 1             | 0             | 0             |
+                | 2024-03-01 | CHAIRS     | HANGER        | 3           | 0            | 3            | 1             | 0             | 0             |
+
+        Scenario: R1b - Rollups are grouped by month and filtered by name and date
+            When I fetch the log rollups by month for SCREWS from 2024-01-01 to 2024-03-01
+            Then the log rollups are:
+                | period  | stock_name | location_name | quantity_in | quantity_out | net_quantity | last_day   |
+                | 2024-01 | SCREWS     | WORKSHOP      | 20          | 5            | 15           | 2024-01-15 |
+                | 2024-02 | SCREWS     | HANGER        | 8           | 0            | 8            | 2024-02-20 |
+                | 2024-02 | SCREWS     | WORKSHOP      | 0           | 15           | -15          | 2024-02-03 |
+
+        Scenario: R1c - Archiving logs does not change the rollups
+            When I archive the logs from before 2024-03-01
+            And I fetch the log rollups by all
+            Then the log rollups are:
+                | period | stock_name | location_name | quantity_in | quantity_out | net_quantity |
+                | all    | CHAIRS     | HANGER        | 3           | 0            | 3            |
+                | all    | SCREWS     | HANGER        | 8           | 0            | 8            |
+                | all    | SCREWS     | WORKSHOP      | 20          | 20           | 0            |
+
+        Scenario: R1d - Rollups can be rebuilt from the logs and the archives
+            When I archive the logs from before 2024-02-01
+            And I rebuild the log rollups
+            And I fetch the log rollups by all
+            Then the log rollups are:
+                | period | stock_name | location_name | quantity_in | quantity_out | net_quantity |
+                | all    | CHAIRS     | HANGER        | 3           | 0            | 3            |
+                | all    | SCREWS     | HANGER        | 8           | 0            | 8            |
+                | all    | SCREWS     | WORKSHOP      | 20          | 20           | 0            |
+
+        Scenario: R2a - Increases are counted in and moves are counted out of the old location
+            Given the following entries exist in stock_data:
+                | # | name  | restock_quantity |
+                | 1 | BOLTS | 5                |
+            And the following entries exist in location_data:
+                | # | name      |
+                | 1 | WAREHOUSE |
+                | 2 | SHOP      |
+            And the following entries exist in current_inventory:
+                | # | stock_name | location_name | quantity |
+                | 1 | BOLTS      | WAREHOUSE     | 3        |
+            When I set instance #1 of BOLTS to 10 at WAREHOUSE
+            And I set instance #1 of BOLTS to 4 at SHOP
+            And I fetch the log rollups by all for BOLTS from 2000-01-01 to 2999-12-31
+            Then the log rollups are:
+                | period | stock_name | location_name | quantity_in | quantity_out | net_quantity | created_count | removed_count | updated_count |
+                | all    | BOLTS      | SHOP          | 4           | 0            | 4            | 0             | 0             | 1             |
+                | all    | BOLTS      | WAREHOUSE     | 10          | 10           | 0            | 1             | 0             | 1             |
+            When I rebuild the log rollups
+            And I fetch the log rollups by all for BOLTS from 2000-01-01 to 2999-12-31
+            Then the log rollups are:
+                | period | stock_name | location_name | quantity_in | quantity_out | net_quantity | created_count | removed_count | updated_count |
+                | all    | BOLTS      | SHOP          | 4           | 0            | 4            | 0             | 0             | 1             |
+                | all    | BOLTS      | WAREHOUSE     | 10          | 10           | 0            | 1             | 0             | 1             |
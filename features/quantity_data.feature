@@ -56,3 +56,24 @@ Feature: quantity_data
                 | 5 | SCREWS       | WAREHOUSE      | 2        |
             When I check what needs restocking
             Then I see that SCREWS need restocking 
+
+        Scenario: M5b - Restock flags follow deleted instances
+            Given the following entries exist in current_inventory:
+                | # | stock_name   | location_name  | quantity |
+                | 1 | WIDGETS      | WORKSHOP       | 10       |
+                | 2 | WIDGETS      | WORKSHOP       | 5        |
+                | 3 | WIDGETS      | WAREHOUSE      | 6        |
+            And I want to delete entry #3 from current_inventory
+            When I run delete_data
+            And I check what needs restocking
+            Then I see that WIDGETS need restocking
+
+        Scenario: M5c - Restock flags follow updated quantities
+            Given the following entries exist in current_inventory:
+                | # | stock_name   | location_name  | quantity |
+                | 1 | WIDGETS      | WORKSHOP       | 21       |
+                | 2 | SCREWS       | WORKSHOP       | 1        |
+            And I want to set the quantity of entry #2 to 30
+            When I run update_data
+            And I check what needs restocking
+            Then I see that nothing needs restocking
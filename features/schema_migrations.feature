@@ -0,0 +1,40 @@
+Feature: schema migrations
+    As a user, I want the database schema to be upgraded automatically when the
+    program is updated, without slowing down start-up once it is up to date
+
+    Background:
+        Given the test database is clear
+
+        Scenario: V1a - A new database is migrated to the latest schema version
+            Given a new database object has been initialised
+            Then the schema is at the latest version
+
+        Scenario: V1b - An up to date database applies no migrations
+            Given a new database object has been initialised
+            When I initialise the database again
+            Then no migrations are applied
+
+        Scenario: V2a - Stock types and locations that share a name are renamed when names are made unique
+            Given the test database only has the first schema version
+            And the following rows were added to stock_data before names had to be unique:
+                | # | name   | restock_quantity |
+                | 1 | SCREWS | 5                |
+                | 2 | SCREWS | 10               |
+                | 3 | CHAIRS | 2                |
+                | 4 | SCREWS | 1                |
+            And the following rows were added to location_data before names had to be unique:
+                | # | name     |
+                | 1 | WORKSHOP |
+                | 2 | WORKSHOP |
+            When I open the database
+            Then the schema is at the latest version
+            And stock_data has the following names:
+                | # | name               |
+                | 1 | SCREWS             |
+                | 2 | SCREWS DUPLICATE 2 |
+                | 3 | CHAIRS             |
+                | 4 | SCREWS DUPLICATE 4 |
+            And location_data has the following names:
+                | # | name                 |
+                | 1 | WORKSHOP             |
+                | 2 | WORKSHOP DUPLICATE 2 |
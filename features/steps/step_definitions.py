@@ -1,6 +1,20 @@
+import socket
+import threading
+import time
+import io
+import subprocess
+import sys
+import sqlite3
+from contextlib import redirect_stderr, redirect_stdout
+from datetime import datetime
+from pathlib import Path
 from behave import given, when, then
 from database import Database
 import data_structures as ds
+import migrations
+import csv_transfer
+import cli
+from service import DatabaseService, ServiceClient
 
 def dict_to_dto(row, dto_type):
     """
@@ -43,15 +57,26 @@ def db_name_to_dto_type(db_name: str):
 def table_to_dict_list(table):
     return [row_to_dict(row) for row in table]
 
+def open_database(context, **options):
+    """
+    Opens the test database as context.db, closing the one it replaces
+    Whichever is open when the scenario ends is closed then, so no connections or locks are left behind
+    """
+    if getattr(context, "db", None) is not None:
+        context.db.close()
+    context.db = Database(test_data=True, **options)
+    context.add_cleanup(context.db.close)
+
 
 @given("the test database is clear")
 def step_impl(context):
     db = Database(test_data=True)
     db.reset_tables()
+    db.close()
 
 @given("a new database object has been initialised")
 def step_impl(context):
-    context.db = Database(test_data=True)
+    open_database(context)
 
 @given("the target database is {db_name}")
 def step_impl(context, db_name):
@@ -243,6 +268,8 @@ def step_impl(context, item_name):
         dto = db_name_to_dto_type("stock_quantity")()
         all_stock_types = context.db.fetch_data(dto)
         assert all_stock_types == context.result
+    elif item_name == "nothing":
+        assert context.result == []
     else:
         assert item_name in context.result[0].values()
 
@@ -254,3 +281,683 @@ def step_impl(context, db_name):
         assert len(result) == 0
     except:
         assert False
+
+@when("I fetch from {db_name} {count:d} times")
+def step_impl(context, count, db_name):
+    dto_type = db_name_to_dto_type(db_name)
+    for _ in range(count):
+        context.db.fetch_data(dto_type())
+
+@then("the connection pool has at most {count:d} open connection")
+@then("the connection pool has at most {count:d} open connections")
+def step_impl(context, count):
+    assert context.db.pool_stats()["open_connections"] <= count
+
+@then("the connection pool has served at least {count:d} hits")
+def step_impl(context, count):
+    assert context.db.pool_stats()["hits"] >= count
+
+@when("I initialise the database again")
+def step_impl(context):
+    with context.db.get_database_connection() as conn:
+        context.migrations_applied = migrations.apply_migrations(conn)
+
+@then("the schema is at the latest version")
+def step_impl(context):
+    with context.db.get_database_connection() as conn:
+        assert migrations.get_schema_version(conn) == migrations.LATEST_VERSION
+
+@given("the test database only has the first schema version")
+def step_impl(context):
+    # The test database has just been cleared, so has no tables and a schema version of 0
+    conn = sqlite3.connect("./features/test_data/stock_database.db")
+    for statement in migrations.split_statements((migrations.MIGRATIONS_DIR / migrations.MIGRATIONS[0]).read_text()):
+        conn.execute(statement)
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+@given("the following rows were added to {table} before names had to be unique:")
+def step_impl(context, table):
+    rows = table_to_dict_list(context.table)
+    columns = list(rows[0])
+    conn = sqlite3.connect("./features/test_data/stock_database.db")
+    conn.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+        [tuple(row[column] for column in columns) for row in rows]
+    )
+    conn.commit()
+    conn.close()
+
+@when("I open the database")
+def step_impl(context):
+    open_database(context)
+
+@then("{table} has the following names:")
+def step_impl(context, table):
+    expected = [(row["id"], row["name"]) for row in table_to_dict_list(context.table)]
+    with context.db.get_database_connection() as conn:
+        actual = [tuple(row) for row in conn.execute(f"SELECT id, name FROM {table} ORDER BY id").fetchall()]
+    assert actual == expected, actual
+
+@then("no migrations are applied")
+def step_impl(context):
+    assert context.migrations_applied == 0
+
+@when("I bulk add the following entries to {db_name}:")
+def step_impl(context, db_name):
+    dto_type = db_name_to_dto_type(db_name)
+    dtos = [dict_to_dto(row_to_dict(row), dto_type) for row in context.table]
+    context.bulk_results = context.db.bulk_add(dtos)
+
+@then("the bulk add results are:")
+def step_impl(context):
+    expected = [row["result"] for row in context.table]
+    actual = [str(result) if result is True else result.title for result in context.bulk_results]
+    assert expected == actual
+
+@when("I import the following csv into {db_name}:")
+def step_impl(context, db_name):
+    context.import_result = csv_transfer.import_table(context.db, db_name, io.StringIO(context.text))
+
+@when("I export {db_name} to csv")
+def step_impl(context, db_name):
+    out = io.StringIO(newline="")
+    csv_transfer.export_table(context.db, db_name, out)
+    context.csv_output = out.getvalue()
+
+@then("{count:d} rows are imported")
+def step_impl(context, count):
+    assert context.import_result.added == count
+
+@then("line {line:d} is rejected")
+def step_impl(context, line):
+    assert line in [rejected_line for rejected_line, _ in context.import_result.rejected]
+
+@then("the csv output is:")
+def step_impl(context):
+    assert context.csv_output.splitlines() == context.text.splitlines()
+
+@when("I fetch a page of {page_size:d} {db_name} entries after entry #{after_id:d}")
+def step_impl(context, page_size, db_name, after_id):
+    dto = db_name_to_dto_type(db_name)()
+    context.page = context.db.fetch_data(dto, after_id=after_id, page_size=page_size)
+
+@when("I fetch a page of {page_size:d} {db_name} entries before entry #{after_id:d}")
+def step_impl(context, page_size, db_name, after_id):
+    dto = db_name_to_dto_type(db_name)()
+    context.page = context.db.fetch_data(dto, after_id=after_id, page_size=page_size, descending=True)
+
+@then("the page contains entries {ids}")
+def step_impl(context, ids):
+    expected = [int(id_str) for id_str in ids.split(",")]
+    assert [row["id"] for row in context.page] == expected
+
+@when("another terminal holds a write open that adds {name} to stock_data")
+def step_impl(context, name):
+    context.write_started = threading.Event()
+    context.write_release = threading.Event()
+
+    def hold_write():
+        with context.db.get_write_connection() as conn:
+            conn.execute("INSERT INTO stock_data (name, restock_quantity) VALUES (?, 1)", (name,))
+            context.write_started.set()
+            context.write_release.wait(10)
+
+    context.write_thread = threading.Thread(target=hold_write)
+    context.write_thread.start()
+    assert context.write_started.wait(5)
+
+@when("I read stock_data while the write is open")
+@when("I read stock_data")
+def step_impl(context):
+    start = time.perf_counter()
+    context.read_names = [row["name"] for row in context.db.fetch_data(ds.StockData())]
+    context.read_time = time.perf_counter() - start
+
+@then("the read finished without waiting for the write")
+def step_impl(context):
+    assert context.write_thread.is_alive()
+    assert context.read_time < 1.0
+
+@then("the read returned {present} but not {absent}")
+def step_impl(context, present, absent):
+    assert present in context.read_names
+    assert absent not in context.read_names
+
+@then("the read returned {first} and {second}")
+def step_impl(context, first, second):
+    assert first in context.read_names
+    assert second in context.read_names
+
+@when("the held write is committed")
+def step_impl(context):
+    context.write_release.set()
+    context.write_thread.join(5)
+
+@then("the database journal mode is {mode}")
+def step_impl(context, mode):
+    with context.db.get_database_connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == mode
+
+@when("I fetch entry #{id:d} from {db_name}")
+def step_impl(context, id, db_name):
+    dto = db_name_to_dto_type(db_name)(id_str=id)
+    context.page = context.db.fetch_data(dto)
+
+@given("I have noted the query cache statistics")
+def step_impl(context):
+    context.query_cache_stats = context.db.query_cache_stats()
+
+@then("the {db_name} query cache has served at least {count:d} more hits")
+def step_impl(context, db_name, count):
+    before = context.query_cache_stats[db_name]
+    after = context.db.query_cache_stats()[db_name]
+    assert after["hits"] - before["hits"] >= count
+    assert after["misses"] - before["misses"] <= 1
+
+@given("another database object has been opened")
+def step_impl(context):
+    context.other_db = Database(test_data=True)
+    context.add_cleanup(context.other_db.close)
+
+@then("the other database object's query cache has served no fetches")
+def step_impl(context):
+    stats = context.other_db.query_cache_stats()
+    assert all(builder["hits"] == 0 and builder["misses"] == 0 for builder in stats.values()), stats
+
+@then("every result format returns the same {db_name} data")
+def step_impl(context, db_name):
+    dto = db_name_to_dto_type(db_name)()
+    dicts = context.db.fetch_data(dto)
+    assert len(dicts) > 0
+
+    tuples = context.db.fetch_data(dto, result_format="tuples")
+    assert [dict(zip(tuples.columns, row)) for row in tuples] == dicts
+
+    assert list(context.db.fetch_data(dto, result_format="iter")) == dicts
+
+    columns = context.db.fetch_data(dto, result_format="columns")
+    assert [dict(zip(columns, row)) for row in zip(*columns.values())] == dicts
+
+@given("another terminal has renamed location #{id:d} to {name}")
+def step_impl(context, id, name):
+    # A separate Database object has its own connections and name cache, like another terminal would
+    other_terminal = Database(test_data=True)
+    assert other_terminal.update_data(ds.LocationData(id_str=id, name=name)) is True
+    other_terminal.close()
+
+def dto_with_stock_name(db_name: str, name: str):
+    """
+    Returns a query for the given table with its stock name filter set
+    """
+    dto = db_name_to_dto_type(db_name)()
+    if isinstance(dto, ds.InventoryData):
+        dto._stock_type._name = name
+    elif isinstance(dto, ds.StockData):
+        dto._name = name
+    else:
+        dto._stock_name = name
+    return dto
+
+def dto_with_location_name(db_name: str, name: str):
+    """
+    Returns a query for the given table with its location name filter set
+    """
+    dto = db_name_to_dto_type(db_name)()
+    if isinstance(dto, ds.InventoryData):
+        dto._location._name = name
+    elif isinstance(dto, ds.LocationData):
+        dto._name = name
+    else:
+        dto._location_name = name
+    return dto
+
+@when("I search {db_name} for stock names starting with {prefix}")
+def step_impl(context, db_name, prefix):
+    context.page = context.db.fetch_data(dto_with_stock_name(db_name, prefix), search="prefix")
+
+@when("I search {db_name} for the stock name {name}")
+def step_impl(context, db_name, name):
+    context.page = context.db.fetch_data(dto_with_stock_name(db_name, name))
+
+@when("I search {db_name} for stock names containing {text}")
+def step_impl(context, db_name, text):
+    context.page = context.db.fetch_data(dto_with_stock_name(db_name, text), search="fuzzy")
+
+@when("I search {db_name} for location names containing {text}")
+def step_impl(context, db_name, text):
+    context.page = context.db.fetch_data(dto_with_location_name(db_name, text), search="fuzzy")
+
+@then("the page contains no entries")
+def step_impl(context):
+    assert len(context.page) == 0
+
+@given("the database is profiled with a slow query threshold of {ms:d} ms")
+def step_impl(context, ms):
+    open_database(context, profile=True, slow_query_ms=ms)
+
+@given("the database is profiled with a slow query threshold of {ms:d} ms, logging at most {size:d} bytes")
+def step_impl(context, ms, size):
+    context.db.close()
+    for name in ("slow_queries.log", "slow_queries.log.1"):
+        (Path("./features/test_data") / name).unlink(missing_ok=True)
+    open_database(context, profile=True, slow_query_ms=ms, slow_log_bytes=size)
+
+@then("the slow query log file has been moved aside, keeping each file near {size:d} bytes")
+def step_impl(context, size):
+    log_path = Path("./features/test_data/slow_queries.log")
+    moved_path = Path("./features/test_data/slow_queries.log.1")
+    assert moved_path.exists()
+    # A file is only moved aside once it reaches the limit, so it can pass it by one entry
+    assert log_path.stat().st_size < size * 2
+    assert moved_path.stat().st_size < size * 2
+
+@then("the profile shows {count:d} calls to {method}")
+def step_impl(context, count, method):
+    assert context.db.diagnostics()["methods"][method]["calls"] == count
+
+@then("the profile shows {count:d} runs of the stock_data fetch statement")
+def step_impl(context, count):
+    statements = context.db.diagnostics()["statements"]
+    assert statements["SELECT * FROM stock_data WHERE 1=1 ORDER BY id"]["calls"] == count
+
+@then("the slow query log has the query plan of the stock_data fetch statement")
+def step_impl(context):
+    slow_queries = context.db.diagnostics()["slow_queries"]
+    plans = [entry["plan"] for entry in slow_queries if entry["sql"] == "SELECT * FROM stock_data WHERE 1=1 ORDER BY id"]
+    assert len(plans) > 0
+    assert all(plan and "stock_data" in plan[0] for plan in plans)
+
+@given("the following logs were recorded:")
+def step_impl(context):
+    # Logs are written straight to the table, as the database always dates the logs it writes itself
+    # Each stock and location name is given its own id, in the order they first appear
+    stock_ids = {}
+    location_ids = {}
+    with context.db.get_write_connection() as conn:
+        for row in table_to_dict_list(context.table):
+            stock_id = stock_ids.setdefault(row["stock_name"], len(stock_ids) + 1)
+            location_id = location_ids.setdefault(row["location_name"], len(location_ids) + 1)
+            conn.execute("""
+                INSERT INTO activity_logs
+                    (id, instance_id, stock_id, stock_name, location_id, location_name, activity_type, quantity_change, date_occured)
+                VALUES (?,?,?,?,?,?,?,?,?)
+            """, (
+                row["id"], row.get("instance_id", row["id"]), stock_id, row["stock_name"], location_id, row["location_name"],
+                row["activity_type"], row["quantity_change"], row["date_occured"]
+            ))
+
+@when("I archive the logs from before {day}")
+def step_impl(context, day):
+    context.archived = context.db.archive_logs(day)
+
+@then("the archived months are {periods}")
+def step_impl(context, periods):
+    assert [entry["period"] for entry in context.db.log_archives()] == periods.split(", ")
+
+@then("the main database only holds logs {ids}")
+def step_impl(context, ids):
+    with context.db.get_database_connection() as conn:
+        held = [row[0] for row in conn.execute("SELECT id FROM activity_logs ORDER BY id")]
+    assert held == [int(id_str) for id_str in ids.split(",")]
+
+@when("I fetch from {db_name}")
+def step_impl(context, db_name):
+    context.page = context.db.fetch_data(db_name_to_dto_type(db_name)())
+
+@when("I fetch the {db_name} entries dated from {start} to {end}")
+def step_impl(context, db_name, start, end):
+    context.page = context.db.fetch_data(db_name_to_dto_type(db_name)(), start=start, end=end)
+
+@when("I fetch the log rollups by {period} for {stock_name} from {start} to {end}")
+def step_impl(context, period, stock_name, start, end):
+    context.rollups = context.db.fetch_log_rollups(stock_name=stock_name, start=start, end=end, period=period)
+
+@when("I fetch the log rollups by {period}")
+def step_impl(context, period):
+    context.rollups = context.db.fetch_log_rollups(period=period)
+
+@when("I rebuild the log rollups")
+def step_impl(context):
+    context.db.rebuild_log_rollups()
+
+@when("I set instance #{id:d} of {stock_name} to {quantity:d} at {location_name}")
+def step_impl(context, id, stock_name, quantity, location_name):
+    context.result = context.db.update_data(ds.InventoryData(
+        id_str=id, location=ds.LocationData(name=location_name), stock_type=ds.StockData(name=stock_name), quantity=quantity
+    ))
+    assert context.result is True, context.result
+
+@then("the log rollups are:")
+def step_impl(context):
+    expected = [{heading: row[heading] for heading in context.table.headings} for row in context.table]
+    actual = [{heading: str(rollup[heading]) for heading in context.table.headings} for rollup in context.rollups]
+    assert actual == expected, actual
+
+@when("I view the inventory at {location_name} as of {timestamp}")
+def step_impl(context, location_name, timestamp):
+    context.page = context.db.inventory_as_of(timestamp, ds.InventoryData(location=ds.LocationData(name=location_name)))
+
+@when("I view the inventory as of {timestamp}")
+def step_impl(context, timestamp):
+    context.page = context.db.inventory_as_of(timestamp)
+
+@then("the inventory is:")
+def step_impl(context):
+    expected = table_to_dict_list(context.table)
+    assert [{key: row[key] for key in expected[0]} for row in context.page] == expected, context.page
+
+@when("I take a checkpoint of the inventory")
+def step_impl(context):
+    context.db.checkpoint_inventory()
+
+@when("the due inventory checkpoints are taken")
+def step_impl(context):
+    context.db.checkpoint_if_due()
+
+@then("{count:d} inventory checkpoint has been taken")
+@then("{count:d} inventory checkpoints have been taken")
+def step_impl(context, count):
+    assert len(context.db.inventory_checkpoints()) == count
+
+@then("the inventory as of now matches current_inventory")
+def step_impl(context):
+    # Later than any log can be dated
+    assert context.db.inventory_as_of("9999-12-31") == context.db.fetch_data(ds.InventoryData())
+
+@then("the command line modules can be loaded without tkinter")
+def step_impl(context):
+    # A fresh interpreter, as this one may already have loaded tkinter
+    check = "import sys, cli; sys.exit('tkinter' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", check]).returncode == 0
+
+@when("I call the command line with {args}")
+def step_impl(context, args):
+    out = io.StringIO()
+    err = io.StringIO()
+    with redirect_stdout(out), redirect_stderr(err):
+        try:
+            context.cli_status = cli.main(["--test-data"] + args.split())
+        except SystemExit as e:
+            # argparse exits rather than returning when the arguments are wrong
+            context.cli_status = e.code
+    context.cli_output = out.getvalue()
+    context.cli_errors = err.getvalue()
+
+@then("the command line exits with status {status:d}")
+def step_impl(context, status):
+    assert context.cli_status == status
+
+@then("the command line error mentions {text}")
+def step_impl(context, text):
+    assert text in context.cli_errors, context.cli_errors
+
+@then("the command line output is:")
+def step_impl(context):
+    assert context.cli_output.replace("\r\n", "\n").strip() == context.text.strip(), context.cli_output
+
+@given("the database waits at most {ms:d} ms for a lock, and retries writes {retries:d} times")
+def step_impl(context, ms, retries):
+    open_database(context, busy_timeout_ms=ms, write_retries=retries)
+
+@when("another terminal holds the database write lock")
+def step_impl(context):
+    # A separate Database has its own writer connection, so this holds sqlite's lock rather than the writer's
+    context.other_db = Database(test_data=True)
+    context.add_cleanup(context.other_db.close)
+    context.write_started = threading.Event()
+    context.write_release = threading.Event()
+
+    def hold_write():
+        with context.other_db.get_write_connection():
+            context.write_started.set()
+            context.write_release.wait(10)
+
+    context.write_thread = threading.Thread(target=hold_write)
+    context.write_thread.start()
+    assert context.write_started.wait(5)
+
+@when("I add {name} to stock_data while the write lock is held")
+@when("I add {name} to stock_data")
+def step_impl(context, name):
+    context.result = context.db.add_data(ds.StockData(name=name, restock_quantity="1"))
+
+@then("the write was retried {retries:d} times before giving up")
+def step_impl(context, retries):
+    stats = context.db.pool_stats()
+    assert stats["write_retries"] == retries
+    assert stats["write_busy_failures"] == 1
+
+@when("the other terminal releases the write lock")
+def step_impl(context):
+    context.write_release.set()
+    context.write_thread.join(5)
+    context.other_db.close()
+
+@given("the database is served over http")
+def step_impl(context):
+    # The steps that follow use a client in place of the database, so they run through the service
+    context.service_db = context.db
+    context.service = DatabaseService(context.db)
+    port = context.service.start_in_thread()
+    context.db = ServiceClient(f"http://127.0.0.1:{port}")
+    context.service_url = f"http://127.0.0.1:{port}"
+    context.add_cleanup(context.service_db.close)
+    context.add_cleanup(context.service.stop)
+    context.add_cleanup(context.db.close)
+
+@when("{clients:d} clients each add {count:d} stock types through the service at once")
+def step_impl(context, clients, count):
+    results = []
+
+    def add_stock(index):
+        client = ServiceClient(context.service_url)
+        for number in range(count):
+            results.append(client.add_data(ds.StockData(name=f"CLIENT {index} STOCK {number}", restock_quantity="1")))
+        client.close()
+
+    threads = [threading.Thread(target=add_stock, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [True] * clients * count
+
+@when('I send the service the raw request "{request}"')
+def step_impl(context, request):
+    # Escapes such as \r\n are written out in the feature, so they are turned back into bytes here
+    host, port = context.service_url.removeprefix("http://").split(":")
+    with socket.create_connection((host, int(port)), timeout=5) as raw:
+        raw.sendall(request.encode("latin-1").decode("unicode_escape").encode("latin-1"))
+        response = b""
+        # Reading until the service closes the connection, which times out if it never does
+        while chunk := raw.recv(4096):
+            response += chunk
+    context.raw_response = response
+
+@then("the service answers with status {status:d} and closes the connection")
+def step_impl(context, status):
+    assert context.raw_response.startswith(f"HTTP/1.1 {status} ".encode()), context.raw_response
+
+@then("stock_data holds {count:d} entries")
+def step_impl(context, count):
+    assert len(context.db.fetch_data(ds.StockData())) == count
+
+@given("I am listening for changes")
+def step_impl(context):
+    context.changes = []
+    context.db.changes.subscribe(context.changes.extend)
+    # The first look only notes where the database is up to
+    context.db.poll_changes()
+
+@when("I stop listening to the changes so far")
+def step_impl(context):
+    context.changes.clear()
+
+@when("I look for changes made by other terminals")
+def step_impl(context):
+    context.db.poll_changes()
+
+@when("another terminal sets the quantity of instance #{id:d} to {quantity:d}")
+def step_impl(context, id, quantity):
+    other_terminal = Database(test_data=True)
+    instance = ds.InventoryData.from_row(other_terminal.fetch_data(ds.InventoryData(id_str=id))[0])
+    instance._quantity = str(quantity)
+    assert other_terminal.update_data(instance) is True
+    other_terminal.close()
+
+@when("another terminal sets the restock quantity of stock type #{id:d} to {quantity:d}")
+def step_impl(context, id, quantity):
+    other_terminal = Database(test_data=True)
+    assert other_terminal.update_data(ds.StockData(id_str=id, restock_quantity=str(quantity))) is True
+    other_terminal.close()
+
+@then("the following changes are published:")
+def step_impl(context):
+    expected = [(row["entity"], row["action"], row["id"], row["fields"]) for row in context.table]
+    actual = [(event.entity or "", event.action, "" if event.id is None else str(event.id), ",".join(event.fields)) for event in context.changes]
+    assert actual == expected, actual
+
+@then("no changes are published")
+def step_impl(context):
+    assert context.changes == [], context.changes
+
+@given("a stock type data object named {name} with restock quantity {quantity}")
+def step_impl(context, name, quantity):
+    context.dto = ds.StockData(name=name, restock_quantity=quantity)
+
+@given("another stock type data object named {name} with restock quantity {quantity}")
+def step_impl(context, name, quantity):
+    context.other_dto = ds.StockData(name=name, restock_quantity=quantity)
+
+@given("another location data object named {name}")
+def step_impl(context, name):
+    context.other_dto = ds.LocationData(name=name)
+
+@given("a data object of a StockData subclass named {class_name}")
+def step_impl(context, class_name):
+    context.dto = type(class_name, (ds.StockData,), {"__slots__": ()})(name="SCREWS", restock_quantity=5)
+
+@given("an empty inventory data object")
+def step_impl(context):
+    context.dto = ds.InventoryData()
+
+@given("a log data object with no date")
+def step_impl(context):
+    context.dto = ds.LogData(instance_id=1, stock_name="SCREWS", location_name="WORKSHOP", activity_type="Created")
+
+@given("another log data object with no date")
+def step_impl(context):
+    context.other_dto = ds.LogData(instance_id=1, stock_name="SCREWS", location_name="WORKSHOP", activity_type="Created")
+
+@when("I freeze the data object")
+def step_impl(context):
+    assert context.dto.freeze() is context.dto
+
+@when("I freeze both data objects")
+def step_impl(context):
+    context.dto.freeze()
+    context.other_dto.freeze()
+
+@when("I read the date of the log data object")
+def step_impl(context):
+    context.dto._date_occured
+
+@then("the data objects are equal")
+def step_impl(context):
+    assert context.dto == context.other_dto
+    assert context.other_dto == context.dto
+
+@then("the data objects are not equal")
+def step_impl(context):
+    assert context.dto != context.other_dto
+
+@then("the data object cannot be hashed")
+def step_impl(context):
+    try:
+        hash(context.dto)
+    except TypeError:
+        return
+    assert False, "a mutable data object was hashed"
+
+@then("the data objects have the same hash")
+def step_impl(context):
+    assert hash(context.dto) == hash(context.other_dto)
+    assert {context.dto: True}[context.other_dto]
+
+@then("the data object is frozen")
+def step_impl(context):
+    assert context.dto.is_frozen()
+
+@then("the data object is not frozen")
+def step_impl(context):
+    assert not context.dto.is_frozen()
+    assert type(context.dto)._base_type() is type(context.dto)
+
+@then("the data object cannot be changed")
+def step_impl(context):
+    try:
+        context.dto._name = "CHANGED"
+    except AttributeError:
+        return
+    assert False, "a frozen data object was changed"
+
+@then("the data object is still a {type_name}")
+def step_impl(context, type_name):
+    dto_type = getattr(ds, type_name)
+    assert type(context.dto)._is_frozen_type
+    assert isinstance(context.dto, dto_type)
+    assert type(context.dto)._base_type() is dto_type
+    assert repr(context.dto).startswith(f"{type_name}(")
+
+@then("the inventory data object has no stock type or location stored")
+def step_impl(context):
+    assert context.dto._stock_type_value is None
+    assert context.dto._location_value is None
+
+@then("the stock type and location of the inventory data object are frozen too")
+def step_impl(context):
+    assert context.dto._stock_type.is_frozen()
+    assert context.dto._location.is_frozen()
+
+@then("the log data object has no date stored")
+def step_impl(context):
+    assert context.dto._date_occured_value is None
+
+@then("the log data object has today's date stored")
+def step_impl(context):
+    assert context.dto._date_occured_value.startswith(datetime.now().strftime("%Y-%m-%d"))
+
+@then("the log data object's insert values end with N/A and no quantity change")
+def step_impl(context):
+    assert context.dto.to_params()[-2:] == ("N/A", None)
+
+@when("this terminal is part way through a write")
+def step_impl(context):
+    context.write_started = threading.Event()
+    context.write_release = threading.Event()
+
+    def hold_write():
+        with context.db.get_write_connection():
+            context.write_started.set()
+            context.write_release.wait(10)
+
+    context.write_thread = threading.Thread(target=hold_write)
+    context.write_thread.start()
+    context.add_cleanup(context.write_release.set)
+    assert context.write_started.wait(5)
+
+@then("looking for changes made by other terminals finishes before the write does")
+def step_impl(context):
+    poll = threading.Thread(target=context.db.poll_changes)
+    poll.start()
+    poll.join(2)
+    assert not poll.is_alive()
+    assert context.write_thread.is_alive()
+
+@when("this terminal finishes its write")
+def step_impl(context):
+    context.write_release.set()
+    context.write_thread.join(5)
+    assert not context.write_thread.is_alive()
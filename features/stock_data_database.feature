@@ -27,6 +27,23 @@ Feature: stock_data
                 | title               | message                                                |
                 | All fields required | All fields must be filled in to perform this operation |
 
+        Scenario: S1c - Stock types that cannot be stored are refused by a bulk add without losing the rest
+            When I bulk add the following entries to stock_data:
+                | # | name                                                | restock_quantity |
+                | 1 | SCREWS                                              | 5                |
+                | 2 | AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA | 5                |
+                | x | CHAIRS                                              | 10               |
+                | 4 | WIDGETS                                             | 20               |
+            Then the bulk add results are:
+                | result        |
+                | True          |
+                | Name too long |
+                | Invalid id    |
+                | True          |
+            And the following entry can be found in stock_data:
+                | # | name    | restock_quantity |
+                | 4 | WIDGETS | 20               |
+
         Scenario: S3a - Stock type not added if it shares a name with an existing type
             Given the following entries exist in stock_data:
                 | # | name   | restock_quantity |
@@ -77,3 +94,20 @@ Feature: stock_data
                 | title             | message                                                                               |
                 | Stock type in use | This data entry cannot be deleted, as there are stock instances that currently use it |
 
+        Scenario: S7a - Search stock_data by the start of a name
+            Given the following entries exist in stock_data:
+                | # | name        | restock_quantity |
+                | 1 | SCREWS      | 5                |
+                | 2 | CHAIRS      | 10               |
+                | 3 | SCREWDRIVER | 2                |
+            When I search stock_data for stock names starting with SCREW
+            Then the page contains entries 1, 3
+
+        Scenario: S7b - Search stock_data for part of a name
+            Given the following entries exist in stock_data:
+                | # | name        | restock_quantity |
+                | 1 | SCREWS      | 5                |
+                | 2 | CHAIRS      | 10               |
+                | 3 | SCREWDRIVER | 2                |
+            When I search stock_data for stock names containing rew
+            Then the page contains entries 1, 3
@@ -1,21 +1,164 @@
 import tkinter as tk
+import bisect
 import copy
+import json
+import queue
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import ttk
 from tkinter import messagebox
+from tkinter import filedialog
 import data_structures as ds
 import utils as valid
+import csv_transfer
 from abc import ABC, abstractmethod
-from database import Database
+from database import Database, TupleResult
+from connection_pool import is_busy_error
+#########################
+## class QueryExecutor ##
+#########################
+# Runs database calls away from the tkinter main loop
+
+class QueryExecutor:
+    """
+    Runs database calls on a pool of worker threads, and hands their results back to the tkinter main loop
+    Tkinter widgets may only be touched from the main thread, so results are collected on a queue and
+    the callbacks are run from there by polling with after()
+    """
+    # Milliseconds between checks for finished calls while any are running
+    _poll_interval = 20
+
+    def __init__(self, root: tk.Tk, workers: int = 4, on_busy_change=None):
+        self._root = root
+        self._workers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="database")
+        self._finished = queue.Queue()
+        self._running = 0
+        self._polling = False
+        # The most recent call made for each key. Results of calls that have since been superseded are dropped
+        self._latest = {}
+        self._on_busy_change = on_busy_change
+
+    def submit(self, fn, *args, on_success=None, on_error=None, key=None, owner: tk.Misc = None, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on a worker thread
+        on_success is called with the result, or on_error with the exception, on the main thread
+        A call made with the same key as an earlier one supersedes it: the earlier call is cancelled
+        if it has not started yet, and its result is ignored if it has
+        If owner is given, the callbacks are skipped if that widget has been destroyed in the meantime
+        """
+        if key is not None and key in self._latest:
+            self._latest[key].cancel()
+
+        future = self._workers.submit(fn, *args, **kwargs)
+        if key is not None:
+            self._latest[key] = future
+
+        self._running += 1
+        if self._running == 1 and self._on_busy_change:
+            self._on_busy_change(True)
+
+        # This runs on the worker thread, so it must only hand the result over
+        future.add_done_callback(lambda f: self._finished.put((f, key, on_success, on_error, owner)))
+
+        if not self._polling:
+            self._polling = True
+            self._root.after(self._poll_interval, self._poll)
+
+        return future
+
+    def cancel(self, key):
+        """
+        Drops the result of the latest call made with key
+        """
+        future = self._latest.pop(key, None)
+        if future:
+            future.cancel()
+
+    def is_busy(self):
+        return self._running > 0
+
+    def _poll(self):
+        """
+        Runs the callbacks of every call that has finished since the last poll
+        """
+        finished = []
+        while True:
+            try:
+                finished.append(self._finished.get_nowait())
+            except queue.Empty:
+                break
+        self._running -= len(finished)
+
+        # Schedule the next poll before running any callbacks, as a callback may open a
+        # window and wait on it, and calls made from that window still need their results
+        if self._running > 0:
+            self._root.after(self._poll_interval, self._poll)
+        else:
+            self._polling = False
+            if self._on_busy_change:
+                self._on_busy_change(False)
+
+        for future, key, on_success, on_error, owner in finished:
+            # Skip calls that were cancelled or superseded
+            if future.cancelled():
+                continue
+            if key is not None:
+                if self._latest.get(key) is not future:
+                    continue
+                del self._latest[key]
+            # Skip calls made for a frame or window that has since been closed
+            if owner is not None and not owner.winfo_exists():
+                continue
+
+            error = future.exception()
+            if error is not None:
+                # Writes report a busy database themselves, but reads and imports that wait too long end up here
+                if is_busy_error(error):
+                    messagebox.showerror(title="Database busy", message="Another terminal is writing to the database. Please try again in a moment")
+                elif on_error:
+                    on_error(error)
+                else:
+                    messagebox.showerror(title="Database Error", message="Unable to complete the database operation")
+            elif on_success:
+                on_success(future.result())
+
+    def shutdown(self):
+        """
+        Stops the worker threads, abandoning any calls that have not started
+        """
+        self._workers.shutdown(wait=False, cancel_futures=True)
+
 ###############
 ## class App ##
 ###############
 # Main Tkinter window
 class App(tk.Tk):
-    def __init__(self):
+    # Milliseconds between passing published changes on to the current page
+    _change_interval = 200
+
+    def __init__(self, database=None, profile: bool = False):
+        """
+        database is anything with Database's methods, such as a service.ServiceClient
+        If it is not given the database is opened directly, timing every call for the diagnostics page if profile is set
+        """
         super().__init__()
         self.title("Inventory Tracking System")
 
-        self._database = Database()
+        self._database = database if database is not None else Database(profile=profile)
+        # A service client's checkpoints are taken by the service itself
+        if hasattr(self._database, "start_checkpointer"):
+            self._database.start_checkpointer()
+        # All database calls go through the executor so the window keeps responding while they run
+        self._executor = QueryExecutor(self, on_busy_change=self.show_busy)
+
+        # Changes made by this and other terminals are patched into the current page as they happen
+        # A service client has no change bus, so pages reload after their own changes instead
+        self.watches_changes = hasattr(self._database, "changes")
+        if self.watches_changes:
+            self._changes = queue.Queue()
+            self._database.changes.subscribe(self._changes.put)
+            self._database.start_change_poller()
+            self.after(self._change_interval, self.apply_changes)
 
         self.create_menu_bar()
         
@@ -34,6 +177,10 @@ class App(tk.Tk):
         # Set the window to the centre of the screen
         self.geometry(f'{self.width}x{self.height}+{offset_x}+{offset_y}')
 
+        # Create status bar to show when the database is busy
+        self._status = ttk.Label(self, text="", anchor="w")
+        self._status.pack(side="bottom", fill="x", padx=5)
+
         # Create container for active frames
         self.container = ttk.Frame(self)
         self.container.pack(fill="both", expand="true")
@@ -41,12 +188,46 @@ class App(tk.Tk):
         self.show_frame(ChooseFrame)
         # Every time the program is started, the database is checked to see if any items need restocking
         # If they do, an error message is displayed with the names of the relevant stock items
-        to_restock = self._database.check_restock()
+        # This runs in the background, so the window can be used straight away
+        self._executor.submit(self._database.check_restock, on_success=self.show_restock_warning, on_error=lambda e: None)
+
+    def show_restock_warning(self, to_restock: list):
+        """
+        Shows a warning listing every item that needs restocking
+        """
         if len(to_restock) > 0:
             need_restock_list = [row["name"] for row in to_restock]
             need_restock_str = ";\n".join(need_restock_list)
             messagebox.showwarning(title="Items need restocking!", message=f"The following items need restocking:\n {need_restock_str}")
 
+    def show_busy(self, busy: bool):
+        """
+        Shows a busy cursor and status message while database calls are running
+        """
+        self._status.config(text="Working..." if busy else "")
+        self.config(cursor="watch" if busy else "")
+
+    def apply_changes(self):
+        """
+        Passes every change published since the last call to the current page
+        Changes are published on whichever thread made or found them, so they are queued for the main loop
+        """
+        events = []
+        while True:
+            try:
+                events.extend(self._changes.get_nowait())
+            except queue.Empty:
+                break
+        if events and isinstance(self._current_frame, DataFrame) and self._current_frame.winfo_exists():
+            self._current_frame.on_changes(events)
+        self.after(self._change_interval, self.apply_changes)
+
+    def destroy(self):
+        if self.watches_changes:
+            self._database.changes.unsubscribe(self._changes.put)
+        self._executor.shutdown()
+        super().destroy()
+
     def create_menu_bar(self):
         """
         Creates the global app menu bar
@@ -56,6 +237,24 @@ class App(tk.Tk):
         """
         menu_bar = tk.Menu(self)
 
+        # Create menu to import and export tables as csv files
+        file_menu = tk.Menu(menu_bar, tearoff=0)
+        menu_bar.add_cascade(label="File", menu=file_menu)
+
+        import_menu = tk.Menu(file_menu, tearoff=0)
+        file_menu.add_cascade(label="Import CSV", menu=import_menu)
+        import_menu.add_command(label="Stock Types", command=lambda: self.import_csv("stock_data"))
+        import_menu.add_command(label="Locations", command=lambda: self.import_csv("location_data"))
+        import_menu.add_command(label="Inventory", command=lambda: self.import_csv("current_inventory"))
+
+        export_menu = tk.Menu(file_menu, tearoff=0)
+        file_menu.add_cascade(label="Export CSV", menu=export_menu)
+        export_menu.add_command(label="Stock Types", command=lambda: self.export_csv("stock_data"))
+        export_menu.add_command(label="Locations", command=lambda: self.export_csv("location_data"))
+        export_menu.add_command(label="Inventory", command=lambda: self.export_csv("current_inventory"))
+        export_menu.add_command(label="Activity Logs", command=lambda: self.export_csv("activity_logs"))
+        export_menu.add_command(label="Stock Quantities", command=lambda: self.export_csv("stock_quantity"))
+
         # Create menu to modify stock and location data
         go_menu = tk.Menu(menu_bar, tearoff=0)
         menu_bar.add_cascade(label="Go to", menu=go_menu)
@@ -63,6 +262,7 @@ class App(tk.Tk):
         go_menu.add_command(label="Locations", command=lambda: self.show_frame(LocationFrame))
         go_menu.add_command(label="Stock Types", command=lambda: self.show_frame(StockFrame))
         go_menu.add_command(label="Log", command=lambda: self.show_frame(LogFrame))
+        go_menu.add_command(label="Diagnostics", command=lambda: self.show_frame(DiagnosticsFrame))
 
         self.config(menu=menu_bar)
 
@@ -83,6 +283,45 @@ class App(tk.Tk):
         frame = frame_class(self.container, self)
         # display the new frame
         frame.pack(fill="both", expand="true")
+        self._current_frame = frame
+
+    def import_csv(self, table: str):
+        """
+        Asks for a csv file and adds its rows to the given table
+        """
+        path = filedialog.askopenfilename(title="Import CSV", filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not path:
+            return
+
+        def run_import():
+            with open(path, newline="") as f:
+                return csv_transfer.import_table(self._database, table, f)
+
+        def on_success(result):
+            messagebox.showinfo(title="Import finished", message=result.summary())
+            # Refresh the current page in case it shows the imported table
+            if not self.watches_changes and isinstance(self._current_frame, DataFrame) and self._current_frame.winfo_exists():
+                self._current_frame.load_data()
+
+        self._executor.submit(run_import, on_success=on_success, on_error=lambda e: messagebox.showerror(title="Import failed", message=f"Unable to import {path}"))
+
+    def export_csv(self, table: str):
+        """
+        Asks where to save a csv file and writes every row of the given table to it
+        """
+        path = filedialog.asksaveasfilename(title="Export CSV", defaultextension=".csv", initialfile=f"{table}.csv", filetypes=[("CSV files", "*.csv")])
+        if not path:
+            return
+
+        def run_export():
+            with open(path, "w", newline="") as f:
+                return csv_transfer.export_table(self._database, table, f)
+
+        self._executor.submit(
+            run_export,
+            on_success=lambda count: messagebox.showinfo(title="Export finished", message=f"{count} rows exported"),
+            on_error=lambda e: messagebox.showerror(title="Export failed", message=f"Unable to export to {path}")
+        )
 
     def centre_window(self, width = None, height = None):
         # Get window height and width
@@ -127,6 +366,267 @@ class ChooseFrame(ttk.Frame):
         # Exit button
         self.exitButton = ttk.Button(self, text="exit", command=self.controller.destroy).pack()
 
+########################
+## class VirtualTable ##
+########################
+# Table widget used by the DataFrames to display query results
+
+class VirtualTable(ttk.Treeview):
+    """
+    Treeview that only creates items for the rows that are currently on screen
+    Every result row is kept in a plain python list, and a small fixed set of treeview
+    items is reused to show whichever rows are scrolled into view. This keeps the number
+    of Tcl calls proportional to the height of the window, not the number of results
+    """
+    # Used until the real sizes can be measured from a displayed row
+    _default_row_height = 20
+    _default_heading_height = 25
+
+    def __init__(self, parent, columns, vertical_scroll: ttk.Scrollbar = None, on_reach_end=None, overscan: int = 5, **kwargs):
+        super().__init__(parent, columns=columns, show="headings", **kwargs)
+        # Every result row, as a tuple of column values
+        self._rows = []
+        # Index of the row shown at the top of the table
+        self._first = 0
+        # Number of rows that fit in the table, plus extra rows so a partly visible row is never blank
+        self._visible = 20
+        self._overscan = overscan
+        # Reused treeview items in display order, and the row each is currently showing
+        self._items = []
+        self._shown = []
+        # The selection is stored as a row index, as items are reused for different rows as the table scrolls
+        self._selected_index = None
+
+        self._vertical_scroll = vertical_scroll
+        if vertical_scroll:
+            vertical_scroll.config(command=self.yview)
+
+        # Called once each time the bottom of the results is scrolled into view
+        self._on_reach_end = on_reach_end
+        self._end_requested = False
+
+        self.bind("<Configure>", self._on_resize)
+        self.bind("<<TreeviewSelect>>", self._on_select)
+        # Scrolling is handled here rather than by the treeview, which only knows about the reused items
+        self.bind("<MouseWheel>", self._on_mousewheel)
+        self.bind("<Button-4>", lambda event: self._scroll_to(self._first - 3))
+        self.bind("<Button-5>", lambda event: self._scroll_to(self._first + 3))
+        self.bind("<Up>", lambda event: self._move_selection(-1))
+        self.bind("<Down>", lambda event: self._move_selection(1))
+        self.bind("<Prior>", lambda event: self._move_selection(-self._visible))
+        self.bind("<Next>", lambda event: self._move_selection(self._visible))
+
+    ##################
+    ## Row contents ##
+    ##################
+    def set_rows(self, rows):
+        """
+        Replaces every row in the table
+        """
+        self.clear()
+        self.append_rows(rows)
+
+    def append_rows(self, rows):
+        """
+        Adds rows to the end of the table
+        """
+        self._rows.extend(rows)
+        self._end_requested = False
+        self._render()
+
+    def clear(self):
+        """
+        Removes every row from the table
+        """
+        self._rows = []
+        self._first = 0
+        self._selected_index = None
+        self._end_requested = False
+        # Remove every item in one call, rather than one call per item
+        if self._items:
+            self.delete(*self._items)
+        self._items = []
+        self._shown = []
+        self._update_scrollbar()
+
+    def upsert_rows(self, rows, limit: int = None):
+        """
+        Replaces the rows that have the same id (the first value) as the given rows, and inserts the others in id order
+        New rows with an id past limit are left out, as they belong to a page of results that has not been loaded yet
+        """
+        positions = {row[0]: position for position, row in enumerate(self._rows)}
+        new_rows = []
+        for row in rows:
+            position = positions.get(row[0])
+            if position is not None:
+                self._rows[position] = row
+            elif limit is None or row[0] <= limit:
+                new_rows.append(row)
+
+        for row in new_rows:
+            position = bisect.bisect_left(self._rows, row[0], key=itemgetter(0))
+            self._rows.insert(position, row)
+            # Keep the selection on the same row
+            if self._selected_index is not None and position <= self._selected_index:
+                self._selected_index += 1
+        self._render()
+
+    def remove_rows(self, ids):
+        """
+        Removes the rows with the given ids, if they are in the table
+        """
+        ids = set(ids)
+        if self._selected_index is not None and self._selected_index < len(self._rows):
+            if self._rows[self._selected_index][0] in ids:
+                self._selected_index = None
+            else:
+                self._selected_index -= sum(1 for row in self._rows[:self._selected_index] if row[0] in ids)
+        self._rows = [row for row in self._rows if row[0] not in ids]
+        self._render()
+
+    def row_count(self):
+        return len(self._rows)
+
+    def rows(self):
+        return self._rows
+
+    def selected_values(self):
+        """
+        Returns the values of the selected row, or None if no row is selected
+        """
+        if self._selected_index is None or self._selected_index >= len(self._rows):
+            return None
+        return self._rows[self._selected_index]
+
+    ###############
+    ## Scrolling ##
+    ###############
+    def yview(self, *args):
+        """
+        Scrollbar interface. Works in rows of the full result list, rather than treeview items
+        """
+        count = len(self._rows)
+        if not args:
+            if count == 0:
+                return (0.0, 1.0)
+            return (self._first / count, min(1.0, (self._first + self._visible) / count))
+
+        if args[0] == "moveto":
+            self._scroll_to(int(float(args[1]) * count))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= self._visible
+            self._scroll_to(self._first + step)
+
+    def _scroll_to(self, first: int):
+        """
+        Moves the given row to the top of the table
+        """
+        first = max(0, min(first, len(self._rows) - self._visible))
+        if first != self._first:
+            self._first = first
+            self._render()
+        return "break"
+
+    def _on_mousewheel(self, event):
+        # Windows and macOS report the wheel in steps of 120
+        return self._scroll_to(self._first - int(event.delta / 120) * 3)
+
+    def _on_resize(self, event):
+        """
+        Works out how many rows fit in the table at its new height
+        """
+        row_height = self._default_row_height
+        heading_height = self._default_heading_height
+        if self._items:
+            # Measure the first item, if it is on screen
+            bbox = self.bbox(self._items[0])
+            if bbox:
+                heading_height = bbox[1]
+                row_height = bbox[3]
+        visible = max(1, (event.height - heading_height) // row_height)
+        if visible != self._visible:
+            self._visible = visible
+            self._render()
+
+    ###############
+    ## Selection ##
+    ###############
+    def _on_select(self, event):
+        selected = self.selection()
+        # Selections cleared by scrolling the selected row out of view should not forget the selected row
+        if selected and selected[0] in self._items:
+            self._selected_index = self._first + self._items.index(selected[0])
+
+    def _move_selection(self, step: int):
+        """
+        Moves the selection with the keyboard, scrolling to keep it in view
+        """
+        if not self._rows:
+            return "break"
+        if self._selected_index is None:
+            index = self._first
+        else:
+            index = max(0, min(self._selected_index + step, len(self._rows) - 1))
+        self._selected_index = index
+
+        if index < self._first:
+            self._first = index
+        elif index >= self._first + self._visible:
+            self._first = index - self._visible + 1
+        self._render()
+        return "break"
+
+    ###############
+    ## Rendering ##
+    ###############
+    def _render(self):
+        """
+        Points the reused items at the rows that are currently scrolled into view
+        Only items whose row has changed are updated
+        """
+        count = len(self._rows)
+        self._first = max(0, min(self._first, count - self._visible))
+        wanted = min(self._visible + self._overscan, count - self._first)
+
+        # Grow or shrink the set of reused items to fit the window
+        while len(self._items) < wanted:
+            self._items.append(self.insert("", "end"))
+            self._shown.append(None)
+        if len(self._items) > wanted:
+            self.delete(*self._items[wanted:])
+            del self._items[wanted:]
+            del self._shown[wanted:]
+
+        for offset, item in enumerate(self._items):
+            row = self._rows[self._first + offset]
+            if self._shown[offset] is not row:
+                self.item(item, values=row)
+                self._shown[offset] = row
+
+        # Keep the treeview's own view at the top, as the window itself is what moves
+        super().yview_moveto(0)
+
+        # Show the selection on whichever item now holds the selected row
+        selected_offset = None if self._selected_index is None else self._selected_index - self._first
+        if selected_offset is not None and 0 <= selected_offset < len(self._items):
+            self.selection_set(self._items[selected_offset])
+            self.focus(self._items[selected_offset])
+        elif self.selection():
+            self.selection_set(())
+
+        self._update_scrollbar()
+
+        # Ask for more rows once the end of the list is in view
+        if self._on_reach_end and not self._end_requested and self._first + self._visible >= count - self._overscan:
+            self._end_requested = True
+            self._on_reach_end()
+
+    def _update_scrollbar(self):
+        if self._vertical_scroll:
+            self._vertical_scroll.set(*self.yview())
+
 ################
 ## DataFrames ##
 ################
@@ -137,7 +637,17 @@ class DataFrame(ttk.Frame, ABC):
     """
     Base frame to define the set of methods all dataframe must instantiate
     """
-    def on_double_click(self, **args):
+    # The kinds of change (see change_events) whose rows are patched into the table
+    _patch_entities = ()
+    # The kinds of change that mean reloading the whole table, if they are renames or change many rows at once
+    _reload_entities = ()
+    # The columns of a fetched row that are shown in the table, and how names in the search are matched
+    _row_columns = ()
+    _search_mode = "exact"
+    # More changed rows than this at once are reloaded rather than fetched one by one
+    _max_patch_rows = 50
+
+    def on_double_click(self, *args):
         """
         Sets behaviour for when a table entry is double clicked
         """
@@ -152,16 +662,134 @@ class DataFrame(ttk.Frame, ABC):
 
         self.load_data()
 
+    def on_table_end(self):
+        """
+        Asks for the next page of results when the bottom of the table comes into view
+        Only used by frames that load their results a page at a time
+        """
+        if self._more_pages and not self._loading_page:
+            self._loading_page = True
+            self.after_idle(self.load_next_page)
+
+    def page_failed(self, error: Exception):
+        """
+        Stops paging and shows an error if a page of results could not be fetched
+        """
+        self._loading_page = False
+        self._more_pages = False
+        messagebox.showerror(title="Fetch failed", message="Failed to fetch from database")
+
+    def on_change_result(self, result):
+        """
+        Shows the reason an add, edit or delete was refused, if it was, then updates the table
+        """
+        if result is not True and result is not None:
+            messagebox.showerror(title=result.title, message=result.message)
+        self.after_change()
+
+    def after_change(self):
+        """
+        Reloads the table after this frame has changed the database, unless on_changes will patch the change in
+        """
+        if not self._controller.watches_changes:
+            self.load_data()
+
+    #####################
+    ## Change patching ##
+    #####################
+    def reload(self):
+        """
+        Runs the current search again
+        """
+        self.load_data()
+
+    def on_changes(self, events: list):
+        """
+        Applies changes made by this or another terminal to the table
+        The changed rows are fetched again with the current search, then replaced, inserted or removed,
+        so the rest of the table, and where it is scrolled to, is left as it is
+        """
+        if self._query is None:
+            return
+
+        changed = set()
+        removed = set()
+        for event in events:
+            if event.entity is None:
+                self.reload()
+                return
+            if event.entity in self._reload_entities and (event.id is None or event.action == "updated" and "name" in event.fields):
+                self.reload()
+                return
+            if event.entity in self._patch_entities:
+                if event.id is None:
+                    self.reload()
+                    return
+                if event.action == "deleted":
+                    removed.add(event.id)
+                else:
+                    changed.add(event.id)
+        changed -= removed
+        if len(changed) + len(removed) > self._max_patch_rows:
+            self.reload()
+            return
+
+        if removed:
+            self._table.remove_rows(removed)
+        if changed:
+            query = self._query
+            self._controller._executor.submit(
+                self.fetch_rows,
+                query,
+                sorted(changed),
+                on_success=lambda rows: self.patch_rows(query, changed, rows),
+                on_error=lambda e: None,
+                owner=self
+            )
+
+    def fetch_rows(self, query: ds.SqlData, ids: list):
+        """
+        Fetches the rows with the given ids that the query still finds, as they are shown in the table
+        This runs on a worker thread, so must not touch any widgets
+        """
+        database = self._controller._database
+        rows = []
+        for id in ids:
+            row_query = copy.copy(query)
+            row_query._id = id
+            rows.extend(database.fetch_data(row_query, result_format="tuples", search=self._search_mode).project(*self._row_columns))
+        return rows
+
+    def patch_rows(self, query: ds.SqlData, ids: set, rows: list):
+        """
+        Puts the fetched rows into the table, and removes those the search no longer finds
+        """
+        # A new search has started since the rows were fetched
+        if query is not self._query:
+            return
+        rows = self.shown_rows(rows)
+        self._table.remove_rows(ids - {row[0] for row in rows})
+        # Rows past the last page loaded will arrive with the pages after it
+        limit = None
+        if getattr(self, "_more_pages", False):
+            limit = self._last_id if self._last_id is not None else 0
+        self._table.upsert_rows(rows, limit)
+
+    def shown_rows(self, rows: list):
+        """
+        Returns the fetched rows that belong in the table
+        """
+        return rows
+
     def get_selected_item(self):
         """
-        Gets the id of the currently selected item on the treeview
+        Gets the id of the currently selected item on the table
         """
-        selected = self._table.selection()
-        if not selected:
+        values = self._table.selected_values()
+        if values is None:
             messagebox.showwarning("No Item Selected", "Choose an item to edit first")
             return None
-        item = self._table.item(selected[0])
-        return item["values"][0]
+        return values[0]
 
     @abstractmethod
     def create_widgets(self):
@@ -185,25 +813,138 @@ class DataFrame(ttk.Frame, ABC):
         pass
 
 
-class InventoryFrame(DataFrame):
+class LiveSearchFrame(DataFrame):
+    """
+    Base frame for dataframes that search as their search bars are typed in
+    """
+    # Milliseconds to wait after the last key press before a live search is run
+    _search_delay = 250
+    # The table column each search param is matched against
+    _search_columns = {}
+
+    def enable_live_search(self):
+        """
+        Searches as the search bars are typed in, once typing pauses for _search_delay
+        Called once the search bars have been made. Frames set _results_complete once every result is in the table
+        """
+        # The terms the rows in the table were found with
+        self._live_terms = None
+        self._results_complete = False
+        self._pending_search = None
+        for name in self._search_columns:
+            self._search_params[name].trace_add("write", self.on_search_changed)
+
+    def on_search_changed(self, *args):
+        """
+        Restarts the wait before searching each time a search bar changes
+        """
+        if self._pending_search is not None:
+            self.after_cancel(self._pending_search)
+        self._pending_search = self.after(self._search_delay, self.live_search)
+
+    def search_terms(self):
+        """
+        Returns the normalised search terms
+        They are not written back to the search bars, as that would move the cursor while typing
+        """
+        return valid.normalise_params({name: self._search_params[name].get() for name in self._search_columns})
+
+    def live_search(self):
+        """
+        Runs the search for the current terms
+        If each term only adds to the end of the one the current results were found with, and every
+        result is already loaded, the table is narrowed down without going back to the database
+        """
+        self._pending_search = None
+        terms = self.search_terms()
+        if terms == self._live_terms:
+            return
+        # Invalid names are reported when the search button is pressed, not while they are being typed
+        if not all(valid.is_valid_name(term) for term in terms.values()):
+            return
+
+        previous = self._live_terms
+        if previous is not None and self._results_complete and all(terms[name].startswith(previous[name]) for name in terms):
+            self.narrow_results(terms)
+        else:
+            self.run_search(terms)
+
+    def narrow_results(self, terms: dict):
+        """
+        Keeps only the rows in the table whose searched columns start with the new terms
+        """
+        self._controller._executor.cancel((self, "load"))
+        self._live_terms = terms
+        self._table.set_rows(self.matching_rows(self._table.rows(), terms))
+
+    def matching_rows(self, rows: list, terms: dict):
+        """
+        Returns the rows whose searched columns start with the given terms
+        """
+        matches = [(self._search_columns[name], term) for name, term in terms.items() if term]
+        return [row for row in rows if all(row[column].startswith(term) for column, term in matches)]
+
+    @abstractmethod
+    def run_search(self, terms: dict):
+        """
+        Replaces the results in the table with those found in the database for the given terms
+        """
+        pass
+
+    def reload(self):
+        """
+        Runs the current live search again, or loads everything if nothing has been searched for yet
+        """
+        if self._live_terms is not None:
+            self.run_search(self._live_terms)
+        else:
+            self.load_data()
+
+    def shown_rows(self, rows: list):
+        # The search may have been narrowed down since the rows were fetched
+        if self._live_terms is not None:
+            rows = self.matching_rows(rows, self._live_terms)
+        return rows
+
+
+class InventoryFrame(LiveSearchFrame):
     """
     Frame to display the main inventory
     All operations on this page allow the user to perform CRUD operations on stock instances
     """
+    # Number of rows fetched from the database each time the table is scrolled to the bottom
+    _page_size = 200
+    _search_columns = {"name": 1, "location": 2}
+    # Rows show stock type and location names, so renaming either reloads the table
+    _patch_entities = ("inventory",)
+    _reload_entities = ("stock", "location")
+    _row_columns = ("id", "stock_name", "location_name", "current_quantity")
+    _search_mode = "prefix"
 
     def __init__(self, parent, controller):
         super().__init__(parent)
         self._controller = controller
 
+        # Paging state. The table is filled a page at a time as it is scrolled
+        self._query = None
+        self._last_id = None
+        self._more_pages = False
+        self._loading_page = False
+        # The date of the earlier inventory being shown, if one is
+        self._as_of = None
+
         self._search_params = {
             "name": tk.StringVar(),
-            "location" : tk.StringVar()
+            "location" : tk.StringVar(),
+            # When set, the inventory is shown as it was at the start of this date
+            "as_of": tk.StringVar()
         }
 
         self._validity_log = valid.ValidityCheck()
 
         self.create_widgets()
 
+        self.enable_live_search()
         self.load_data()
 
     def create_widgets(self):
@@ -229,6 +970,12 @@ class InventoryFrame(DataFrame):
         location_search_entry = ttk.Entry(search_bars, textvariable=self._search_params["location"])
         location_search_entry.grid(row=1, column=1, sticky="ew", padx=5, pady=2)
 
+        # Bar to view the inventory as it was on an earlier date
+        as_of_label = ttk.Label(search_bars, text="View as of (YYYY-MM-DD):")
+        as_of_label.grid(row=2, column=0, sticky="w", padx=5, pady=2)
+        as_of_entry = ttk.Entry(search_bars, textvariable=self._search_params["as_of"])
+        as_of_entry.grid(row=2, column=1, sticky="ew", padx=5, pady=2)
+
         # Buttons to submit search query
         search_button = ttk.Button(search_bars, text="Search", command=self.load_data)
         search_button.grid(row=3, column=0, padx=5, pady=5)
@@ -243,17 +990,16 @@ class InventoryFrame(DataFrame):
         vertical_scroll = ttk.Scrollbar(table_display, orient="vertical")
         horizontal_scroll = ttk.Scrollbar(table_display, orient="horizontal")
 
-        # Setup treeview as table
-        self._table = ttk.Treeview(
+        # Setup virtual table. Only the rows in view are drawn, and more results are loaded as the bottom is reached
+        self._table = VirtualTable(
             table_display,
             columns=("id", "stock_name", "location_name", "current_quantity"),
-            show="headings",
-            yscrollcommand=vertical_scroll.set,
+            vertical_scroll=vertical_scroll,
+            on_reach_end=self.on_table_end,
             xscrollcommand=horizontal_scroll.set
         )
 
         # Ensure the table scrolls when the bar is moved
-        vertical_scroll.config(command=self._table.yview)
         horizontal_scroll.config(command=self._table.xview)
 
         # Setup column headings
@@ -300,7 +1046,7 @@ class InventoryFrame(DataFrame):
 
         self.wait_window(new_window)
 
-        self.load_data()
+        self.after_change()
     
     def edit_item(self):
         id = super().get_selected_item()
@@ -309,25 +1055,24 @@ class InventoryFrame(DataFrame):
         
         inventory_query = ds.InventoryData(id_str=id)
 
-        # Fetch the specific data entry from the database
-        try:
-            item_data = self._controller._database.fetch_data(inventory_query)
-        except:
-            messagebox.showerror(title="Fetch failed", message="Failed to fetch item from database")
-
-
-        inventory_query._location._name = item_data[0]["location_name"]
-        inventory_query._stock_type._name = item_data[0]["stock_name"]
-        inventory_query._quantity = item_data[0]["current_quantity"]
+        def open_popup(item_data):
+            # Open a window to edit the existing data
+            new_window = InventoryPopup(self, self._controller, ds.InventoryData.from_row(item_data[0]))
 
-        # Open a window to edit the existing data
-        new_window = InventoryPopup(self, self._controller, inventory_query)
+            # Freeze the main window while the edit window is open
+            self.wait_window(new_window)
 
-        # Freeze the main window while the edit window is open
-        self.wait_window(new_window)
+            # Refresh the data after the edit window closes
+            self.after_change()
 
-        # Refresh the data after the edit window closes
-        self.load_data()
+        # Fetch the specific data entry from the database in the background, then open the edit window
+        self._controller._executor.submit(
+            self._controller._database.fetch_data,
+            inventory_query,
+            on_success=open_popup,
+            on_error=lambda e: messagebox.showerror(title="Fetch failed", message="Failed to fetch item from database"),
+            owner=self
+        )
     
     def delete_item(self):
         id = super().get_selected_item()
@@ -337,9 +1082,13 @@ class InventoryFrame(DataFrame):
         inventory_query = ds.InventoryData(id_str=id)
 
         if messagebox.askokcancel(title="Confirm delete", message="This will delete the selected entry. Are you sure?"):
-            self._controller._database.delete_data(inventory_query)
-
-        self.load_data()
+            self._controller._executor.submit(
+                self._controller._database.delete_data,
+                inventory_query,
+                on_success=self.on_change_result,
+                on_error=lambda e: messagebox.showerror(title="Delete failed", message="Failed to delete item from database"),
+                owner=self
+            )
         
     def load_data(self):
         """
@@ -351,32 +1100,95 @@ class InventoryFrame(DataFrame):
             messagebox.showerror(title="Invalid Parameters", message=self._validity_log.msg)
             return
 
+        self.run_search(self.search_terms())
+
+    def run_search(self, terms: dict):
+        """
+        Starts a new search for instances whose stock and location names start with the given terms
+        """
+        self._live_terms = terms
+        self._results_complete = False
+
         # Construct an InventoryData object
         # If no params are given, a blank object will be generated, which will return all possible datapoints
-        stock_data = ds.StockData(name=self._search_params["name"].get()) if self._search_params["name"].get() != "" else ds.StockData()
-        location_data = ds.LocationData(name=self._search_params["location"].get()) if self._search_params["location"].get() != "" else ds.LocationData()
+        stock_data = ds.StockData(name=terms["name"]) if terms["name"] != "" else ds.StockData()
+        location_data = ds.LocationData(name=terms["location"]) if terms["location"] != "" else ds.LocationData()
 
-        query = ds.InventoryData(stock_type=stock_data, location=location_data)
+        self._query = ds.InventoryData(stock_type=stock_data, location=location_data)
 
-        # Send it to the database
-        try:
-            results = self._controller._database.fetch_data(query)
-        except Exception as e:
-            messagebox.showerror(title="Operation failed", message="Failed to retrieve from database")
+        # Delete the current results of the table
+        self._table.clear()
+
+        # An earlier inventory is rebuilt all at once, so it is shown in one go rather than paged
+        as_of = self._search_params["as_of"].get()
+        self._as_of = as_of if as_of and valid.is_valid_date(as_of) else None
+        if self._as_of:
+            self._more_pages = False
+            self._loading_page = True
+            self._controller._executor.submit(
+                self._controller._database.inventory_as_of,
+                as_of,
+                self._query,
+                result_format="tuples",
+                search="prefix",
+                on_success=self.show_as_of,
+                on_error=self.page_failed,
+                key=(self, "load"),
+                owner=self
+            )
             return
 
-        # Delete the current results of the table
-        for row in self._table.get_children():
-            self._table.delete(row)
-
-        # Display the new results in the table
-        for r in results:
-            self._table.insert("", "end", values=(
-                r["id"],
-                r["stock_name"],
-                r["location_name"],
-                r["current_quantity"]
-            ))
+        # Start again from the first page
+        self._last_id = None
+        self._more_pages = True
+        self.load_next_page()
+
+    def load_next_page(self):
+        """
+        Fetches the page of results after the last one loaded and adds it to the bottom of the table
+        The fetch runs in the background. Starting a new search drops any page that is still being fetched
+        """
+        self._loading_page = True
+        self._controller._executor.submit(
+            self._controller._database.fetch_data,
+            self._query,
+            after_id=self._last_id,
+            page_size=self._page_size,
+            result_format="tuples",
+            search="prefix",
+            on_success=self.show_page,
+            on_error=self.page_failed,
+            key=(self, "load"),
+            owner=self
+        )
+
+    def show_page(self, results: TupleResult):
+        """
+        Adds a fetched page of results to the bottom of the table
+        """
+        self._loading_page = False
+        rows = results.project("id", "stock_name", "location_name", "current_quantity")
+        if rows:
+            self._last_id = rows[-1][0]
+        # A short page means the end of the results has been reached
+        self._more_pages = len(rows) == self._page_size
+        self._results_complete = not self._more_pages
+
+        # Add the new results to the bottom of the table
+        self._table.append_rows(rows)
+
+    def on_changes(self, events: list):
+        # An earlier inventory is not affected by changes made since
+        if self._as_of is None:
+            super().on_changes(events)
+
+    def show_as_of(self, results: TupleResult):
+        """
+        Shows the whole of an earlier inventory in the table
+        """
+        self._loading_page = False
+        self._results_complete = True
+        self._table.set_rows(results.project("id", "stock_name", "location_name", "current_quantity"))
 
     def valid_params(self):
         """
@@ -388,6 +1200,7 @@ class InventoryFrame(DataFrame):
 
         stock_name = self._search_params["name"].get()
         location_name = self._search_params["location"].get()
+        as_of = self._search_params["as_of"].get()
 
         if not valid.is_valid_name(stock_name):
             self._validity_log.error(f"Stock name {stock_name} is invalid")
@@ -395,11 +1208,18 @@ class InventoryFrame(DataFrame):
         if not valid.is_valid_name(location_name):
             self._validity_log.error(f"Location name {location_name} is invalid")
 
+        if as_of and not valid.is_valid_date(as_of):
+            self._validity_log.error(f"Date {as_of} is invalid")
+
 
 class LocationFrame(DataFrame):
+    _patch_entities = ("location",)
+    _row_columns = ("id", "name")
+
     def __init__(self, parent, controller):
         super().__init__(parent)
         self._controller = controller
+        self._query = None
 
         self._search_params = {
             "name": tk.StringVar(),
@@ -442,17 +1262,15 @@ class LocationFrame(DataFrame):
         vertical_scroll = ttk.Scrollbar(table_display, orient="vertical")
         horizontal_scroll = ttk.Scrollbar(table_display, orient="horizontal")
 
-        # Setup treeview as table
-        self._table = ttk.Treeview(
+        # Setup virtual table. Only the rows in view are drawn
+        self._table = VirtualTable(
             table_display,
             columns=("id", "name"),
-            show="headings",
-            yscrollcommand=vertical_scroll.set,
+            vertical_scroll=vertical_scroll,
             xscrollcommand=horizontal_scroll.set
         )
 
         # Ensure the table scrolls when the bar is moved
-        vertical_scroll.config(command=self._table.yview)
         horizontal_scroll.config(command=self._table.xview)
 
         # Setup column headings
@@ -495,7 +1313,7 @@ class LocationFrame(DataFrame):
 
         self.wait_window(new_window)
 
-        self.load_data()
+        self.after_change()
     
     def edit_item(self):
         id = super().get_selected_item()
@@ -504,22 +1322,24 @@ class LocationFrame(DataFrame):
         
         location_query = ds.LocationData(id_str=id)
 
-        # Fetch the specific data entry from the database
-        try:
-            item_data = self._controller._database.fetch_data(location_query)
-        except:
-            messagebox.showerror(title="Fetch failed", message="Failed to fetch item from database")
+        def open_popup(item_data):
+            # Open a window to edit the existing data
+            new_window = LocationPopup(self, self._controller, ds.LocationData.from_row(item_data[0]))
 
-        location_query._name = item_data[0]["name"]
+            # Freeze the main window while the edit window is open
+            self.wait_window(new_window)
 
-        # Open a window to edit the existing data
-        new_window = LocationPopup(self, self._controller, location_query)
+            # Refresh the data after the edit window closes
+            self.after_change()
 
-        # Freeze the main window while the edit window is open
-        self.wait_window(new_window)
-
-        # Refresh the data after the edit window closes
-        self.load_data()
+        # Fetch the specific data entry from the database in the background, then open the edit window
+        self._controller._executor.submit(
+            self._controller._database.fetch_data,
+            location_query,
+            on_success=open_popup,
+            on_error=lambda e: messagebox.showerror(title="Fetch failed", message="Failed to fetch item from database"),
+            owner=self
+        )
     
     def delete_item(self):
         id = super().get_selected_item()
@@ -529,12 +1349,13 @@ class LocationFrame(DataFrame):
         location_query = ds.LocationData(id_str=id)
 
         if messagebox.askokcancel(title="Confirm delete", message="This will delete the selected entry. Are you sure?"):
-            try:
-                self._controller._database.delete_data(location_query)
-            except:
-                messagebox.showerror(title="Fetch failed", message="Failed to fetch item from database")
-
-        self.load_data()
+            self._controller._executor.submit(
+                self._controller._database.delete_data,
+                location_query,
+                on_success=self.on_change_result,
+                on_error=lambda e: messagebox.showerror(title="Delete failed", message="Failed to delete item from database"),
+                owner=self
+            )
 
     def load_data(self):
         """
@@ -550,25 +1371,24 @@ class LocationFrame(DataFrame):
         # If no params are given, a blank object will be generated, which will return all possible datapoints
         name = self._search_params["name"].get() if self._search_params["name"].get() != "" else None
 
-        query = ds.LocationData(name=name)
-
-        # Send it to the database
-        try:
-            results = self._controller._database.fetch_data(query)
-        except Exception as e:
-            messagebox.showerror(title="Operation failed", message="Failed to retrieve from database")
-            return
+        self._query = ds.LocationData(name=name)
+
+        # Send it to the database in the background. A newer search drops the results of this one
+        self._controller._executor.submit(
+            self._controller._database.fetch_data,
+            self._query,
+            result_format="tuples",
+            on_success=self.show_results,
+            on_error=lambda e: messagebox.showerror(title="Operation failed", message="Failed to retrieve from database"),
+            key=(self, "load"),
+            owner=self
+        )
 
-        # Delete the current results of the table
-        for row in self._table.get_children():
-            self._table.delete(row)
-
-        # Display the new results in the table
-        for r in results:
-            self._table.insert("", "end", values=(
-                r["id"],
-                r["name"],
-            ))
+    def show_results(self, results: TupleResult):
+        """
+        Replaces the current results of the table with the new results
+        """
+        self._table.set_rows(results.project("id", "name"))
         
     def valid_params(self):
         """
@@ -584,10 +1404,18 @@ class LocationFrame(DataFrame):
             self._validity_log.error(f"Stock name {stock_name} is invalid")
 
 
-class StockFrame(DataFrame):
+class StockFrame(LiveSearchFrame):
+    _search_columns = {"name": 1}
+    # Quantity changes are given by stock type id, so they patch the same rows when only items that need restocking are shown
+    _patch_entities = ("stock", "quantity")
+    _row_columns = ("id", "name", "restock_quantity")
+    _search_mode = "prefix"
+
     def __init__(self, parent, controller):
         super().__init__(parent)
         self._controller = controller
+        self._query = None
+        self._restock_only = False
 
         self._search_params = {
             "name": tk.StringVar(),
@@ -598,6 +1426,7 @@ class StockFrame(DataFrame):
 
         self.create_widgets()
 
+        self.enable_live_search()
         self.load_data()
 
     def create_widgets(self):
@@ -641,17 +1470,15 @@ class StockFrame(DataFrame):
         vertical_scroll = ttk.Scrollbar(table_display, orient="vertical")
         horizontal_scroll = ttk.Scrollbar(table_display, orient="horizontal")
 
-        # Setup treeview as table
-        self._table = ttk.Treeview(
+        # Setup virtual table. Only the rows in view are drawn
+        self._table = VirtualTable(
             table_display,
             columns=("id", "name", "restock_quantity"),
-            show="headings",
-            yscrollcommand=vertical_scroll.set,
+            vertical_scroll=vertical_scroll,
             xscrollcommand=horizontal_scroll.set
         )
 
         # Ensure the table scrolls when the bar is moved
-        vertical_scroll.config(command=self._table.yview)
         horizontal_scroll.config(command=self._table.xview)
 
         # Setup column headings
@@ -695,7 +1522,7 @@ class StockFrame(DataFrame):
 
         self.wait_window(new_window)
 
-        self.load_data()
+        self.after_change()
     
     def edit_item(self):
         id = super().get_selected_item()
@@ -704,23 +1531,24 @@ class StockFrame(DataFrame):
         
         stock_query = ds.StockData(id_str=id)
         
-        # Fetch the specific data entry from the database
-        try:
-            item_data = self._controller._database.fetch_data(stock_query)
-        except:
-            messagebox.showerror(title="Fetch failed", message="Failed to fetch item from database")
-
-        stock_query._name = item_data[0]["name"]
-        stock_query._restock_quantity = item_data[0]["restock_quantity"]
-
-        # Open a window to edit the existing data
-        new_window = StockPopup(self, self._controller, stock_query)
-
-        # Freeze the main window while the edit window is open
-        self.wait_window(new_window)
-
-        # Refresh the data after the edit window closes
-        self.load_data()
+        def open_popup(item_data):
+            # Open a window to edit the existing data
+            new_window = StockPopup(self, self._controller, ds.StockData.from_row(item_data[0]))
+
+            # Freeze the main window while the edit window is open
+            self.wait_window(new_window)
+
+            # Refresh the data after the edit window closes
+            self.after_change()
+
+        # Fetch the specific data entry from the database in the background, then open the edit window
+        self._controller._executor.submit(
+            self._controller._database.fetch_data,
+            stock_query,
+            on_success=open_popup,
+            on_error=lambda e: messagebox.showerror(title="Fetch failed", message="Failed to fetch item from database"),
+            owner=self
+        )
     
     def delete_item(self):
         id = super().get_selected_item()
@@ -730,12 +1558,13 @@ class StockFrame(DataFrame):
         stock_query = ds.StockData(id_str=id)
 
         if messagebox.askokcancel(title="Confirm delete", message="This will delete the selected entry. Are you sure?"):
-            try:
-                self._controller._database.delete_data(stock_query)
-            except:
-                messagebox.showerror(title="Delete failed", message="Failed to delete item from database")
-
-        self.load_data()
+            self._controller._executor.submit(
+                self._controller._database.delete_data,
+                stock_query,
+                on_success=self.on_change_result,
+                on_error=lambda e: messagebox.showerror(title="Delete failed", message="Failed to delete item from database"),
+                owner=self
+            )
 
     def load_data(self):
         """
@@ -747,35 +1576,64 @@ class StockFrame(DataFrame):
             messagebox.showerror(title="Invalid Parameters", message=self._validity_log.msg)
             return
 
+        self.run_search(self.search_terms())
+
+    def run_search(self, terms: dict):
+        """
+        Starts a new search for stock types whose names start with the given term
+        """
+        self._live_terms = terms
+        self._results_complete = False
+
         # Construct a StockData object
         # If no params are given, a blank object will be generated, which will return all possible datapoints
-        name = self._search_params["name"].get() if self._search_params["name"].get() != "" else None
+        name = terms["name"] if terms["name"] != "" else None
         
         query = ds.StockData(name=name)
+        self._query = query
+
+        show_restock = self._show_restock.get()
+        self._restock_only = show_restock
+        database = self._controller._database
 
-        # Send it to the database
-        try:
-            results = self._controller._database.fetch_data(query)
+        def run_query():
+            # Only the columns shown in the table are kept, with the id first
+            results = database.fetch_data(query, result_format="tuples", search="prefix").project("id", "name", "restock_quantity")
             # If the option to only show items that need restocking is on, get the list of items that need restocking, and create a sub-list containing only those values that intersect
-            if self._show_restock.get():
-                need_restock_dict = self._controller._database.check_restock()
+            if show_restock:
+                need_restock_dict = database.check_restock()
                 need_restock_name_set = {stock["id"] for stock in need_restock_dict}
-                results = [r for r in results if r["id"] in need_restock_name_set]
-        except Exception as e:
-            messagebox.showerror(title="Fetch failed", message="Failed to fetch from database")
-            return
+                results = [r for r in results if r[0] in need_restock_name_set]
+            return results
+
+        # Send it to the database in the background. A newer search drops the results of this one
+        self._controller._executor.submit(
+            run_query,
+            on_success=self.show_results,
+            on_error=lambda e: messagebox.showerror(title="Fetch failed", message="Failed to fetch from database"),
+            key=(self, "load"),
+            owner=self
+        )
 
-        # Delete the current results of the table
-        for row in self._table.get_children():
-            self._table.delete(row)
-
-        # Display the new results in the table
-        for r in results:
-            self._table.insert("", "end", values=(
-                r["id"],
-                r["name"],
-                r["restock_quantity"]
-            ))
+    def show_results(self, results: list):
+        """
+        Replaces the current results of the table with the new results
+        """
+        self._table.set_rows(results)
+        self._results_complete = True
+
+    def on_changes(self, events: list):
+        # Totals only decide which rows are shown when just the items that need restocking are
+        if not self._restock_only:
+            events = [event for event in events if event.entity != "quantity"]
+        super().on_changes(events)
+
+    def fetch_rows(self, query: ds.StockData, ids: list):
+        rows = super().fetch_rows(query, ids)
+        if self._restock_only:
+            need_restock_id_set = {stock["id"] for stock in self._controller._database.check_restock()}
+            rows = [row for row in rows if row[0] in need_restock_id_set]
+        return rows
         
     def valid_params(self):
         """
@@ -791,9 +1649,14 @@ class StockFrame(DataFrame):
             self._validity_log.error(f"Stock name {stock_name} is invalid")
 
 class QuantityFrame(DataFrame):
+    # Rows are the totals of each stock type, so both kinds of change are given by stock type id
+    _patch_entities = ("quantity", "stock")
+
     def __init__(self, parent, controller):
         super().__init__(parent)
         self._controller = controller
+        self._query = None
+        self._restock_only = False
 
         self._search_params = {
             "name": tk.StringVar(),
@@ -853,17 +1716,15 @@ class QuantityFrame(DataFrame):
         vertical_scroll = ttk.Scrollbar(table_display, orient="vertical")
         horizontal_scroll = ttk.Scrollbar(table_display, orient="horizontal")
 
-        # Setup treeview as table
-        self._table = ttk.Treeview(
+        # Setup virtual table. Only the rows in view are drawn
+        self._table = VirtualTable(
             table_display,
             columns=("id", "name", "current_quantity"),
-            show="headings",
-            yscrollcommand=vertical_scroll.set,
+            vertical_scroll=vertical_scroll,
             xscrollcommand=horizontal_scroll.set
         )
 
         # Ensure the table scrolls when the bar is moved
-        vertical_scroll.config(command=self._table.yview)
         horizontal_scroll.config(command=self._table.xview)
 
         # Setup column headings
@@ -902,32 +1763,54 @@ class QuantityFrame(DataFrame):
         # Construct a QuantityData object
         # If no params are given, a blank object will be generated, which will return all possible datapoints
         name = self._search_params["name"].get() if self._search_params["name"].get() != "" else None
+        location = self._search_params["location"].get() if self._search_params["location"].get() != "" else None
         
-        query = ds.QuantityData(name=name)
+        query = ds.QuantityData(stock_name=name, location_name=location)
+        self._query = query
+
+        show_restock = self._show_restock.get()
+        self._restock_only = show_restock
+        database = self._controller._database
 
-        # Send it to the database
-        try:
-            results = self._controller._database.fetch_data(query)
+        def run_query():
+            # Only the columns shown in the table are kept, with the id first
+            results = database.fetch_data(query, result_format="tuples").project("id", "name", "total_quantity")
             # If the option to only show items that need restocking is on, get the list of items that need restocking, and create a sub-list containing only those values that intersect
-            if not self._show_restock.get():
-                need_restock_dict = self._controller._database.check_restock()
+            if show_restock:
+                need_restock_dict = database.check_restock()
                 need_restock_name_set = {stock["id"] for stock in need_restock_dict}
-                results = [r for r in results if r["id"] in need_restock_name_set]
-        except Exception as e:
-            messagebox.showerror(title="Fetch failed", message="Failed to fetch from database")
-            return
+                results = [r for r in results if r[0] in need_restock_name_set]
+            return results
+
+        # Send it to the database in the background. A newer search drops the results of this one
+        self._controller._executor.submit(
+            run_query,
+            on_success=self.show_results,
+            on_error=lambda e: messagebox.showerror(title="Fetch failed", message="Failed to fetch from database"),
+            key=(self, "load"),
+            owner=self
+        )
 
-        # Delete the current results of the table
-        for row in self._table.get_children():
-            self._table.delete(row)
-
-        # Display the new results in the table
-        for r in results:
-            self._table.insert("", "end", values=(
-                r["id"],
-                r["name"],
-                r["total_quantity"]
-            ))
+    def show_results(self, results: list):
+        """
+        Replaces the current results of the table with the new results
+        """
+        self._table.set_rows(results)
+
+    def fetch_rows(self, query: ds.QuantityData, ids: list):
+        # Totals are found by stock type name, so the name of each changed stock type is looked up first
+        database = self._controller._database
+        rows = []
+        for id in ids:
+            stock = database.fetch_data(ds.StockData(id_str=id))
+            if not stock or (query._stock_name and query._stock_name != stock[0]["name"]):
+                continue
+            total_query = ds.QuantityData(stock_name=stock[0]["name"], location_name=query._location_name)
+            rows.extend(database.fetch_data(total_query, result_format="tuples").project("id", "name", "total_quantity"))
+        if self._restock_only:
+            need_restock_id_set = {stock["id"] for stock in database.check_restock()}
+            rows = [row for row in rows if row[0] in need_restock_id_set]
+        return rows
         
     def valid_params(self):
         """
@@ -947,19 +1830,40 @@ class QuantityFrame(DataFrame):
             self._validity_log.error(f"Location name {location} is invalid")
         
 
-class LogFrame(DataFrame):
+class LogFrame(LiveSearchFrame):
+    # Number of rows fetched from the database each time the table is scrolled to the bottom
+    _page_size = 200
+    _search_columns = {"name": 1}
+    # Logs are only ever added, and keep the names they were written with
+    _patch_entities = ("log",)
+    _row_columns = ("id", "stock_name", "location_name", "activity_type", "update_details", "date_occured")
+
     def __init__(self, parent, controller):
         super().__init__(parent)
         self._controller = controller
 
+        # Paging state. The table is filled a page at a time as it is scrolled
+        self._query = None
+        self._last_id = None
+        self._more_pages = False
+        self._loading_page = False
+
         self._search_params = {
             "name": tk.StringVar(),
         }
 
+        # Options for the summary tab, which totals the logs by period from the daily rollups
+        self._summary_params = {
+            "from": tk.StringVar(),
+            "to": tk.StringVar(),
+            "period": tk.StringVar(value="month"),
+        }
+
         self._validity_log = valid.ValidityCheck()
 
         self.create_widgets()
 
+        self.enable_live_search()
         self.load_data()
 
     def create_widgets(self):
@@ -985,25 +1889,28 @@ class LogFrame(DataFrame):
         clear_button = ttk.Button(search_bars, text="Clear", command=super().clear_search)
         clear_button.grid(row=1, column=1, sticky="w", padx=5, pady=5)
 
+        ## Create a tab for the logs and a tab for their summary ##
+        tabs = ttk.Notebook(self)
+        tabs.pack(fill="both", expand=True, padx=10, pady=5)
+
         ## Create table ##
-        table_display = ttk.Frame(self)
-        table_display.pack(fill="both", expand=True, padx=10, pady=5)
+        table_display = ttk.Frame(tabs)
+        tabs.add(table_display, text="Logs")
 
         # Setup scroll bars
         vertical_scroll = ttk.Scrollbar(table_display, orient="vertical")
         horizontal_scroll = ttk.Scrollbar(table_display, orient="horizontal")
 
-        # Setup treeview as table
-        self._table = ttk.Treeview(
+        # Setup virtual table. Only the rows in view are drawn, and more results are loaded as the bottom is reached
+        self._table = VirtualTable(
             table_display,
             columns=("id", "stock_name", "location_name", "activity_type", "update_details", "date_occurred"),
-            show="headings",
-            yscrollcommand=vertical_scroll.set,
+            vertical_scroll=vertical_scroll,
+            on_reach_end=self.on_table_end,
             xscrollcommand=horizontal_scroll.set
         )
 
         # Ensure the table scrolls when the bar is moved
-        vertical_scroll.config(command=self._table.yview)
         horizontal_scroll.config(command=self._table.xview)
 
         # Setup column headings
@@ -1031,6 +1938,59 @@ class LogFrame(DataFrame):
         table_display.grid_rowconfigure(0,weight=1)
         table_display.grid_columnconfigure(0, weight=1)
 
+        self.create_summary_tab(tabs)
+
+    def create_summary_tab(self, tabs: ttk.Notebook):
+        """
+        Creates the tab showing how much of each stock type moved in and out of each location in each period
+        """
+        summary_display = ttk.Frame(tabs)
+        tabs.add(summary_display, text="Summary")
+
+        ## Create summary options ##
+        options = ttk.Frame(summary_display)
+        options.grid(row=0, column=0, columnspan=2, sticky="ew", pady=5)
+
+        from_label = ttk.Label(options, text="From (YYYY-MM-DD):")
+        from_label.grid(row=0, column=0, sticky="w", padx=5, pady=2)
+        from_entry = ttk.Entry(options, textvariable=self._summary_params["from"], width=12)
+        from_entry.grid(row=0, column=1, sticky="w", padx=5, pady=2)
+
+        to_label = ttk.Label(options, text="To:")
+        to_label.grid(row=0, column=2, sticky="w", padx=5, pady=2)
+        to_entry = ttk.Entry(options, textvariable=self._summary_params["to"], width=12)
+        to_entry.grid(row=0, column=3, sticky="w", padx=5, pady=2)
+
+        period_label = ttk.Label(options, text="Group by:")
+        period_label.grid(row=0, column=4, sticky="w", padx=5, pady=2)
+        period_box = ttk.Combobox(options, textvariable=self._summary_params["period"], values=tuple(Database.ROLLUP_PERIODS), state="readonly", width=8)
+        period_box.grid(row=0, column=5, sticky="w", padx=5, pady=2)
+
+        summarise_button = ttk.Button(options, text="Summarise", command=self.load_summary)
+        summarise_button.grid(row=0, column=6, padx=5, pady=2)
+
+        ## Create summary table ##
+        vertical_scroll = ttk.Scrollbar(summary_display, orient="vertical")
+        horizontal_scroll = ttk.Scrollbar(summary_display, orient="horizontal")
+
+        columns = {
+            "period": ("Period", 90), "stock_name": ("Stock Name", 180), "location_name": ("Location Name", 180),
+            "quantity_in": ("In", 70), "quantity_out": ("Out", 70), "net_quantity": ("Net", 70),
+            "created_count": ("Created", 70), "removed_count": ("Removed", 70), "updated_count": ("Updated", 70),
+        }
+        self._summary_table = VirtualTable(summary_display, columns=tuple(columns), vertical_scroll=vertical_scroll, xscrollcommand=horizontal_scroll.set)
+        horizontal_scroll.config(command=self._summary_table.xview)
+
+        for name, (heading, width) in columns.items():
+            self._summary_table.heading(name, text=heading)
+            self._summary_table.column(name, width=width)
+
+        self._summary_table.grid(row=1, column=0, sticky="nsew")
+        vertical_scroll.grid(row=1, column=1, sticky="ns")
+        horizontal_scroll.grid(row=2, column=0, sticky="ew")
+        summary_display.grid_rowconfigure(1, weight=1)
+        summary_display.grid_columnconfigure(0, weight=1)
+
     def load_data(self):
         """
         Loads data from the database according to the search parameters and updates the table
@@ -1041,47 +2001,274 @@ class LogFrame(DataFrame):
             messagebox.showerror(title="Invalid Parameters", message=self._validity_log.msg)
             return
 
-        # Construct a StockData object
-        # If no params are given, a blank object will be generated, which will return all possible datapoints
-        name = self._search_params["name"].get() if self._search_params["name"].get() != "" else None
-        
-        query = ds.LogData(stock_name=name)
+        self.run_search(self.search_terms())
 
-        # Send it to the database
-        try:
-            results = self._controller._database.fetch_data(query)
-        except Exception as e:
-            messagebox.showerror(title="Fetch failed", message="Failed to fetch from database")
+    def load_summary(self):
+        """
+        Fetches the log totals for the searched stock name and the summary options, and shows them in the summary table
+        """
+        self.valid_params()
+        for name in ("from", "to"):
+            day = self._summary_params[name].get().strip()
+            if day and not valid.is_valid_date(day):
+                self._validity_log.error(f"Date {day} is invalid")
+        if not self._validity_log.success:
+            messagebox.showerror(title="Invalid Parameters", message=self._validity_log.msg)
             return
 
-        # Delete the current results of the table
-        for row in self._table.get_children():
-            self._table.delete(row)
-
-        # Display the new results in the table
-        for r in results:
-            self._table.insert("", "end", values=(
-                r["id"],
-                r["stock_name"],
-                r["location_name"],
-                r["activity_type"],
-                r["update_details"],
-                r["date_occured"]
-            ))
+        name = self._search_params["name"].get()
+        start = self._summary_params["from"].get().strip()
+        end = self._summary_params["to"].get().strip()
+
+        # The rollups are a few rows per day, so the whole summary is fetched at once
+        self._controller._executor.submit(
+            self._controller._database.fetch_log_rollups,
+            stock_name=name or None,
+            start=start or None,
+            end=end or None,
+            period=self._summary_params["period"].get(),
+            result_format="tuples",
+            search="prefix",
+            on_success=self.show_summary,
+            on_error=lambda e: messagebox.showerror(title="Fetch failed", message="Failed to fetch from database"),
+            key=(self, "summary"),
+            owner=self
+        )
+
+    def show_summary(self, results: TupleResult):
+        """
+        Replaces the rows of the summary table with the fetched totals
+        """
+        self._summary_table.set_rows(results.project(
+            "period", "stock_name", "location_name", "quantity_in", "quantity_out", "net_quantity",
+            "created_count", "removed_count", "updated_count"
+        ))
+
+    def run_search(self, terms: dict):
+        """
+        Starts a new search for logs whose stock names start with the given term
+        """
+        self._live_terms = terms
+        self._results_complete = False
+
+        # Construct a LogData object
+        # If no params are given, a blank object will be generated, which will return all possible datapoints
+        name = terms["name"] if terms["name"] != "" else None
         
+        self._query = ds.LogData(stock_name=name)
+
+        # Delete the current results of the table
+        self._table.clear()
+
+        # Start again from the first page
+        self._last_id = None
+        self._more_pages = True
+        self.load_next_page()
+
+    def load_next_page(self):
+        """
+        Fetches the page of results after the last one loaded and adds it to the bottom of the table
+        The fetch runs in the background. Starting a new search drops any page that is still being fetched
+        """
+        self._loading_page = True
+        self._controller._executor.submit(
+            self._controller._database.fetch_data,
+            self._query,
+            after_id=self._last_id,
+            page_size=self._page_size,
+            result_format="tuples",
+            search="prefix",
+            on_success=self.show_page,
+            on_error=self.page_failed,
+            key=(self, "load"),
+            owner=self
+        )
+
+    def show_page(self, results: TupleResult):
+        """
+        Adds a fetched page of results to the bottom of the table
+        """
+        self._loading_page = False
+        rows = results.project(*self._row_columns)
+        if rows:
+            self._last_id = rows[-1][0]
+        # A short page means the end of the results has been reached
+        self._more_pages = len(rows) == self._page_size
+        self._results_complete = not self._more_pages
+
+        # Add the new results to the bottom of the table
+        self._table.append_rows(rows)
+
+    def fetch_rows(self, query: ds.LogData, ids: list):
+        # Logs are not searched by id, so each is fetched as a page of one starting from it
+        database = self._controller._database
+        rows = []
+        for id in ids:
+            page = database.fetch_data(query, after_id=id - 1, page_size=1, result_format="tuples", search="prefix").project(*self._row_columns)
+            rows.extend(row for row in page if row[0] == id)
+        return rows
+
     def valid_params(self):
         """
         Checks the search params to make sure they are valid
         """
         valid.normalise_stringvar_params(self._search_params)
 
-        self._validity_log.success = True
+        self._validity_log.reset()
 
         stock_name = self._search_params["name"].get()
         
         if not valid.is_valid_name(stock_name):
             self._validity_log.error(f"Stock name {stock_name} is invalid")
 
+class DiagnosticsFrame(ttk.Frame):
+    """
+    Frame to show where the database is spending its time
+    Shows the timings of each database method and sql statement, and the slow query log
+    """
+    def __init__(self, parent, controller):
+        super().__init__(parent)
+        self._controller = controller
+        self._report = None
+
+        self.create_widgets()
+
+        self.load_data()
+
+    def create_widgets(self):
+        """
+        Creates the widgets needed for the diagnostics frame
+        """
+        title_label = ttk.Label(self, text="Diagnostics")
+        title_label.pack()
+
+        ## Create buttons ##
+        button_display = ttk.Frame(self)
+        button_display.pack(fill="x", padx=10, pady=5)
+
+        refresh_button = ttk.Button(button_display, text="Refresh", command=self.load_data)
+        refresh_button.pack(side="left", padx=5)
+        reset_button = ttk.Button(button_display, text="Reset", command=self.reset)
+        reset_button.pack(side="left", padx=5)
+        save_button = ttk.Button(button_display, text="Save JSON", command=self.save_json)
+        save_button.pack(side="left", padx=5)
+
+        self._summary = ttk.Label(self, text="", anchor="w")
+        self._summary.pack(fill="x", padx=10)
+
+        ## Create a tab for each table ##
+        tabs = ttk.Notebook(self)
+        tabs.pack(fill="both", expand=True, padx=10, pady=5)
+
+        self._method_table = self.create_table(tabs, "Methods", {
+            "method": ("Method", 120), "calls": ("Calls", 60), "errors": ("Errors", 60), "rows": ("Rows", 80),
+            "mean_ms": ("Mean ms", 70), "p50_ms": ("p50 ms", 70), "p95_ms": ("p95 ms", 70), "p99_ms": ("p99 ms", 70), "max_ms": ("Max ms", 70),
+        })
+        self._statement_table = self.create_table(tabs, "Statements", {
+            "calls": ("Calls", 60), "rows": ("Rows", 80), "total_ms": ("Total ms", 80), "mean_ms": ("Mean ms", 70),
+            "p95_ms": ("p95 ms", 70), "max_ms": ("Max ms", 70), "sql": ("SQL", 600),
+        })
+        self._slow_table = self.create_table(tabs, "Slow queries", {
+            "time": ("Time", 140), "ms": ("ms", 70), "rows": ("Rows", 60), "sql": ("SQL", 400), "plan": ("Query plan", 400),
+        })
+
+    def create_table(self, tabs: ttk.Notebook, title: str, columns: dict):
+        """
+        Adds a tab holding a table with the given columns, as name: (heading, width)
+        """
+        table_display = ttk.Frame(tabs)
+        tabs.add(table_display, text=title)
+
+        vertical_scroll = ttk.Scrollbar(table_display, orient="vertical")
+        horizontal_scroll = ttk.Scrollbar(table_display, orient="horizontal")
+        table = VirtualTable(table_display, columns=tuple(columns), vertical_scroll=vertical_scroll, xscrollcommand=horizontal_scroll.set)
+        horizontal_scroll.config(command=table.xview)
+
+        for name, (heading, width) in columns.items():
+            table.heading(name, text=heading)
+            table.column(name, width=width, stretch=name in ("sql", "plan"))
+
+        table.grid(row=0, column=0, sticky="nsew")
+        vertical_scroll.grid(row=0, column=1, sticky="ns")
+        horizontal_scroll.grid(row=1, column=0, sticky="ew")
+        table_display.grid_rowconfigure(0, weight=1)
+        table_display.grid_columnconfigure(0, weight=1)
+        return table
+
+    def load_data(self):
+        """
+        Fetches the latest timings in the background and shows them
+        """
+        self._controller._executor.submit(
+            self._controller._database.diagnostics,
+            on_success=self.show_report,
+            on_error=lambda e: messagebox.showerror(title="Diagnostics failed", message="Failed to read the database timings"),
+            key=(self, "load"),
+            owner=self
+        )
+
+    def show_report(self, report: dict):
+        """
+        Fills the tables from a diagnostics report
+        """
+        self._report = report
+        if not report["profiling"]:
+            self._summary.config(text="Profiling is turned off for this database. Start the program with --profile to turn it on")
+        else:
+            pool = report["pool"]
+            self._summary.config(text=(
+                f"Since {report['since']}. Slow query threshold {report['slow_threshold_ms']} ms. "
+                f"Pool: {pool['open_connections']} open, {pool['hits']} hits, {pool['waits']} waits. "
+                f"Writes: {pool['write_transactions']} transactions, {pool['write_retries']} retries, {pool['write_busy_failures']} refused as busy"
+            ))
+
+        def ms(value: float):
+            return f"{value:.3f}"
+
+        self._method_table.set_rows([
+            (name, t["calls"], t["errors"], t["rows"], ms(t["mean_ms"]), ms(t["p50_ms"]), ms(t["p95_ms"]), ms(t["p99_ms"]), ms(t["max_ms"]))
+            for name, t in report["methods"].items()
+        ])
+        self._statement_table.set_rows([
+            (t["calls"], t["rows"], ms(t["total_ms"]), ms(t["mean_ms"]), ms(t["p95_ms"]), ms(t["max_ms"]), query)
+            for query, t in report["statements"].items()
+        ])
+        # Newest first
+        self._slow_table.set_rows([
+            (entry["time"], ms(entry["ms"]), entry["rows"], entry["sql"], " | ".join(entry["plan"] or []))
+            for entry in reversed(report["slow_queries"])
+        ])
+
+    def reset(self):
+        """
+        Clears the timings, so only what happens from now on is shown
+        """
+        self._controller._executor.submit(
+            self._controller._database.reset_diagnostics,
+            on_success=lambda result: self.load_data(),
+            owner=self
+        )
+
+    def save_json(self):
+        """
+        Asks where to save the current timings, and writes them as json for offline analysis
+        """
+        path = filedialog.asksaveasfilename(title="Save diagnostics", defaultextension=".json", initialfile="diagnostics.json", filetypes=[("JSON files", "*.json")])
+        if not path:
+            return
+
+        database = self._controller._database
+
+        def run_save():
+            with open(path, "w") as f:
+                json.dump(database.diagnostics(), f, indent=2)
+
+        self._controller._executor.submit(
+            run_save,
+            on_error=lambda e: messagebox.showerror(title="Save failed", message=f"Unable to save to {path}"),
+            owner=self
+        )
+
 ###############
 ## TopLevels ##
 ###############
@@ -1258,8 +2445,7 @@ class InventoryPopup(Popup):
             messagebox.showerror(title="Invalid Parameters", message=self._validity_log.msg)
             return
 
-        try:
-            result = database_method(self._query)
+        def on_result(result):
             # If the database method fails, result will be a MsgBoxGenerator, and if it succeeds, it will be True
             if result is True:
                 operation_str = "Edit" if self._inventory_data else "Add"
@@ -1267,8 +2453,15 @@ class InventoryPopup(Popup):
                 self.destroy()
             else:
                 messagebox.showerror(title=result.title, message=result.message)
-        except:
-            messagebox.showerror(title="Database Error", message="Unable to update database")
+
+        # Run the database method in the background, so the window keeps responding while it runs
+        self._controller._executor.submit(
+            database_method,
+            self._query,
+            on_success=on_result,
+            on_error=lambda e: messagebox.showerror(title="Database Error", message="Unable to update database"),
+            owner=self
+        )
     
 
     def valid_params(self):
@@ -1391,8 +2584,7 @@ class LocationPopup(Popup):
             messagebox.showerror(title="Invalid Parameters", message=self._validity_log.msg)
             return
         
-        try:
-            result = database_method(self._query)
+        def on_result(result):
             # If the database method fails, result will be a MsgBoxGenerator, and if it succeeds, it will be True
             if result is True:
                 operation_str = "Edit" if self._location_data else "Add"
@@ -1400,8 +2592,15 @@ class LocationPopup(Popup):
                 self.destroy()
             else:
                 messagebox.showerror(title=result.title, message=result.message)
-        except:
-            messagebox.showerror(title="Database Error", message="Unable to update database")
+
+        # Run the database method in the background, so the window keeps responding while it runs
+        self._controller._executor.submit(
+            database_method,
+            self._query,
+            on_success=on_result,
+            on_error=lambda e: messagebox.showerror(title="Database Error", message="Unable to update database"),
+            owner=self
+        )
     
     def valid_params(self):
         """
@@ -1537,8 +2736,7 @@ class StockPopup(Popup):
             messagebox.showerror(title="Invalid Parameters", message=self._validity_log.msg)
             return
 
-        try:
-            result = database_method(self._query)
+        def on_result(result):
             # If the database method fails, result will be a MsgBoxGenerator, and if it succeeds, it will be True
             if result is True:
                 operation_str = "Edit" if self._stock_data else "Add"
@@ -1546,8 +2744,15 @@ class StockPopup(Popup):
                 self.destroy()
             else:
                 messagebox.showerror(title=result.title, message=result.message)
-        except:
-            messagebox.showerror(title="Database Error", message="Unable to update database")
+
+        # Run the database method in the background, so the window keeps responding while it runs
+        self._controller._executor.submit(
+            database_method,
+            self._query,
+            on_success=on_result,
+            on_error=lambda e: messagebox.showerror(title="Database Error", message="Unable to update database"),
+            owner=self
+        )
     
     def valid_params(self):
         """
@@ -1,4 +1,15 @@
+import argparse
+
 from gui import App
 
-app = App()
-app.mainloop()
\ No newline at end of file
+parser = argparse.ArgumentParser(description="Inventory Tracking System")
+parser.add_argument("--profile", action="store_true", help="time every database call for the diagnostics page, logging slow queries next to the database")
+parser.add_argument("--server", help="url of a running database service (python -m service) to use instead of opening the database")
+args = parser.parse_args()
+
+if args.server:
+    from service import ServiceClient
+    app = App(ServiceClient(args.server))
+else:
+    app = App(profile=args.profile)
+app.mainloop()
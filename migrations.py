@@ -0,0 +1,73 @@
+import sqlite3 as sql
+from pathlib import Path
+
+#######################
+## Schema migrations ##
+#######################
+# The schema is built up by the numbered scripts in ./dbs/migrations, applied in order.
+# The number of scripts that have been applied is stored in PRAGMA user_version,
+# so an up to date database can be recognised without reading any of the scripts.
+# New schema changes must be added as a new script at the end of the list - never edit one that has shipped
+
+MIGRATIONS_DIR = Path(__file__).parent / "dbs/migrations"
+
+MIGRATIONS = [
+    "0001_create_tables.sql",
+    "0002_lookup_indexes.sql",
+    "0003_stock_totals.sql",
+    "0004_name_generation.sql",
+    "0005_log_name_indexes.sql",
+    "0006_name_search.sql",
+    "0007_log_archives.sql",
+    "0008_log_rollups.sql",
+    "0009_inventory_checkpoints.sql",
+    "0010_log_moves.sql",
+]
+
+LATEST_VERSION = len(MIGRATIONS)
+
+def get_schema_version(conn: sql.Connection) -> int:
+    """
+    Returns the number of migrations that have been applied to the database
+    """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def split_statements(script: str):
+    """
+    Splits an sql script into its individual statements
+    Uses sqlite's own parser to find statement ends, so semicolons inside strings and triggers are handled
+    """
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sql.complete_statement(statement):
+            if statement.strip():
+                yield statement
+            statement = ""
+    if statement.strip():
+        yield statement
+
+def apply_migrations(conn: sql.Connection) -> int:
+    """
+    Applies any migrations the database has not yet had, all inside one transaction
+    Returns the number of migrations that were applied
+    """
+    # The common case is an up to date database, which costs a single pragma read
+    if get_schema_version(conn) >= LATEST_VERSION:
+        return 0
+
+    # Take the write lock before checking again, in case another process is migrating at the same time
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = get_schema_version(conn)
+        for name in MIGRATIONS[version:]:
+            script = (MIGRATIONS_DIR / name).read_text()
+            for statement in split_statements(script):
+                conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {LATEST_VERSION}")
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise e
+
+    return LATEST_VERSION - version
@@ -0,0 +1,116 @@
+import sqlite3 as sql
+
+#####################
+## class NameCache ##
+#####################
+# In-memory lookups between the names and ids of stock types and locations
+
+class NameCache:
+    """
+    Maps stock type and location names to ids, and ids back to names, without going to the database
+
+    The whole cache is loaded in one query, along with the name_generation counter that the database
+    triggers bump whenever a name is added, changed or removed. check() compares the counter and reloads
+    if anything (such as another terminal) has changed the names since. Changes made through the owning
+    Database are applied to the cache directly, with note_changes() advancing the expected counter to match.
+    The cache is only used inside write transactions, so the writer lock keeps it consistent between threads.
+    """
+    _load_query = """
+        SELECT 'generation', generation, NULL FROM name_generation
+        UNION ALL
+        SELECT 'stock', id, name FROM stock_data
+        UNION ALL
+        SELECT 'location', id, name FROM location_data
+    """
+
+    def __init__(self):
+        self._stock_ids = {}
+        self._stock_names = {}
+        self._location_ids = {}
+        self._location_names = {}
+        # None means the cache must be loaded before it is next used
+        self._generation = None
+
+        self.loads = 0
+
+    def load(self, conn: sql.Connection):
+        """
+        Replaces the contents of the cache with the current names in the database
+        """
+        self._stock_ids = {}
+        self._stock_names = {}
+        self._location_ids = {}
+        self._location_names = {}
+        generation = 0
+        for kind, id, name in conn.execute(self._load_query):
+            if kind == "stock":
+                self._stock_ids[name] = id
+                self._stock_names[id] = name
+            elif kind == "location":
+                self._location_ids[name] = id
+                self._location_names[id] = name
+            else:
+                generation = id
+        self._generation = generation
+        self.loads += 1
+
+    def check(self, conn: sql.Connection):
+        """
+        Reloads the cache if the names in the database have changed since it was last loaded
+        """
+        if self._generation is None:
+            self.load(conn)
+            return
+        row = conn.execute("SELECT generation FROM name_generation WHERE id = 1").fetchone()
+        if row is None or row[0] != self._generation:
+            self.load(conn)
+
+    def invalidate(self):
+        """
+        Forces a reload on next use, e.g. after a write that changed names was rolled back
+        """
+        self._generation = None
+
+    def note_changes(self, count: int):
+        """
+        Records that this process has made count name changes, so the triggers' updates to the counter are expected
+        """
+        if self._generation is not None:
+            self._generation += count
+
+    def stock_id(self, name: str):
+        return self._stock_ids.get(name)
+
+    def stock_name(self, id: int):
+        return self._stock_names.get(int(id)) if id is not None else None
+
+    def location_id(self, name: str):
+        return self._location_ids.get(name)
+
+    def location_name(self, id: int):
+        return self._location_names.get(int(id)) if id is not None else None
+
+    def add_stock(self, id: int, name: str):
+        self._stock_ids[name] = id
+        self._stock_names[id] = name
+
+    def add_location(self, id: int, name: str):
+        self._location_ids[name] = id
+        self._location_names[id] = name
+
+    def rename_location(self, id: int, name: str):
+        id = int(id)
+        old_name = self._location_names.get(id)
+        if old_name is not None:
+            del self._location_ids[old_name]
+        self.add_location(id, name)
+
+    def remove_stock(self, id: int):
+        name = self._stock_names.pop(int(id), None)
+        if name is not None:
+            del self._stock_ids[name]
+
+    def remove_location(self, id: int):
+        name = self._location_names.pop(int(id), None)
+        if name is not None:
+            del self._location_ids[name]
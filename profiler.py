@@ -0,0 +1,366 @@
+import functools
+import json
+import re
+import sqlite3 as sql
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+############################
+## class LatencyHistogram ##
+############################
+# Timings for one method or statement
+
+class LatencyHistogram:
+    """
+    Counts timings into fixed, roughly logarithmic buckets
+    The buckets only cover the most recent window samples, so they show how things are running now
+    rather than since startup. The call, error and row totals cover every sample
+    """
+    # Upper bounds of the buckets in milliseconds. Anything slower goes in a final overflow bucket
+    bounds = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+    def __init__(self, window: int = 1000):
+        self.buckets = [0] * (len(self.bounds) + 1)
+        # The bucket of each sample in the window, oldest first
+        self._recent = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def _bucket(self, ms: float):
+        for index, bound in enumerate(self.bounds):
+            if ms <= bound:
+                return index
+        return len(self.bounds)
+
+    def add(self, ms: float, rows: int = None, error: bool = False):
+        bucket = self._bucket(ms)
+        if len(self._recent) == self._recent.maxlen:
+            self.buckets[self._recent[0]] -= 1
+        self._recent.append(bucket)
+        self.buckets[bucket] += 1
+
+        self.calls += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        if rows:
+            self.rows += rows
+        if error:
+            self.errors += 1
+
+    def percentile(self, fraction: float):
+        """
+        Returns the upper bound of the bucket the given fraction of the recent samples fall within
+        """
+        target = fraction * len(self._recent)
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return self.bounds[index] if index < len(self.bounds) else self.max_ms
+        return 0.0
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rows": self.rows,
+            "total_ms": self.total_ms,
+            "mean_ms": self.total_ms / self.calls if self.calls else 0.0,
+            "max_ms": self.max_ms,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": {
+                (f"<={bound}" if index < len(self.bounds) else f">{self.bounds[-1]}"): count
+                for index, (bound, count) in enumerate(zip(self.bounds + (None,), self.buckets))
+            },
+        }
+
+####################
+## class Profiler ##
+####################
+# Where the timings for a Database are collected
+
+class Profiler:
+    """
+    Collects the timings of Database methods and the sql statements they run
+
+    Methods are timed by the @profiled decorator. Statements are timed by the connections made from
+    connection_factory(), from when they are executed until their last row is fetched.
+    Statements slower than slow_threshold_ms are kept in the slow query log along with their query plan,
+    and appended to slow_log_path as json lines if it is given. Once that file reaches slow_log_bytes
+    it is moved aside to a ".1" file, replacing the one before, so at most twice that is kept on disk
+    """
+    def __init__(self, slow_threshold_ms: float = 100.0, slow_log_path: Path = None, window: int = 1000, slow_log_size: int = 200, slow_log_bytes: int = 1_000_000):
+        self.slow_threshold_ms = slow_threshold_ms
+        self._slow_log_path = Path(slow_log_path) if slow_log_path else None
+        self._slow_log_bytes = slow_log_bytes
+        self._window = window
+        self._lock = threading.Lock()
+        self._methods = {}
+        self._statements = {}
+        # The query plan of each slow statement, so it is only explained the first time it is slow
+        self._plans = {}
+        self._slow_queries = deque(maxlen=slow_log_size)
+        self._started = datetime.now()
+
+    def connection_factory(self):
+        """
+        Returns the connection class to pass to sqlite3.connect so its statements are timed by this profiler
+        """
+        return type("ProfiledConnection", (ProfiledConnection,), {"_profiler": self})
+
+    def record_method(self, name: str, ms: float, rows: int = None, error: bool = False):
+        with self._lock:
+            histogram = self._methods.get(name)
+            if histogram is None:
+                histogram = self._methods[name] = LatencyHistogram(self._window)
+            histogram.add(ms, rows, error)
+
+    def record_statement(self, conn: sql.Connection, query: str, params, ms: float, rows: int, error: bool = False):
+        with self._lock:
+            histogram = self._statements.get(query)
+            if histogram is None:
+                histogram = self._statements[query] = LatencyHistogram(self._window)
+            histogram.add(ms, rows, error)
+
+        if ms >= self.slow_threshold_ms:
+            self._log_slow_query(conn, query, params, ms, rows)
+
+    def _log_slow_query(self, conn: sql.Connection, query: str, params, ms: float, rows: int):
+        with self._lock:
+            explained = query in self._plans
+            plan = self._plans.get(query)
+        if not explained:
+            plan = explain_query_plan(conn, query, params)
+            with self._lock:
+                self._plans[query] = plan
+        entry = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "sql": normalise_sql(query),
+            "params": [repr(param) for param in params] if isinstance(params, (tuple, list)) else repr(params),
+            "ms": ms,
+            "rows": rows,
+            "plan": plan,
+        }
+        with self._lock:
+            self._slow_queries.append(entry)
+            if self._slow_log_path is not None:
+                self._write_slow_log(json.dumps(entry) + "\n")
+
+    def _write_slow_log(self, line: str):
+        """
+        Appends a line to the slow query log file, first moving it aside if it has grown too big
+        """
+        try:
+            if self._slow_log_path.stat().st_size >= self._slow_log_bytes:
+                self._slow_log_path.replace(self._slow_log_path.with_name(self._slow_log_path.name + ".1"))
+        except FileNotFoundError:
+            pass
+        with open(self._slow_log_path, "a") as log:
+            log.write(line)
+
+    def reset(self):
+        """
+        Clears every timing and the in memory slow query log
+        """
+        with self._lock:
+            self._methods = {}
+            self._statements = {}
+            self._plans = {}
+            self._slow_queries.clear()
+            self._started = datetime.now()
+
+    def snapshot(self):
+        """
+        Returns every timing and the slow query log as plain data
+        Statements are keyed by their sql with the whitespace tidied, slowest total first
+        """
+        with self._lock:
+            statements = sorted(self._statements.items(), key=lambda item: item[1].total_ms, reverse=True)
+            return {
+                "since": self._started.isoformat(timespec="seconds"),
+                "slow_threshold_ms": self.slow_threshold_ms,
+                "methods": {name: histogram.as_dict() for name, histogram in sorted(self._methods.items())},
+                "statements": {normalise_sql(query): histogram.as_dict() for query, histogram in statements},
+                "slow_queries": list(self._slow_queries),
+            }
+
+def normalise_sql(query: str):
+    return re.sub(r"\s+", " ", query).strip()
+
+def explain_query_plan(conn: sql.Connection, query: str, params):
+    """
+    Returns the lines of sqlite's query plan for a statement, or None if it has no plan
+    """
+    words = query.split(None, 1)
+    if not words or words[0].upper() not in ("SELECT", "INSERT", "REPLACE", "UPDATE", "DELETE", "WITH"):
+        return None
+    try:
+        # Run on a plain cursor, so the plan is not itself timed
+        cur = sql.Connection.cursor(conn, sql.Cursor)
+        cur.row_factory = None
+        rows = cur.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    except sql.Error:
+        return None
+    return [row[-1] for row in rows]
+
+######################
+## Timed statements ##
+######################
+# Connection and cursor classes that time the statements run through them
+
+class ProfiledCursor(sql.Cursor):
+    """
+    Cursor that reports each statement to the profiler once it is finished with
+    A statement is finished when its last row has been fetched, the cursor is used for the next
+    statement, or the cursor is closed or thrown away. Statements that return no rows finish straight away
+    """
+    _statement = None
+
+    def _start(self, query: str, params):
+        self._finish()
+        self._statement = [query, params, 0.0, 0]
+
+    def _finish(self, error: bool = False):
+        statement = self._statement
+        if statement is None:
+            return
+        self._statement = None
+        query, params, ms, rows = statement
+        if self.description is None and self.rowcount > 0:
+            rows = self.rowcount
+        self.connection._profiler.record_statement(self.connection, query, params, ms, rows, error)
+
+    def _timed(self, query: str, params, run):
+        self._start(query, params)
+        start = time.perf_counter()
+        try:
+            run()
+        except Exception:
+            self._statement[2] += (time.perf_counter() - start) * 1000
+            self._finish(error=True)
+            raise
+        self._statement[2] += (time.perf_counter() - start) * 1000
+        if self.description is None:
+            self._finish()
+        return self
+
+    def execute(self, query: str, params=()):
+        return self._timed(query, params, lambda: super(ProfiledCursor, self).execute(query, params))
+
+    def executemany(self, query: str, seq_of_params):
+        return self._timed(query, (), lambda: super(ProfiledCursor, self).executemany(query, seq_of_params))
+
+    def executescript(self, script: str):
+        return self._timed(script, (), lambda: super(ProfiledCursor, self).executescript(script))
+
+    def _fetched(self, start: float, rows: int, exhausted: bool):
+        statement = self._statement
+        if statement is not None:
+            statement[2] += (time.perf_counter() - start) * 1000
+            statement[3] += rows
+            if exhausted:
+                self._finish()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size: int = None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows), len(rows) < (self.arraysize if size is None else size))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows), True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0, True)
+            raise
+        self._fetched(start, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            # The connection may already be closed, e.g. on shutdown
+            pass
+
+class ProfiledConnection(sql.Connection):
+    """
+    Connection whose statements are all run on ProfiledCursors
+    Subclassed by Profiler.connection_factory() to set _profiler
+    """
+    _profiler = None
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, query: str, params=()):
+        return self.cursor().execute(query, params)
+
+    def executemany(self, query: str, seq_of_params):
+        return self.cursor().executemany(query, seq_of_params)
+
+    def executescript(self, script: str):
+        return self.cursor().executescript(script)
+
+###################
+## Timed methods ##
+###################
+
+def count_rows(result):
+    """
+    Returns the number of rows in a fetch result, or None if it is not one
+    """
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict) and result:
+        first = next(iter(result.values()))
+        if isinstance(first, list):
+            return len(first)
+    return None
+
+def profiled(method):
+    """
+    Decorator that times a Database method with the Database's profiler, if it has one
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def timed(self, *args, **kwargs):
+        profiler = self._profiler
+        if profiler is None:
+            return method(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            result = method(self, *args, **kwargs)
+        except Exception:
+            profiler.record_method(name, (time.perf_counter() - start) * 1000, error=True)
+            raise
+        profiler.record_method(name, (time.perf_counter() - start) * 1000, count_rows(result))
+        return result
+
+    return timed
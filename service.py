@@ -0,0 +1,475 @@
+import argparse
+import asyncio
+import functools
+import http.client
+import json
+import sqlite3 as sql
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import data_structures as ds
+from connection_pool import is_busy_error
+from database import Database, TupleResult
+from utils import MsgBoxGenerator
+
+######################
+## Database service ##
+######################
+# Serves one Database over local http, so several gui windows and scripts share one warm set of connections
+# rather than each opening their own, and all of their writes are made one at a time by one thread.
+#
+#   python -m service --port 8765
+#
+# Every Database method below is an endpoint: POST /<method> with a json body of {"args": [...], "kwargs": {...}}.
+# Data objects, messages and tuple results are sent as tagged json objects, see encode_value.
+# The reply is {"result": ...}, or for the streaming methods a chunked body of one json value per line,
+# so a large table is sent as it is read rather than built up in memory first.
+# ServiceClient has the same methods as Database, so the gui can use either
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Methods run by the read threads, which may run at the same time as each other
+READ_METHODS = {"fetch_data", "check_restock", "inventory_as_of", "fetch_log_rollups", "log_archives", "inventory_checkpoints", "diagnostics", "pool_stats", "query_cache_stats"}
+# Methods run one at a time by the single write thread
+WRITE_METHODS = {"add_data", "update_data", "delete_data", "bulk_add", "archive_logs", "rebuild_log_rollups", "checkpoint_inventory", "reset_diagnostics"}
+# Methods that return generators, which are sent one value per line as they are produced
+STREAM_METHODS = {"stream_table"}
+
+# The data objects that can be sent, by name
+DATA_TYPES = {cls.__name__: cls for cls in (ds.StockData, ds.LocationData, ds.InventoryData, ds.QuantityData, ds.LogData)}
+
+def encode_value(value):
+    """
+    Converts a value passed to or returned from a Database method to something json can hold
+    Data objects, messages and tuple results become objects tagged with a "__type__" key
+    """
+    if isinstance(value, ds.SqlData):
+        return {"__type__": value._base_type().__name__, "fields": {field: encode_value(getattr(value, field)) for field in value._fields}}
+    if isinstance(value, MsgBoxGenerator):
+        return {"__type__": "message", "title": value.title, "message": value.message}
+    if isinstance(value, TupleResult):
+        columns = sorted(value.columns, key=value.columns.get)
+        return {"__type__": "tuples", "columns": columns, "rows": [list(row) for row in value]}
+    if isinstance(value, dict):
+        return {key: encode_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(item) for item in value]
+    return value
+
+def decode_value(value):
+    """
+    Reverses encode_value
+    """
+    if isinstance(value, list):
+        return [decode_value(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    value_type = value.get("__type__")
+    if value_type is None:
+        return {key: decode_value(item) for key, item in value.items()}
+    if value_type == "message":
+        return MsgBoxGenerator(value["title"], value["message"])
+    if value_type == "tuples":
+        return TupleResult([tuple(row) for row in value["rows"]], {name: index for index, name in enumerate(value["columns"])})
+    if value_type not in DATA_TYPES:
+        raise Exception(f"Unrecognised data type {value_type}")
+    cls = DATA_TYPES[value_type]
+    data = cls()
+    for field, item in value["fields"].items():
+        if field not in cls._fields:
+            raise Exception(f"Unrecognised field {field} for {value_type}")
+        setattr(data, field, decode_value(item))
+    return data
+
+class ServiceError(Exception):
+    """
+    Raised by ServiceClient when the service could not run a method
+    """
+
+class DatabaseService:
+    """
+    Serves a Database's methods as json endpoints over http
+    Reads run on a pool of threads as large as the connection pool, writes on a single thread
+    """
+    def __init__(self, database: Database, read_threads: int = 5, stream_buffer: int = 64):
+        self._database = database
+        self._reads = ThreadPoolExecutor(max_workers=read_threads, thread_name_prefix="service-read")
+        self._writes = ThreadPoolExecutor(max_workers=1, thread_name_prefix="service-write")
+        # Chunks a stream may read ahead of the client before its thread waits
+        self._stream_buffer = stream_buffer
+        self._server = None
+        self._loop = None
+        self._thread = None
+        self.requests = 0
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        """
+        Starts listening, and returns the port, which is chosen by the system if port is 0
+        """
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        port = await self.start(host, port)
+        print(f"Serving the database on http://{host}:{port}", flush=True)
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_in_thread(self, host: str = DEFAULT_HOST, port: int = 0):
+        """
+        Runs the service on its own event loop in a background thread, and returns the port
+        For tests and benchmarks, which need the service and a client in one process
+        """
+        started = threading.Event()
+        result = {}
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            result["port"] = loop.run_until_complete(self.start(host, port))
+            started.set()
+            loop.run_forever()
+            loop.run_until_complete(self._close_server())
+            # Connections still kept alive by clients are dropped
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+
+        self._thread = threading.Thread(target=run, name="service", daemon=True)
+        self._thread.start()
+        started.wait()
+        return result["port"]
+
+    async def _close_server(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def stop(self):
+        """
+        Stops a service started by start_in_thread, and its threads
+        The database itself is left open
+        """
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+        self._reads.shutdown()
+        self._writes.shutdown()
+
+    ##########
+    ## Http ##
+    ##########
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Answers requests on one connection until the client closes it, as connections are kept alive
+        """
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except ValueError as e:
+                    # What is left of a malformed request cannot be found, so the connection is closed after answering
+                    await self._send_json(writer, 400, {"error": f"Malformed request: {e}"}, False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                self.requests += 1
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self._respond(writer, method, path, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # The client went away, or the service is stopping
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """
+        Returns the method, path, lower case headers and body of the next request, or None once the client has gone
+        Raises ValueError if the request line, a header or the content length is malformed
+        """
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        parts = request_line.decode("latin-1").split(" ", 2)
+        if len(parts) != 3:
+            raise ValueError(f"bad request line {request_line!r}")
+        method, path, _ = parts
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, colon, value = line.decode("latin-1").partition(":")
+            if not colon:
+                raise ValueError(f"bad header {line!r}")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length < 0:
+            raise ValueError(f"bad content length {length}")
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+
+    async def _respond(self, writer: asyncio.StreamWriter, method: str, path: str, body: bytes, keep_alive: bool):
+        name = path.strip("/")
+        if method == "GET" and name == "health":
+            await self._send_json(writer, 200, {"result": True}, keep_alive)
+            return
+        if method != "POST" or name not in READ_METHODS | WRITE_METHODS | STREAM_METHODS:
+            await self._send_json(writer, 404, {"error": f"No such method {method} {path}"}, keep_alive)
+            return
+
+        try:
+            request = json.loads(body) if body else {}
+            args = decode_value(request.get("args", []))
+            kwargs = decode_value(request.get("kwargs", {}))
+        except Exception as e:
+            await self._send_json(writer, 400, {"error": str(e)}, keep_alive)
+            return
+
+        call = functools.partial(getattr(self._database, name), *args, **kwargs)
+        if name in STREAM_METHODS or kwargs.get("result_format") == "iter":
+            await self._send_stream(writer, call, keep_alive)
+            return
+        executor = self._writes if name in WRITE_METHODS else self._reads
+        try:
+            result = await self._loop.run_in_executor(executor, call)
+        except Exception as e:
+            await self._send_error(writer, e, keep_alive)
+            return
+        await self._send_json(writer, 200, {"result": encode_value(result)}, keep_alive)
+
+    async def _send_error(self, writer: asyncio.StreamWriter, error: Exception, keep_alive: bool):
+        if isinstance(error, sql.OperationalError) and is_busy_error(error):
+            await self._send_json(writer, 503, {"error": str(error), "busy": True}, keep_alive)
+        else:
+            await self._send_json(writer, 500, {"error": f"{type(error).__name__}: {error}"}, keep_alive)
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, content: dict, keep_alive: bool):
+        body = json.dumps(content).encode()
+        writer.write(self._headers(status, keep_alive, {"Content-Type": "application/json", "Content-Length": str(len(body))}) + body)
+        await writer.drain()
+
+    async def _send_stream(self, writer: asyncio.StreamWriter, call, keep_alive: bool):
+        """
+        Sends each value the generator yields as a json line, in http chunks
+        The generator holds a pooled connection, so it is run to the end on one read thread,
+        which waits whenever it gets stream_buffer chunks ahead of the client
+        """
+        queue = asyncio.Queue(maxsize=self._stream_buffer)
+        done = object()
+
+        def produce():
+            put = lambda item: asyncio.run_coroutine_threadsafe(queue.put(item), self._loop).result()
+            try:
+                lines = []
+                for value in call():
+                    lines.append(json.dumps(encode_value(value)))
+                    if len(lines) == 500:
+                        put("\n".join(lines) + "\n")
+                        lines = []
+                if lines:
+                    put("\n".join(lines) + "\n")
+            except Exception as e:
+                put(e)
+            finally:
+                put(done)
+
+        producer = self._loop.run_in_executor(self._reads, produce)
+        first = await queue.get()
+        if isinstance(first, Exception):
+            await queue.get()
+            await self._send_error(writer, first, keep_alive)
+            await producer
+            return
+
+        writer.write(self._headers(200, keep_alive, {"Content-Type": "application/x-ndjson", "Transfer-Encoding": "chunked"}))
+        item = first
+        try:
+            while item is not done:
+                if isinstance(item, Exception):
+                    # Too late to change the status, so end the stream with the error for the client to raise
+                    item = json.dumps({"__type__": "error", "error": f"{type(item).__name__}: {item}"}) + "\n"
+                chunk = item.encode()
+                writer.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                await writer.drain()
+                item = await queue.get()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            # Let the producer finish if the client went away part way through
+            while item is not done:
+                item = await queue.get()
+            await producer
+
+    @staticmethod
+    def _headers(status: int, keep_alive: bool, headers: dict) -> bytes:
+        lines = [f"HTTP/1.1 {status} {http.client.responses.get(status, '')}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+#########################
+## class ServiceClient ##
+#########################
+# Stands in for Database when the gui or a script talks to a running service.
+# Each thread keeps its own connection open between calls, as the gui runs its queries on worker threads
+class ServiceClient:
+    """
+    Calls a DatabaseService's methods over http, with the same signatures and results as Database
+    """
+    def __init__(self, url: str = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", timeout: float = 60.0):
+        parts = urlsplit(url)
+        self._host = parts.hostname or DEFAULT_HOST
+        self._port = parts.port or DEFAULT_PORT
+        self._timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _drop_connection(self):
+        conn = self._local.conn
+        self._local.conn = None
+        conn.close()
+        with self._lock:
+            self._connections.remove(conn)
+
+    @staticmethod
+    def _body(args, kwargs) -> bytes:
+        return json.dumps({"args": encode_value(list(args)), "kwargs": encode_value(kwargs)}).encode()
+
+    @staticmethod
+    def _raise_for_status(response: http.client.HTTPResponse):
+        if response.status == 200:
+            return
+        content = json.loads(response.read() or b"{}")
+        error = content.get("error", f"status {response.status}")
+        if content.get("busy"):
+            # The same error Database raises, so callers can handle a busy database the same way
+            raise sql.OperationalError(error)
+        raise ServiceError(error)
+
+    def call(self, method: str, *args, **kwargs):
+        """
+        Runs a Database method on the service and returns its result
+        """
+        body = self._body(args, kwargs)
+        reused = getattr(self._local, "conn", None) is not None
+        try:
+            conn = self._connection()
+            conn.request("POST", f"/{method}", body, {"Content-Type": "application/json"})
+            response = conn.getresponse()
+        except (ConnectionError, http.client.HTTPException):
+            self._drop_connection()
+            # A kept alive connection may have been closed by a restarted service. Reads are safe to send again,
+            # but a write may already have been made, so it is left to the caller
+            if not reused or method in WRITE_METHODS:
+                raise
+            return self.call(method, *args, **kwargs)
+        self._raise_for_status(response)
+        return decode_value(json.loads(response.read())["result"])
+
+    def stream(self, method: str, *args, **kwargs):
+        """
+        Generator that runs a streaming method on the service and yields its values as they arrive
+        Streams use a connection of their own, so other calls can be made while one is being read
+        """
+        conn = http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+        try:
+            conn.request("POST", f"/{method}", self._body(args, kwargs), {"Content-Type": "application/json", "Connection": "close"})
+            response = conn.getresponse()
+            self._raise_for_status(response)
+            for line in response:
+                value = json.loads(line)
+                if isinstance(value, dict) and value.get("__type__") == "error":
+                    raise ServiceError(value["error"])
+                yield decode_value(value)
+        finally:
+            conn.close()
+
+    def add_data(self, data: ds.SqlData):
+        return self.call("add_data", data)
+
+    def bulk_add(self, items):
+        return self.call("bulk_add", list(items))
+
+    def update_data(self, data: ds.SqlData):
+        return self.call("update_data", data)
+
+    def delete_data(self, data: ds.SqlData):
+        return self.call("delete_data", data)
+
+    def fetch_data(self, data: ds.SqlData, result_format: str = "dicts", search: str = "exact", **page_args):
+        if result_format == "iter":
+            return self.stream("fetch_data", data, result_format=result_format, search=search, **page_args)
+        return self.call("fetch_data", data, result_format=result_format, search=search, **page_args)
+
+    def stream_table(self, table: str, chunk_size: int = 1000):
+        # Rows arrive as lists, Database yields tuples
+        return map(tuple, self.stream("stream_table", table, chunk_size))
+
+    def check_restock(self):
+        return self.call("check_restock")
+
+    def inventory_as_of(self, timestamp: str, data: ds.InventoryData = None, result_format: str = "dicts", search: str = "exact"):
+        return self.call("inventory_as_of", timestamp, data, result_format=result_format, search=search)
+
+    def fetch_log_rollups(self, stock_name: str = None, location_name: str = None, start: str = None, end: str = None, period: str = "day", result_format: str = "dicts", search: str = "exact"):
+        return self.call("fetch_log_rollups", stock_name, location_name, start, end, period=period, result_format=result_format, search=search)
+
+    def diagnostics(self):
+        return self.call("diagnostics")
+
+    def reset_diagnostics(self):
+        return self.call("reset_diagnostics")
+
+    def close(self):
+        """
+        Closes every thread's connection to the service. The service and its database stay up
+        """
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m service", description="Serve the component tracking database over local http")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on. Only this machine can connect by default")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--test-data", action="store_true", help="use the test database")
+    parser.add_argument("--data-dir", help="directory holding the database, instead of the user data directory")
+    parser.add_argument("--pool-size", type=int, default=5, help="read connections, and threads to run reads on")
+    parser.add_argument("--profile", action="store_true", help="time queries for the diagnostics endpoint")
+    args = parser.parse_args(argv)
+
+    db = Database(test_data=args.test_data, data_dir=args.data_dir, pool_size=args.pool_size, profile=args.profile)
+    db.start_checkpointer()
+    service = DatabaseService(db, read_threads=args.pool_size)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,10 @@
-import tkinter as tk
+from datetime import date, datetime
+from typing import TYPE_CHECKING
+
+# tkinter is only needed for type hints, so the database and command line can run without it
+if TYPE_CHECKING:
+    import tkinter as tk
+
 #####################
 ## Validity checks ##
 #####################
@@ -39,6 +45,15 @@ def is_valid_name(name: str)->bool:
     """
     return all(c.isalnum() or c.isspace() for c in name)
 
+# The longest name the database will store
+MAX_NAME_LENGTH = 50
+
+def is_valid_name_length(name: str) -> bool:
+    """
+    Checks to see if the name fits in the database
+    """
+    return len(name) <= MAX_NAME_LENGTH
+
 def in_database(db: str, param: str, param_name: str, cur) -> bool:
     # Check to see if the name is already in the database
     cur.execute("SELECT * FROM ? WHERE ? = ?", (db, param, param_name))
@@ -50,11 +65,33 @@ def is_valid_num(num: str) -> bool:
     """
     return num.isdigit()
 
+def is_valid_date(day: str) -> bool:
+    """
+    Checks to see if a date string is a valid YYYY-MM-DD date
+    """
+    try:
+        date.fromisoformat(day)
+    except ValueError:
+        return False
+    return len(day) == 10
+
+def is_valid_timestamp(timestamp: str) -> bool:
+    """
+    Checks to see if a string is a valid YYYY-MM-DD date or YYYY-MM-DD HH:MM:SS time, the way the logs store them
+    """
+    if is_valid_date(timestamp):
+        return True
+    try:
+        datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return False
+    return len(timestamp) == 19
+
 ###################
 ## Normalisation ##
 ###################
 # Functions to normalise input before they are added to the table
-def normalise_stringvar_params(params: dict[str, tk.StringVar]):
+def normalise_stringvar_params(params: dict[str, "tk.StringVar"]):
     """
     Normalises tk.StringVar search params by making them upper case and removing superfluous whitespace
     """